@@ -6,6 +6,17 @@ from tqdm import tqdm
 import pandas as pd
 from collections import defaultdict
 import random
+import argparse
+
+from blackjack_engine import card_values, suits, Deck, GameEngine, Rules, DEFAULT_RULES, calculate_hand_value, dealer_strategy
+import blackjack_engine
+import blackjack_log
+import blackjack_odds
+import blackjack_profile
+import blackjack_report
+import blackjack_strata
+from blackjack_fast import play_policies, threshold_policy
+from blackjack_profile import profiled
 
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']
 plt.rcParams['axes.unicode_minus'] = False
@@ -14,129 +25,83 @@ plt.rcParams['axes.unicode_minus'] = False
 np.random.seed(42)
 random.seed(42)
 
-# 定义牌的值
-card_values = {
-    '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10,
-    'J': 10, 'Q': 10, 'K': 10, 'A': 11  # A初始值为11，需要时可变为1
-}
-
-# 定义花色
-suits = ['♠', '♥', '♦', '♣']
-
-# 定义牌组
-class Deck:
-    def __init__(self):
-        self.reset()
-    
-    def reset(self):
-        """重置牌组为一副新牌"""
-        self.cards = []
-        for suit in suits:
-            for card, _ in card_values.items():
-                self.cards.append(card + suit)
-        random.shuffle(self.cards)
-    
-    def deal(self):
-        """发一张牌"""
-        if not self.cards:
-            self.reset()
-        return self.cards.pop()
-
-# 计算手牌点数
-def calculate_hand_value(hand):
-    """计算手牌的点数，考虑A可以是1或11"""
-    value = 0
-    aces = 0
-    
-    for card in hand:
-        card_value = card[:-1]  # 去掉花色
-        if card_value == 'A':
-            aces += 1
-            value += 11
-        else:
-            value += card_values[card_value]
-    
-    # 如果点数超过21且有A，则将A的值从11改为1
-    while value > 21 and aces > 0:
-        value -= 10  # 11 - 1 = 10
-        aces -= 1
-    
-    return value
-
 # 玩家策略
 def player_strategy_fixed_threshold(hand_value, threshold=16):
     """固定阈值策略：点数小于等于阈值时要牌，否则停牌"""
     return hand_value <= threshold
 
-# 庄家策略（固定规则：小于17点必须要牌）
-def dealer_strategy(hand_value):
-    """庄家策略：点数小于17点时要牌，否则停牌"""
-    return hand_value < 17
-
 # 单局游戏模拟
-def play_game(deck, player_strategy, player_threshold=16):
+def play_game(deck, player_strategy, player_threshold=16, rules=DEFAULT_RULES):
     """模拟一局游戏
     
     参数:
     deck: 牌组
     player_strategy: 玩家策略函数
     player_threshold: 玩家策略的阈值参数
+    rules: 牌桌规则
     
     返回:
     result: 游戏结果 (1: 玩家胜, -1: 玩家负, 0: 平局)
     player_hand: 玩家最终手牌
     dealer_hand: 庄家最终手牌
     """
-    # 初始发牌
-    player_hand = [deck.deal(), deck.deal()]
-    dealer_hand = [deck.deal(), deck.deal()]
-    
-    # 玩家回合
-    player_value = calculate_hand_value(player_hand)
-    while player_strategy(player_value, player_threshold) and player_value < 21:
-        player_hand.append(deck.deal())
-        player_value = calculate_hand_value(player_hand)
-    
-    # 如果玩家爆牌，直接判定为输
-    if player_value > 21:
-        return -1, player_hand, dealer_hand
-    
-    # 庄家回合
-    dealer_value = calculate_hand_value(dealer_hand)
-    while dealer_strategy(dealer_value):
-        dealer_hand.append(deck.deal())
-        dealer_value = calculate_hand_value(dealer_hand)
-    
-    # 判定胜负
-    if dealer_value > 21:  # 庄家爆牌
-        return 1, player_hand, dealer_hand
-    elif player_value > dealer_value:  # 玩家点数大于庄家
-        return 1, player_hand, dealer_hand
-    elif player_value < dealer_value:  # 玩家点数小于庄家
-        return -1, player_hand, dealer_hand
-    else:  # 平局
-        return 0, player_hand, dealer_hand
+    game = GameEngine(deck, rules)
+    _play(game, player_strategy, player_threshold)
+    return game.result, game.player_hand, game.dealer_hand
+
+def _play(game, player_strategy, player_threshold):
+    """在游戏引擎上发牌并按玩家策略进行一局，天然二十一点在发牌时已结算"""
+    game.deal()
+    
+    # 玩家回合（爆牌时 hit 会直接结算）
+    while game.state == GameEngine.PLAYER_TURN:
+        player_value = game.player_value
+        if player_strategy(player_value, player_threshold) and player_value < 21:
+            game.hit()
+        else:
+            game.stand()  # 庄家回合并判定胜负
 
 # 蒙特卡洛模拟
-def monte_carlo_simulation(num_games=10000, player_threshold=16):
+@profiled
+def monte_carlo_simulation(num_games=10000, player_threshold=16, rules=DEFAULT_RULES, recorder=None,
+                           stratified=None, with_return=False):
     """使用蒙特卡洛方法模拟多局游戏，计算胜率
     
     参数:
     num_games: 模拟的游戏局数
     player_threshold: 玩家策略的阈值参数
+    rules: 牌桌规则
+    recorder: blackjack_log.HandRecorder，给定时把每一手牌写入二进制日志
+    stratified: 'proportional' 或 'neyman'，给定时改用批量引擎按初始发牌分层抽样（见 blackjack_strata）
+    with_return: 为 True 时额外返回每注平均收益
+    profile: 性能分析输出文件前缀，给定时写出折叠栈、cProfile 数据和摘要（见 blackjack_profile）
     
     返回:
     win_rate: 玩家胜率
     loss_rate: 玩家败率
     draw_rate: 平局率
+    expected_return: 每注平均收益（按规则的赔付表），仅 with_return 为 True 时返回
     """
-    deck = Deck()
+    if stratified is not None:
+        if recorder is not None:
+            raise ValueError("分层抽样不逐手记录，不能与 recorder 同时使用")
+        result = blackjack_strata.stratified_simulation(num_games, threshold_policy(player_threshold),
+                                                        stratified, rules=rules)
+        rates = result['win_rate'], result['loss_rate'], result['draw_rate']
+        return rates + (result['expected_return'],) if with_return else rates
+    
+    game = GameEngine(Deck(rules.decks), rules)
     wins = 0
     losses = 0
     draws = 0
+    total_return = 0
     
     for _ in tqdm(range(num_games), desc=f"模拟 阈值={player_threshold}"):
-        result, _, _ = play_game(deck, player_strategy_fixed_threshold, player_threshold)
+        _play(game, player_strategy_fixed_threshold, player_threshold)
+        result = game.result
+        total_return += game.payout(1)
+        if recorder is not None:
+            recorder.record(game, player_threshold)
         if result == 1:
             wins += 1
         elif result == -1:
@@ -148,34 +113,67 @@ def monte_carlo_simulation(num_games=10000, player_threshold=16):
     loss_rate = losses / num_games
     draw_rate = draws / num_games
     
+    if with_return:
+        return win_rate, loss_rate, draw_rate, total_return / num_games
     return win_rate, loss_rate, draw_rate
 
 # 比较不同阈值策略
-def compare_thresholds(thresholds=range(11, 21), num_games=10000):
+@profiled
+def compare_thresholds(thresholds=range(11, 21), num_games=10000, exact=False, decks=1, rules=None,
+                       recorder=None, stratified=None, single_pass=False):
     """比较不同阈值策略的胜率
     
     参数:
     thresholds: 要比较的阈值列表
     num_games: 每个阈值模拟的游戏局数
+    exact: 为 True 时不抽样，直接精确计算各阈值的胜负平局率（忽略 num_games）
+    decks: 每局使用的牌副数，精确计算时可为 None 表示无限副牌
+    rules: 牌桌规则，给定时其牌副数覆盖 decks
+    recorder: blackjack_log.HandRecorder，抽样时把每一手牌写入二进制日志
+    stratified: 抽样时按初始发牌分层的分配方式，'proportional' 或 'neyman'（见 monte_carlo_simulation）
+    single_pass: 为 True 时用批量引擎一次模拟 num_games 局，所有阈值共用同一条牌流（见 blackjack_fast.play_policies）
+    profile: 性能分析输出文件前缀（见 blackjack_profile）
     
     返回:
     results: 包含各阈值胜率的字典
     """
+    rules = Rules(decks=decks) if rules is None else rules
     results = {}
     
+    if exact:
+        outcomes = blackjack_odds.outcome_probabilities(thresholds, rules=rules)
+        payouts = blackjack_engine.payout_table(rules)
+    elif single_pass:
+        if recorder is not None or stratified is not None:
+            raise ValueError("单次多阈值模拟不能与 recorder 或 stratified 同时使用")
+        hands = play_policies(num_games, {t: threshold_policy(t) for t in thresholds}, rules=rules)
+    
     for threshold in thresholds:
-        win_rate, loss_rate, draw_rate = monte_carlo_simulation(num_games, threshold)
+        if exact:
+            probs = outcomes[threshold]
+            win_rate = probs['blackjack'] + probs['win']
+            loss_rate, draw_rate = probs['loss'], probs['push']
+            expected_return = sum(payouts[name] * p for name, p in probs.items())
+        elif single_pass:
+            result = hands[threshold]['result']
+            win_rate, loss_rate, draw_rate = (float(np.mean(result == r)) for r in (1, -1, 0))
+            expected_return = float(hands[threshold]['payout'].mean())
+        else:
+            win_rate, loss_rate, draw_rate, expected_return = monte_carlo_simulation(
+                num_games, threshold, rules, recorder, stratified, with_return=True)
         results[threshold] = {
             'win_rate': win_rate,
             'loss_rate': loss_rate,
             'draw_rate': draw_rate,
-            'expected_return': win_rate - loss_rate  # 期望收益（假设赢1元输1元）
+            'expected_return': expected_return  # 每注期望收益（含天然二十一点的赔率）
         }
     
     return results
 
 # 资本变化模拟
-def simulate_capital_change(initial_capital=100, bet_amount=1, num_games=1000, player_threshold=16):
+@profiled
+def simulate_capital_change(initial_capital=100, bet_amount=1, num_games=1000, player_threshold=16,
+                            bet_strategy=None, rules=DEFAULT_RULES):
     """模拟玩家资本随游戏局数的变化
     
     参数:
@@ -183,13 +181,18 @@ def simulate_capital_change(initial_capital=100, bet_amount=1, num_games=1000, p
     bet_amount: 每局下注金额
     num_games: 模拟的游戏局数
     player_threshold: 玩家策略的阈值参数
+    bet_strategy: blackjack_betting 中的下注策略，为 None 时每局固定下注 bet_amount
+    rules: 牌桌规则
+    profile: 性能分析输出文件前缀（见 blackjack_profile）
     
     返回:
     capital_history: 资本变化历史
     """
-    deck = Deck()
+    game = GameEngine(Deck(rules.decks), rules)
     capital = initial_capital
     capital_history = [capital]
+    if bet_strategy is not None:
+        bet_strategy.reset(1, initial_capital)
     
     for _ in range(num_games):
         if capital <= 0:
@@ -197,17 +200,17 @@ def simulate_capital_change(initial_capital=100, bet_amount=1, num_games=1000, p
             break
         
         # 确定本局下注金额（不超过当前资本）
+        if bet_strategy is not None:
+            bet_amount = bet_strategy.bets(np.array([float(capital)]))[0].item()
         current_bet = min(bet_amount, capital)
         
         # 进行一局游戏
-        result, _, _ = play_game(deck, player_strategy_fixed_threshold, player_threshold)
+        _play(game, player_strategy_fixed_threshold, player_threshold)
+        if bet_strategy is not None:
+            bet_strategy.update(np.array([game.result]))
         
-        # 更新资本
-        if result == 1:  # 玩家胜
-            capital += current_bet
-        elif result == -1:  # 玩家负
-            capital -= current_bet
-        # 平局不变
+        # 按规则的赔付表更新资本（天然二十一点按赔率，平局不变）
+        capital += game.payout(current_bet)
         
         capital_history.append(capital)
     
@@ -264,8 +267,9 @@ def plot_threshold_comparison(results):
     
     return fig
 
+@profiled
 def plot_capital_distribution(initial_capital=100, bet_amount=1, player_threshold=16, 
-                             num_simulations=1000, max_games=1000):
+                             num_simulations=1000, max_games=1000, exact=False, decks=1, rules=None):
     """绘制资本随游戏局数变化的概率分布图
     
     参数:
@@ -274,42 +278,40 @@ def plot_capital_distribution(initial_capital=100, bet_amount=1, player_threshol
     player_threshold: 玩家策略的阈值参数
     num_simulations: 模拟次数
     max_games: 每次模拟的最大游戏局数
+    exact: 为 True 时用马尔可夫链精确计算资本分布和破产概率（忽略 num_simulations）
+    decks: 每局使用的牌副数，精确计算时可为 None 表示无限副牌
+    rules: 牌桌规则，给定时其牌副数覆盖 decks
+    profile: 性能分析输出文件前缀（见 blackjack_profile）
     
     返回:
     fig: 图形对象
     """
-    # 存储每个局数的所有资本值
-    all_capitals = [[] for _ in range(max_games + 1)]
-    all_capitals[0] = [initial_capital] * num_simulations  # 初始资本
-    
-    # 记录破产情况
-    bankruptcies = 0
-    games_to_bankruptcy = []
+    rules = Rules(decks=decks) if rules is None else rules
+    games_to_plot = min(max_games, 100)  # 限制显示的局数
+    max_capital_to_plot = int(initial_capital * 3)  # 限制显示的最大资本
     
-    # 运行多次模拟
-    for _ in tqdm(range(num_simulations), desc="模拟资本变化"):
-        capital_history = simulate_capital_change(
-            initial_capital=initial_capital, 
+    if exact:
+        result = blackjack_odds.capital_distribution(
+            initial_capital=initial_capital,
             bet_amount=bet_amount,
+            player_threshold=player_threshold,
             num_games=max_games,
-            player_threshold=player_threshold
+            record_games=games_to_plot,
+            max_capital=max_capital_to_plot,
+            rules=rules
         )
-        
-        # 记录破产情况
-        if capital_history[-1] <= 0:
-            bankruptcies += 1
-            games_to_bankruptcy.append(len(capital_history) - 1)
-        
-        # 记录每个局数的资本
-        for i, capital in enumerate(capital_history):
-            if i <= max_games:
-                all_capitals[i].append(capital)
-        
-        # 如果游戏提前结束，用最终资本填充剩余局数
-        last_capital = capital_history[-1]
-        for i in range(len(capital_history), max_games + 1):
-            if i <= max_games:
-                all_capitals[i].append(last_capital)
+        heatmap_data = result['heatmap']
+        bankruptcy_rate = result['ruin_probability']
+        ruin_time = result['ruin_time']
+    else:
+        heatmap_data, bankruptcy_rate, games_to_bankruptcy = _sample_capital_distribution(
+            initial_capital, bet_amount, player_threshold, num_simulations, max_games,
+            games_to_plot, max_capital_to_plot, rules)
+    
+    # 归一化每一列
+    for col in range(heatmap_data.shape[1]):
+        if np.sum(heatmap_data[:, col]) > 0:
+            heatmap_data[:, col] = heatmap_data[:, col] / np.sum(heatmap_data[:, col])
     
     # 创建图形
     fig = plt.figure(figsize=(15, 10))
@@ -318,27 +320,15 @@ def plot_capital_distribution(initial_capital=100, bet_amount=1, player_threshol
     # 1. 资本分布热图
     ax1 = fig.add_subplot(gs[0, :])
     
-    # 准备热图数据
-    games_to_plot = min(max_games, 100)  # 限制显示的局数
-    max_capital_to_plot = int(initial_capital * 3)  # 限制显示的最大资本
-    heatmap_data = np.zeros((max_capital_to_plot + 1, games_to_plot + 1))
-    
-    for game_idx in range(games_to_plot + 1):
-        capitals = all_capitals[game_idx]
-        for capital in capitals:
-            if 0 <= capital <= max_capital_to_plot:
-                heatmap_data[int(capital), game_idx] += 1
-    
-    # 归一化每一列
-    for col in range(heatmap_data.shape[1]):
-        if np.sum(heatmap_data[:, col]) > 0:
-            heatmap_data[:, col] = heatmap_data[:, col] / np.sum(heatmap_data[:, col])
-    
-    # 绘制热图
-    sns.heatmap(heatmap_data, ax=ax1, cmap="viridis", cbar_kws={'label': '概率密度'})
+    # 绘制热图（按图像绘制，比逐格绘制的 seaborn 热图快得多，矢量格式中也只是一张位图）
+    image = ax1.imshow(heatmap_data, aspect='auto', cmap="viridis", interpolation='nearest')
+    fig.colorbar(image, ax=ax1, label='概率密度')
     ax1.set_ylabel('资本 (元)')
     ax1.set_xlabel('游戏局数')
-    ax1.set_title(f'资本随游戏局数变化的概率分布 (模拟{num_simulations}次)')
+    if exact:
+        ax1.set_title('资本随游戏局数变化的概率分布 (精确计算)')
+    else:
+        ax1.set_title(f'资本随游戏局数变化的概率分布 (模拟{num_simulations}次)')
     
     # 添加初始资本线
     ax1.axhline(y=initial_capital, color='g', linestyle='--', alpha=0.7)
@@ -346,15 +336,21 @@ def plot_capital_distribution(initial_capital=100, bet_amount=1, player_threshol
     # 2. 破产/存活统计饼图
     ax2 = fig.add_subplot(gs[1, 0])
     labels = ['破产', '存活']
-    sizes = [bankruptcies, num_simulations - bankruptcies]
+    sizes = [bankruptcy_rate, 1 - bankruptcy_rate]
     colors = ['#ff9999', '#66b3ff']
     ax2.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
     ax2.axis('equal')
-    ax2.set_title('模拟结果统计')
+    ax2.set_title('精确结果统计' if exact else '模拟结果统计')
     
     # 3. 破产局数分布（如果有破产情况）
     ax3 = fig.add_subplot(gs[1, 1])
-    if games_to_bankruptcy:
+    if exact and bankruptcy_rate > 0:
+        ax3.plot(np.arange(len(ruin_time)), ruin_time, color='#ff6600')
+        ax3.fill_between(np.arange(len(ruin_time)), ruin_time, alpha=0.3, color='#ff6600')
+        ax3.set_xlabel('破产局数')
+        ax3.set_ylabel('概率')
+        ax3.set_title('破产局数分布')
+    elif not exact and games_to_bankruptcy:
         sns.histplot(games_to_bankruptcy, ax=ax3, kde=True)
         ax3.set_xlabel('破产局数')
         ax3.set_ylabel('频次')
@@ -374,6 +370,54 @@ def plot_capital_distribution(initial_capital=100, bet_amount=1, player_threshol
     plt.tight_layout(rect=[0, 0, 1, 0.95])
     return fig
 
+def _sample_capital_distribution(initial_capital, bet_amount, player_threshold, num_simulations, max_games,
+                                 games_to_plot, max_capital_to_plot, rules):
+    """抽样估计资本分布，返回 (热图计数, 破产比例, 各次破产的局数)"""
+    # 存储每个局数的所有资本值
+    all_capitals = [[] for _ in range(max_games + 1)]
+    all_capitals[0] = [initial_capital] * num_simulations  # 初始资本
+    
+    # 记录破产情况
+    bankruptcies = 0
+    games_to_bankruptcy = []
+    
+    # 运行多次模拟
+    for _ in tqdm(range(num_simulations), desc="模拟资本变化"):
+        capital_history = simulate_capital_change(
+            initial_capital=initial_capital, 
+            bet_amount=bet_amount,
+            num_games=max_games,
+            player_threshold=player_threshold,
+            rules=rules
+        )
+        
+        # 记录破产情况
+        if capital_history[-1] <= 0:
+            bankruptcies += 1
+            games_to_bankruptcy.append(len(capital_history) - 1)
+        
+        # 记录每个局数的资本
+        for i, capital in enumerate(capital_history):
+            if i <= max_games:
+                all_capitals[i].append(capital)
+        
+        # 如果游戏提前结束，用最终资本填充剩余局数
+        last_capital = capital_history[-1]
+        for i in range(len(capital_history), max_games + 1):
+            if i <= max_games:
+                all_capitals[i].append(last_capital)
+    
+    # 准备热图数据
+    heatmap_data = np.zeros((max_capital_to_plot + 1, games_to_plot + 1))
+    
+    for game_idx in range(games_to_plot + 1):
+        capitals = all_capitals[game_idx]
+        for capital in capitals:
+            if 0 <= capital <= max_capital_to_plot:
+                heatmap_data[int(capital), game_idx] += 1
+    
+    return heatmap_data, bankruptcies / num_simulations, games_to_bankruptcy
+
 # 决策树可视化
 def plot_decision_tree(max_value=21):
     """绘制二十一点的简化决策树
@@ -519,13 +563,52 @@ def plot_card_probabilities():
     plt.tight_layout()
     return fig
 
+# 默认的图表输出目录
+DEFAULT_OUTPUT_DIR = '/Users/djh/Desktop/gamblers\' problem/blackjack'
+
 # 主函数
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="二十一点 (Blackjack) 数值分析与可视化")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="图表输出目录")
+    parser.add_argument("--formats", nargs='+', default=['png'], help="输出格式，如 png svg pdf")
+    parser.add_argument("--dpi", type=int, default=300, help="位图格式的分辨率")
+    parser.add_argument("--workers", type=int, help="并行渲染的进程数，默认为 CPU 核数，0 表示在主进程中依次渲染")
+    parser.add_argument("--no-cache", action='store_true', help="忽略渲染缓存，重新绘制所有图表")
+    parser.add_argument("--exact", action='store_true', help="使用精确计算代替蒙特卡洛模拟")
+    parser.add_argument("--decks", type=int, default=1, help="每局使用的牌副数")
+    parser.add_argument("--h17", action='store_true', help="庄家软17要牌（默认软17停牌）")
+    parser.add_argument("--blackjack-payout", type=float, default=1.5, help="天然二十一点的赔率，如 1.5 为 3:2")
+    parser.add_argument("--stratified", choices=['proportional', 'neyman'],
+                        help="蒙特卡洛模拟按初始发牌分层抽样（使用批量引擎）")
+    parser.add_argument("--single-pass", action='store_true',
+                        help="蒙特卡洛模拟用批量引擎一次评估所有阈值（共用同一条牌流）")
+    parser.add_argument("--record", metavar="PATH", help="把蒙特卡洛模拟的每一手牌追加写入二进制日志")
+    parser.add_argument("--profile", metavar="PREFIX",
+                        help="分析整个运行的性能，写出 PREFIX.collapsed/.pstats/.txt（未指定 --workers 时在主进程中渲染图表）")
+    args = parser.parse_args(argv)
+    if args.profile:
+        if args.workers is None:
+            args.workers = 0  # 图表在主进程中渲染，绘图耗时才能计入分析结果
+        _, report = blackjack_profile.profile_call(_run, args, output_prefix=args.profile)
+        print("\n" + report['overview'])
+        print(f"分析结果已写入 {args.profile}.collapsed / .pstats / .txt")
+    else:
+        _run(args)
+
+def _run(args):
+    rules = Rules(decks=args.decks, dealer_hits_soft_17=args.h17, blackjack_payout=args.blackjack_payout)
+    
     print("\n===== 二十一点 (Blackjack) 数值分析与可视化 =====\n")
     
     # 1. 蒙特卡洛模拟不同阈值策略的胜率
     print("\n1. 分析不同阈值策略的胜率...")
-    results = compare_thresholds(range(11, 21), num_games=10000)
+    if args.record and not args.exact:
+        with blackjack_log.HandRecorder(args.record) as recorder:
+            results = compare_thresholds(range(11, 21), num_games=10000, rules=rules, recorder=recorder)
+        print(f"模拟的手牌已写入 {args.record}，可用 blackjack_log.py 汇总")
+    else:
+        results = compare_thresholds(range(11, 21), num_games=10000, exact=args.exact, rules=rules,
+                                     stratified=args.stratified, single_pass=args.single_pass)
     
     # 找出最优阈值
     best_threshold = max(results.items(), key=lambda x: x[1]['expected_return'])[0]
@@ -533,43 +616,31 @@ def main():
     print(f"最优策略胜率: {results[best_threshold]['win_rate']*100:.2f}%")
     print(f"最优策略期望收益: {results[best_threshold]['expected_return']*100:.2f}%")
     
-    # 2. 绘制策略比较图
-    print("\n2. 绘制策略比较图...")
-    fig_threshold = plot_threshold_comparison(results)
-    fig_threshold.savefig('/Users/djh/Desktop/gamblers\' problem/blackjack/strategy_comparison.png', dpi=300)
-    plt.close(fig_threshold)
-    
-    # 3. 绘制资本变化分布图
-    print("\n3. 绘制资本变化分布图...")
-    fig_capital = plot_capital_distribution(
-        initial_capital=100, 
-        bet_amount=1,
-        player_threshold=best_threshold,
-        num_simulations=1000,
-        max_games=1000
-    )
-    fig_capital.savefig('/Users/djh/Desktop/gamblers\' problem/blackjack/capital_distribution.png', dpi=300)
-    plt.close(fig_capital)
-    
-    # 4. 绘制决策树分析图
-    print("\n4. 绘制决策树分析图...")
-    fig_decision = plot_decision_tree()
-    fig_decision.savefig('/Users/djh/Desktop/gamblers\' problem/blackjack/decision_tree.png', dpi=300)
-    plt.close(fig_decision)
-    
-    # 5. 绘制牌值概率分布图
-    print("\n5. 绘制牌值概率分布图...")
-    fig_probs = plot_card_probabilities()
-    fig_probs.savefig('/Users/djh/Desktop/gamblers\' problem/blackjack/card_probabilities.png', dpi=300)
-    plt.close(fig_probs)
-    
+    # 2. 并行绘制所有图表（输入数据未变化的图表直接复用）
+    print("\n2. 绘制图表...")
+    jobs = [
+        {'name': 'strategy_comparison', 'plot': 'plot_threshold_comparison',
+         'kwargs': {'results': results}},
+        {'name': 'capital_distribution', 'plot': 'plot_capital_distribution',
+         'kwargs': {'initial_capital': 100, 'bet_amount': 1, 'player_threshold': best_threshold,
+                    'num_simulations': 1000, 'max_games': 1000, 'exact': args.exact, 'rules': rules}},
+        {'name': 'decision_tree', 'plot': 'plot_decision_tree', 'kwargs': {}},
+        {'name': 'card_probabilities', 'plot': 'plot_card_probabilities', 'kwargs': {}},
+    ]
+    status = blackjack_report.render_figures(
+        jobs, args.output_dir, formats=args.formats, dpi=args.dpi,
+        workers=args.workers, use_cache=not args.no_cache)
+    for name, state in status.items():
+        print(f"{name}: {'未变化，跳过' if state == 'cached' else '已重新绘制'}")
+    
+    extensions = '/'.join(args.formats)
     print("\n所有分析完成，结果已保存!")
     print("\n保存的图表文件:")
-    print("1. strategy_comparison.png - 不同阈值策略的胜率比较")
-    print("2. capital_distribution.png - 资本随游戏局数变化的概率分布")
-    print("3. decision_tree.png - 决策树分析图")
-    print("4. card_probabilities.png - 牌值概率分布图")
+    print(f"1. strategy_comparison.{extensions} - 不同阈值策略的胜率比较")
+    print(f"2. capital_distribution.{extensions} - 资本随游戏局数变化的概率分布")
+    print(f"3. decision_tree.{extensions} - 决策树分析图")
+    print(f"4. card_probabilities.{extensions} - 牌值概率分布图")
 
 # 如果直接运行此脚本，则执行主函数
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
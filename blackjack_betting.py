@@ -0,0 +1,182 @@
+import numpy as np
+
+import blackjack_odds
+from blackjack_engine import OUTCOME_RESULTS
+
+# 下注策略
+class BetStrategy:
+    """下注策略基类：根据每条资本路径的当前资本和历史结果批量决定下一局的下注金额
+
+    子类实现 bets(capital)，需要记忆历史的策略再实现 reset 和 update；
+    所有方法都作用于形状为 (路径数,) 的数组。
+    """
+    def reset(self, num_paths, initial_capital):
+        """开始新的一批路径"""
+
+    def bets(self, capital):
+        """返回每条路径下一局的下注金额"""
+        raise NotImplementedError
+
+    def update(self, results):
+        """记录每条路径上一局的结果 (1: 胜, -1: 负, 0: 平局)，已结束的路径结果为0"""
+
+class FlatBet(BetStrategy):
+    """固定下注"""
+    def __init__(self, amount=1):
+        self.amount = amount
+
+    def bets(self, capital):
+        return np.full(len(capital), float(self.amount))
+
+class ProportionalBet(BetStrategy):
+    """按当前资本的固定比例下注"""
+    def __init__(self, fraction=0.02):
+        self.fraction = fraction
+
+    def bets(self, capital):
+        return capital * self.fraction
+
+class KellyBet(ProportionalBet):
+    """凯利公式下注：按每注输赢 X 的分布取 E[X] / E[X²] 的资本比例
+
+    输赢各为一注且可能平局时即为精确的 (p - q) / (p + q)；有 3:2 等非整数赔付时为二阶近似。
+    fraction 为凯利比例的倍数（如 0.5 为半凯利）；期望收益为负时凯利比例为0，
+    此时由模拟器按桌面最低下注处理。
+    """
+    def __init__(self, fraction=1.0, win_rate=None, loss_rate=None, player_threshold=16, rules=None):
+        if win_rate is None or loss_rate is None:
+            payouts, probs = blackjack_odds.threshold_payouts(player_threshold, rules=rules)
+        else:
+            payouts, probs = np.array([1.0, -1.0]), np.array([win_rate, loss_rate])
+        kelly = max(np.dot(probs, payouts) / np.dot(probs, payouts ** 2), 0.0)
+        super().__init__(fraction * kelly)
+
+class Martingale(BetStrategy):
+    """马丁格尔：输后加倍，赢后回到基础下注，平局不变"""
+    def __init__(self, base_bet=1):
+        self.base_bet = base_bet
+
+    def reset(self, num_paths, initial_capital):
+        self.current = np.full(num_paths, float(self.base_bet))
+
+    def bets(self, capital):
+        return self.current
+
+    def update(self, results):
+        self.current = np.where(results == -1, self.current * 2, np.where(results == 1, self.base_bet, self.current))
+
+class Paroli(BetStrategy):
+    """帕罗利（反马丁格尔）：赢后加倍，连赢 max_wins 局或输后回到基础下注"""
+    def __init__(self, base_bet=1, max_wins=3):
+        self.base_bet = base_bet
+        self.max_wins = max_wins
+
+    def reset(self, num_paths, initial_capital):
+        self.streak = np.zeros(num_paths, dtype=int)
+
+    def bets(self, capital):
+        return self.base_bet * 2.0 ** self.streak
+
+    def update(self, results):
+        streak = np.where(results == 1, self.streak + 1, np.where(results == -1, 0, self.streak))
+        self.streak = np.where(streak >= self.max_wins, 0, streak)
+
+# 批量资本路径模拟
+def simulate_capital_paths(bet_strategy, num_paths=100000, num_games=1000, initial_capital=100,
+                           player_threshold=16, min_bet=1, max_bet=None, decks=1,
+                           quantiles=(0.05, 0.25, 0.5, 0.75, 0.95), seed=None, rules=None):
+    """对一批资本路径逐局向量化地下注和结算
+
+    每局的结算结果按 blackjack_odds.outcome_probabilities 的精确分布独立抽样（每局一副新牌时各局独立，
+    且下注金额不影响玩法），所以每一局对所有路径只需几次数组运算。
+
+    参数:
+    bet_strategy: BetStrategy 实例
+    num_paths: 路径数
+    num_games: 每条路径的最大局数
+    initial_capital: 初始资本
+    player_threshold: 玩家策略的阈值参数
+    min_bet: 桌面最低下注，资本低于该值即破产；为 0 时与 blackjack.simulate_capital_change 相同，
+             资本不足一注时押上全部，资本耗尽才破产
+    max_bet: 桌面最高下注，None 表示不限
+    decks: 每局使用的牌副数，None 表示无限副牌
+    quantiles: 需要记录的资本分位数
+    seed: 随机种子
+    rules: blackjack_engine.Rules，给定时其牌副数覆盖 decks
+
+    返回:
+    result: 字典
+        ruin_probability: 破产概率
+        ruin_time: 各路径破产的局数（未破产为 -1）
+        quantiles: 形状为 (len(quantiles), num_games + 1) 的资本分位数曲线
+        mean: 平均资本曲线
+        final_capital: 各路径的最终资本
+        max_drawdown: 各路径相对历史最高资本的最大回撤比例（0 到 1，资本耗尽为 1）
+    """
+    rng = np.random.default_rng(seed)
+    payouts, probs = blackjack_odds.threshold_payouts(player_threshold, decks, rules)
+    results_table = np.array([OUTCOME_RESULTS[name] for name in blackjack_odds.SETTLE_OUTCOMES], dtype=np.int8)
+    cumulative = np.cumsum(probs)[:-1]
+
+    capital = np.full(num_paths, float(initial_capital))
+    peak = capital.copy()
+    max_drawdown = np.zeros(num_paths)
+    def broke(capital):
+        return capital <= 0 if min_bet <= 0 else capital < min_bet
+
+    alive = ~broke(capital)
+    ruin_time = np.where(alive, -1, 0)
+    quantile_curves = np.zeros((len(quantiles), num_games + 1))
+    mean_curve = np.zeros(num_games + 1)
+    quantile_curves[:, 0] = np.quantile(capital, quantiles)
+    mean_curve[0] = capital.mean()
+    bet_strategy.reset(num_paths, initial_capital)
+
+    for t in range(1, num_games + 1):
+        # 下注金额受桌面限额和当前资本约束
+        bets = np.maximum(bet_strategy.bets(capital), min_bet)
+        if max_bet is not None:
+            bets = np.minimum(bets, max_bet)
+        bets = np.minimum(bets, capital)
+
+        outcome = np.searchsorted(cumulative, rng.random(num_paths), side='right')
+        capital += np.where(alive, payouts[outcome] * bets, 0)
+        bet_strategy.update(np.where(alive, results_table[outcome], 0))
+
+        # 破产：资本不足桌面最低下注（min_bet 为 0 时资本耗尽）
+        ruined = alive & broke(capital)
+        ruin_time[ruined] = t
+        alive &= ~ruined
+
+        np.maximum(peak, capital, out=peak)
+        # 历史最高资本不为正（初始资本为 0）时没有可回撤的资本，回撤记为 0，避免 0/0
+        drawdown = 1 - np.divide(capital, peak, out=np.ones(num_paths), where=peak > 0)
+        np.maximum(max_drawdown, drawdown, out=max_drawdown)
+        quantile_curves[:, t] = np.quantile(capital, quantiles)
+        mean_curve[t] = capital.mean()
+        if not alive.any():
+            quantile_curves[:, t + 1:] = quantile_curves[:, [t]]
+            mean_curve[t + 1:] = mean_curve[t]
+            break
+
+    return {
+        'ruin_probability': float(np.mean(ruin_time >= 0)),
+        'ruin_time': ruin_time,
+        'quantiles': quantile_curves,
+        'mean': mean_curve,
+        'final_capital': capital,
+        'max_drawdown': max_drawdown,
+    }
+
+def compare_bet_strategies(strategies, **kwargs):
+    """对多个下注策略运行 simulate_capital_paths，返回 策略名 -> 汇总指标"""
+    summary = {}
+    for name, strategy in strategies.items():
+        result = simulate_capital_paths(strategy, **kwargs)
+        summary[name] = {
+            'ruin_probability': result['ruin_probability'],
+            'median_final_capital': float(np.median(result['final_capital'])),
+            'mean_final_capital': float(result['mean'][-1]),
+            'median_max_drawdown': float(np.median(result['max_drawdown'])),
+        }
+    return summary
@@ -0,0 +1,431 @@
+import argparse
+import ipaddress
+import multiprocessing
+import os
+import secrets
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from multiprocessing.managers import BaseManager
+
+import numpy as np
+
+import blackjack_betting
+import blackjack_fast
+from blackjack_engine import Rules, OUTCOMES
+
+# 认证密钥的环境变量。multiprocessing.managers 传输的是 pickle，密钥就是执行权限，
+# 因此没有默认密钥：监听非本机地址时必须显式给出，本机运行时随机生成
+AUTHKEY_ENV = 'BLACKJACK_CLUSTER_AUTHKEY'
+
+def is_loopback(host):
+    """host 是否只在本机可达（如 127.0.0.1、localhost、::1）"""
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+# 分片任务
+def make_threshold_shards(thresholds=range(11, 21), num_games=1000000, shard_size=100000, seed=0, rules=None):
+    """把各阈值的模拟切成带种子的分片，每片用批量引擎模拟 shard_size 局"""
+    rules = Rules() if rules is None else rules
+    shards = []
+    for threshold in thresholds:
+        for start in range(0, num_games, shard_size):
+            shards.append({
+                'id': len(shards),
+                'task': 'thresholds',
+                'seed': [seed, len(shards)],
+                'params': {'threshold': threshold, 'num_hands': min(shard_size, num_games - start), 'rules': rules},
+            })
+    return shards
+
+def make_capital_shards(num_paths=100000, shard_size=10000, seed=0, initial_capital=100, bet_amount=1,
+                        num_games=1000, player_threshold=16, rules=None):
+    """把固定下注的资本路径模拟切成带种子的分片，每片模拟 shard_size 条路径"""
+    rules = Rules() if rules is None else rules
+    shards = []
+    for start in range(0, num_paths, shard_size):
+        shards.append({
+            'id': len(shards),
+            'task': 'capital',
+            'seed': [seed, len(shards)],
+            'params': {'num_paths': min(shard_size, num_paths - start), 'initial_capital': initial_capital,
+                       'bet_amount': bet_amount, 'num_games': num_games,
+                       'player_threshold': player_threshold, 'rules': rules},
+        })
+    return shards
+
+def simulate_capital(params, seed):
+    """固定下注的资本路径模拟，与单机的 blackjack.simulate_capital_change 规则相同：
+    资本不足一注时押上全部，资本耗尽才破产（min_bet=0）。分片和单机对照都通过这里调用。"""
+    return blackjack_betting.simulate_capital_paths(
+        blackjack_betting.FlatBet(params['bet_amount']), num_paths=params['num_paths'],
+        num_games=params['num_games'], initial_capital=params['initial_capital'],
+        player_threshold=params['player_threshold'], min_bet=0, seed=seed, rules=params['rules'])
+
+def check_capital_shards(seed=0, num_shards=8, shard_size=500, num_games=200, initial_capital=20, bet_amount=1,
+                         num_workers=3, fail_after=1, lease_timeout=2.0, timeout=120):
+    """端到端检查资本分片：经协调者分发、租约重新分配和合并后的结果与单进程逐片模拟完全一致，
+    且破产概率与精确值吻合
+
+    分片由 run_local 的 num_workers 个工作者执行，其中第一个在完成 fail_after 个分片后中途崩溃，
+    它手上的分片在租约过期后由其他工作者重做；对照组在本进程中按相同种子逐片模拟，
+    直接从原始路径统计直方图，不经过 run_shard / merge_results。
+
+    返回:
+    check: 字典，包含 identical（合并结果与对照是否一致）、reassigned（重新分配次数）、
+           ruin_probability、exact_ruin_probability、std_error
+    """
+    import blackjack_odds
+
+    shards = make_capital_shards(num_paths=num_shards * shard_size, shard_size=shard_size, seed=seed,
+                                 initial_capital=initial_capital, bet_amount=bet_amount, num_games=num_games)
+    merged, status = run_local(shards, num_workers, lease_timeout, fail_after, timeout)
+
+    local = [simulate_capital(shard['params'], shard['seed']) for shard in shards]
+    ruin_time = np.concatenate([result['ruin_time'] for result in local])
+    final_capital = np.concatenate([result['final_capital'] for result in local])
+    max_capital = initial_capital + num_games * bet_amount * 2
+    identical = (merged['paths'] == len(ruin_time)
+                 and np.array_equal(merged['ruin_time_hist'],
+                                    np.bincount(ruin_time[ruin_time >= 0], minlength=num_games + 1))
+                 and np.array_equal(merged['final_hist'],
+                                    np.bincount(np.clip(final_capital.astype(int), 0, max_capital),
+                                                minlength=max_capital + 1))
+                 and np.isclose(merged['mean_final_capital'], final_capital.mean(), rtol=1e-12))
+    ruin = float(np.mean(ruin_time >= 0))
+    exact = blackjack_odds.capital_distribution(initial_capital=initial_capital, bet_amount=bet_amount,
+                                                num_games=num_games, rules=shards[0]['params']['rules'])
+    return {
+        'identical': bool(identical),
+        'reassigned': status['reassigned'],
+        'ruin_probability': ruin,
+        'exact_ruin_probability': float(exact['ruin_probability']),
+        'std_error': float(np.sqrt(ruin * (1 - ruin) / len(ruin_time))),
+    }
+
+def run_shard(shard):
+    """执行一个分片，返回只含计数/直方图的结果（可直接相加合并）"""
+    params = shard['params']
+    if shard['task'] == 'thresholds':
+        rng = np.random.default_rng(shard['seed'])
+        outcome = blackjack_fast.play_hands(params['num_hands'], blackjack_fast.threshold_policy(params['threshold']),
+                                            rng=rng, rules=params['rules'])
+        return {
+            'threshold': params['threshold'],
+            'counts': np.bincount(outcome['outcome'], minlength=len(OUTCOMES)),
+            'payout_sum': float(outcome['payout'].sum()),
+        }
+    if shard['task'] == 'capital':
+        result = simulate_capital(params, shard['seed'])
+        ruin_time = result['ruin_time']
+        final_capital = result['final_capital']
+        max_capital = params['initial_capital'] + params['num_games'] * params['bet_amount'] * 2
+        return {
+            'paths': params['num_paths'],
+            'ruin_time_hist': np.bincount(ruin_time[ruin_time >= 0], minlength=params['num_games'] + 1),
+            'final_hist': np.bincount(np.clip(final_capital.astype(int), 0, max_capital), minlength=max_capital + 1),
+            'final_sum': float(final_capital.sum()),
+        }
+    raise ValueError(f"未知的分片任务: {shard['task']}")
+
+def merge_results(shards, results):
+    """合并各分片的结果
+
+    返回:
+    thresholds 任务: 与 blackjack.compare_thresholds 格式相同的字典
+    capital 任务: 字典，包含 paths、ruin_probability、ruin_time_hist、final_hist、mean_final_capital
+    """
+    tasks = {shard['task'] for shard in shards}
+    if tasks == {'thresholds'}:
+        counts, payouts = {}, {}
+        for result in results.values():
+            threshold = result['threshold']
+            counts[threshold] = counts.get(threshold, 0) + result['counts']
+            payouts[threshold] = payouts.get(threshold, 0) + result['payout_sum']
+        merged = {}
+        for threshold in sorted(counts):
+            c = dict(zip(OUTCOMES, counts[threshold]))
+            hands = counts[threshold].sum()
+            merged[threshold] = {
+                'win_rate': float((c['blackjack'] + c['win']) / hands),
+                'loss_rate': float((c['loss'] + c['surrender']) / hands),
+                'draw_rate': float(c['push'] / hands),
+                'expected_return': float(payouts[threshold] / hands),
+                'hands': int(hands),
+            }
+        return merged
+    if tasks == {'capital'}:
+        paths = sum(result['paths'] for result in results.values())
+        ruin_time_hist = sum(result['ruin_time_hist'] for result in results.values())
+        return {
+            'paths': paths,
+            'ruin_probability': float(ruin_time_hist.sum() / paths),
+            'ruin_time_hist': ruin_time_hist,
+            'final_hist': sum(result['final_hist'] for result in results.values()),
+            'mean_final_capital': sum(result['final_sum'] for result in results.values()) / paths,
+        }
+    raise ValueError(f"不能合并的任务组合: {sorted(tasks)}")
+
+# 协调者：分片队列和租约
+class ShardQueue:
+    """在协调者进程中保存分片状态
+
+    分出去的分片带租约，工作者运行期间定期续租；工作者死掉后租约过期，分片重新排队交给其他工作者。
+    分片带固定种子，重复执行的结果相同，迟到的重复结果直接丢弃。
+    """
+    WAIT = 'wait'
+
+    def __init__(self, shards, lease_timeout=30.0):
+        self.shards = {shard['id']: shard for shard in shards}
+        self.pending = deque(self.shards)
+        self.leases = {}  # 分片编号 -> (工作者, 租约到期时间)
+        self.results = {}
+        self.reassigned = 0
+        self.lease_timeout = lease_timeout
+        self.lock = threading.Lock()
+
+    def _expire(self):
+        now = time.monotonic()
+        for shard_id, (_, deadline) in list(self.leases.items()):
+            if deadline < now:
+                del self.leases[shard_id]
+                self.pending.appendleft(shard_id)
+                self.reassigned += 1
+
+    def get(self, worker):
+        """领取一个分片；暂时没有可领的分片返回 WAIT，全部完成返回 None"""
+        with self.lock:
+            self._expire()
+            while self.pending:
+                shard_id = self.pending.popleft()
+                if shard_id not in self.results:
+                    self.leases[shard_id] = (worker, time.monotonic() + self.lease_timeout)
+                    return self.shards[shard_id]
+            return None if len(self.results) == len(self.shards) else self.WAIT
+
+    def heartbeat(self, worker):
+        """为该工作者持有的所有分片续租"""
+        with self.lock:
+            deadline = time.monotonic() + self.lease_timeout
+            for shard_id, (holder, _) in list(self.leases.items()):
+                if holder == worker:
+                    self.leases[shard_id] = (worker, deadline)
+
+    def submit(self, worker, shard_id, result):
+        with self.lock:
+            self.leases.pop(shard_id, None)
+            self.results.setdefault(shard_id, result)
+
+    def status(self):
+        with self.lock:
+            self._expire()
+            return {'total': len(self.shards), 'done': len(self.results),
+                    'leased': len(self.leases), 'reassigned': self.reassigned}
+
+    def collect(self):
+        with self.lock:
+            return dict(self.results)
+
+_queue = None
+
+def _init_queue(shards, lease_timeout):
+    global _queue
+    _queue = ShardQueue(shards, lease_timeout)
+
+def _get_queue():
+    return _queue
+
+class _QueueManager(BaseManager):
+    pass
+
+_QueueManager.register('shard_queue', callable=_get_queue)
+
+def start_coordinator(shards, authkey, address=('127.0.0.1', 0), lease_timeout=30.0):
+    """在独立的服务进程中启动分片队列，返回 manager（manager.address 为实际监听地址）"""
+    manager = _QueueManager(address=address, authkey=authkey)
+    manager.start(_init_queue, (shards, lease_timeout))
+    return manager
+
+def wait_for_results(manager, shards, poll_interval=0.2, timeout=None, progress=None):
+    """等待所有分片完成并合并结果"""
+    queue = manager.shard_queue()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        status = queue.status()
+        if progress is not None:
+            progress(status)
+        if status['done'] == status['total']:
+            return merge_results(shards, queue.collect()), status
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"等待分片超时：完成 {status['done']}/{status['total']}")
+        time.sleep(poll_interval)
+
+# 工作者
+def run_worker(address, authkey, worker_id=None, heartbeat_interval=2.0, poll_interval=0.2,
+               fail_after=None):
+    """连接协调者，循环领取并执行分片，直到全部完成或协调者退出
+
+    参数:
+    address: 协调者地址 (host, port)
+    authkey: 认证密钥
+    worker_id: 工作者名称，默认为 主机名-进程号-随机串
+    heartbeat_interval: 执行分片期间的续租间隔（秒），应明显小于协调者的租约时长
+    poll_interval: 暂无可领分片时的等待间隔（秒）
+    fail_after: 测试用，完成这么多分片后在下一片中途直接退出，模拟工作者崩溃
+
+    返回:
+    completed: 本工作者完成的分片数
+    """
+    worker_id = worker_id or f"{os.uname().nodename}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    manager = _QueueManager(address=address, authkey=authkey)
+    manager.connect()
+    queue = manager.shard_queue()
+    completed = 0
+    while True:
+        try:
+            shard = queue.get(worker_id)
+        except (EOFError, ConnectionError):
+            break  # 协调者已退出
+        if shard is None:
+            break
+        if shard == ShardQueue.WAIT:
+            time.sleep(poll_interval)
+            continue
+        if fail_after is not None and completed >= fail_after:
+            os._exit(1)
+
+        # 执行期间由后台线程续租（代理对象不能跨线程共享，续租线程使用独立连接）
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(address, authkey, worker_id, heartbeat_interval, stop),
+                                daemon=True)
+        beat.start()
+        try:
+            result = run_shard(shard)
+        finally:
+            stop.set()
+            beat.join()
+        try:
+            queue.submit(worker_id, shard['id'], result)
+        except (EOFError, ConnectionError):
+            break
+        completed += 1
+    return completed
+
+def _heartbeat(address, authkey, worker_id, interval, stop):
+    manager = _QueueManager(address=address, authkey=authkey)
+    manager.connect()
+    queue = manager.shard_queue()
+    while not stop.wait(interval):
+        try:
+            queue.heartbeat(worker_id)
+        except (EOFError, ConnectionError):
+            return
+
+# 本机多进程运行
+def run_local(shards, num_workers=None, lease_timeout=10.0, fail_after=None, timeout=None):
+    """在本机启动协调者和若干工作者进程运行分片，用于测试和单机使用
+
+    参数:
+    shards: make_threshold_shards / make_capital_shards 生成的分片
+    num_workers: 工作者进程数，默认为 CPU 核数
+    lease_timeout: 分片租约时长（秒）
+    fail_after: 测试用，第一个工作者完成这么多分片后崩溃，其分片由其他工作者接手
+
+    返回:
+    merged: merge_results 的合并结果
+    status: 分片统计，reassigned 为因租约过期重新分配的次数
+    """
+    num_workers = num_workers or os.cpu_count()
+    authkey = secrets.token_bytes(32)
+    manager = start_coordinator(shards, authkey, lease_timeout=lease_timeout)
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(manager.address, authkey),
+                                kwargs={'fail_after': fail_after if i == 0 else None,
+                                        'heartbeat_interval': lease_timeout / 4})
+        for i in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        return wait_for_results(manager, shards, timeout=timeout)
+    finally:
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        manager.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="二十一点模拟的协调者/工作者分布式运行")
+    parser.add_argument("role", choices=['coordinator', 'worker', 'local', 'check'],
+                        help="运行角色；check 检查分发合并后的资本分片与单进程模拟一致")
+    parser.add_argument("--task", choices=['thresholds', 'capital'], default='thresholds', help="模拟任务")
+    parser.add_argument("--host", default='127.0.0.1', help="协调者监听/连接的地址")
+    parser.add_argument("--port", type=int, default=50500, help="协调者端口")
+    parser.add_argument("--authkey", default=os.environ.get(AUTHKEY_ENV),
+                        help=f"认证密钥（默认读取环境变量 {AUTHKEY_ENV}）；协调者只监听本机时可省略，自动随机生成")
+    parser.add_argument("--num-games", type=int, default=1000000, help="thresholds: 每个阈值的局数")
+    parser.add_argument("--num-paths", type=int, default=100000, help="capital: 资本路径数")
+    parser.add_argument("--shard-size", type=int, help="每个分片的局数/路径数")
+    parser.add_argument("--lease-timeout", type=float, help="分片租约时长（秒），默认 30，check 默认 2")
+    parser.add_argument("--workers", type=int, help="local/check: 工作者进程数")
+    parser.add_argument("--fail-after", type=int, help="测试用：工作者完成这么多分片后崩溃")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    if args.role == 'check':
+        check = check_capital_shards(args.seed, num_workers=args.workers or 3,
+                                     fail_after=1 if args.fail_after is None else args.fail_after,
+                                     lease_timeout=args.lease_timeout or 2.0)
+        print(f"分发合并后与单进程结果一致: {check['identical']}（重新分配 {check['reassigned']} 次）")
+        print(f"破产概率: 模拟 {check['ruin_probability']*100:.2f}% ± {check['std_error']*100:.2f}%，"
+              f"精确 {check['exact_ruin_probability']*100:.2f}%")
+        raise SystemExit(0 if check['identical'] else 1)
+
+    if args.authkey is None and args.role == 'worker':
+        parser.error(f"工作者需要协调者的认证密钥：--authkey 或环境变量 {AUTHKEY_ENV}")
+    if args.authkey is None and args.role == 'coordinator' and not is_loopback(args.host):
+        parser.error(f"监听非本机地址 {args.host} 时必须用 --authkey 或环境变量 {AUTHKEY_ENV} 显式给出认证密钥")
+    if args.authkey is None and args.role == 'coordinator':
+        args.authkey = secrets.token_hex(16)
+        print(f"已生成认证密钥，工作者请使用: --authkey {args.authkey}")
+    authkey = None if args.authkey is None else args.authkey.encode()
+
+    if args.role == 'worker':
+        completed = run_worker((args.host, args.port), authkey, fail_after=args.fail_after)
+        print(f"完成 {completed} 个分片")
+        return
+
+    if args.task == 'thresholds':
+        shards = make_threshold_shards(num_games=args.num_games, shard_size=args.shard_size or 100000, seed=args.seed)
+    else:
+        shards = make_capital_shards(num_paths=args.num_paths, shard_size=args.shard_size or 10000, seed=args.seed)
+
+    args.lease_timeout = args.lease_timeout or 30.0
+    start = time.perf_counter()
+    if args.role == 'local':
+        merged, status = run_local(shards, args.workers, args.lease_timeout, args.fail_after)
+    else:
+        manager = start_coordinator(shards, authkey, (args.host, args.port), args.lease_timeout)
+        print(f"协调者监听 {args.host}:{args.port}，共 {len(shards)} 个分片，等待工作者...")
+        try:
+            merged, status = wait_for_results(manager, shards)
+        finally:
+            manager.shutdown()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n完成 {status['total']} 个分片，重新分配 {status['reassigned']} 次，用时 {elapsed:.1f} 秒\n")
+    if args.task == 'thresholds':
+        for threshold, result in merged.items():
+            print(f"阈值 {threshold}: 胜率 {result['win_rate']*100:.2f}%, "
+                  f"期望收益 {result['expected_return']*100:.2f}% ({result['hands']} 局)")
+    else:
+        print(f"破产概率: {merged['ruin_probability']*100:.2f}% ({merged['paths']} 条路径)")
+        print(f"平均最终资本: {merged['mean_final_capital']:.2f}")
+
+if __name__ == "__main__":
+    main()
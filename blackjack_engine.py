@@ -0,0 +1,240 @@
+import random
+from dataclasses import dataclass
+from functools import lru_cache
+
+# 定义牌的值
+card_values = {
+    '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10,
+    'J': 10, 'Q': 10, 'K': 10, 'A': 11  # A初始值为11，需要时可变为1
+}
+
+# 定义花色
+suits = ['♠', '♥', '♦', '♣']
+
+# 牌桌规则
+@dataclass(frozen=True)
+class Rules:
+    """牌桌规则，由游戏引擎、批量引擎和精确计算共享
+
+    规则对象不可变且可哈希，各模块按规则编译的查找表（庄家要牌表、赔付表、庄家结果分布）都以它为缓存键。
+
+    属性:
+    decks: 牌副数，None 表示无限副牌
+    dealer_hits_soft_17: 庄家软17是否要牌，True 为 H17，False 为 S17
+    blackjack_payout: 天然二十一点（首两张牌为21点）的赔率，如 1.5 为 3:2，1.2 为 6:5
+    double_down: 是否允许首两张牌时加倍
+    surrender: 是否允许首两张牌时投降（输掉一半赌注）
+    """
+    decks: object = 1
+    dealer_hits_soft_17: bool = False
+    blackjack_payout: float = 1.5
+    double_down: bool = True
+    surrender: bool = False
+
+    def dealer_hits(self, total, soft):
+        """庄家点数为 total（soft 表示有按11点计的A）时是否要牌"""
+        return total < 17 or (self.dealer_hits_soft_17 and total == 17 and bool(soft))
+
+DEFAULT_RULES = Rules()
+
+# 结算结果：天然二十一点、胜、平、负、投降
+OUTCOMES = ('blackjack', 'win', 'push', 'loss', 'surrender')
+
+# 各结算结果对应的游戏结果编码 (1: 玩家胜, -1: 玩家负, 0: 平局)
+OUTCOME_RESULTS = {'blackjack': 1, 'win': 1, 'push': 0, 'loss': -1, 'surrender': -1}
+
+@lru_cache(maxsize=None)
+def payout_table(rules):
+    """按规则编译的赔付表：结算结果 -> 以下注金额为单位的输赢"""
+    return {'blackjack': rules.blackjack_payout, 'win': 1, 'push': 0, 'loss': -1, 'surrender': -0.5}
+
+# 定义牌组
+class Deck:
+    """牌组；decks 为 None 时为无限副牌，每张牌从一副牌中有放回地抽取"""
+    def __init__(self, decks=1):
+        self.decks = decks
+        self.reset()
+
+    def reset(self):
+        """重置牌组为 decks 副新牌"""
+        self.cards = []
+        for _ in range(1 if self.decks is None else self.decks):
+            for suit in suits:
+                for card, _ in card_values.items():
+                    self.cards.append(card + suit)
+        random.shuffle(self.cards)
+
+    def deal(self):
+        """发一张牌"""
+        if self.decks is None:
+            return random.choice(self.cards)
+        if not self.cards:
+            self.reset()
+        return self.cards.pop()
+
+# 计算手牌点数
+def hand_total(hand):
+    """计算手牌的点数和是否为软牌（有按11点计的A），考虑A可以是1或11"""
+    value = 0
+    aces = 0
+
+    for card in hand:
+        card_value = card[:-1]  # 去掉花色
+        if card_value == 'A':
+            aces += 1
+            value += 11
+        else:
+            value += card_values[card_value]
+
+    # 如果点数超过21且有A，则将A的值从11改为1
+    while value > 21 and aces > 0:
+        value -= 10  # 11 - 1 = 10
+        aces -= 1
+
+    return value, aces > 0
+
+def calculate_hand_value(hand):
+    """计算手牌的点数，考虑A可以是1或11"""
+    return hand_total(hand)[0]
+
+# 庄家策略（按规则：小于17点必须要牌，H17 时软17也要牌）
+def dealer_strategy(hand_value, soft=False, rules=DEFAULT_RULES):
+    """庄家策略：点数小于17点时要牌，规则为 H17 时软17也要牌，否则停牌"""
+    return rules.dealer_hits(hand_value, soft)
+
+# 单局游戏状态机
+class GameEngine:
+    """不依赖界面的单局游戏状态机：发牌 -> 玩家回合 -> 庄家回合 -> 结算
+
+    result 与 play_game 一致 (1: 玩家胜, -1: 玩家负, 0: 平局)，结算前为 None；
+    outcome 为 OUTCOMES 中的结算结果，决定 payout 的赔付；actions 为玩家本局的操作序列
+    """
+    IDLE = 'idle'
+    PLAYER_TURN = 'player_turn'
+    SETTLED = 'settled'
+
+    def __init__(self, deck=None, rules=DEFAULT_RULES):
+        self.rules = rules
+        self.deck = Deck(rules.decks) if deck is None else deck
+        self.player_hand = []
+        self.dealer_hand = []
+        self.state = self.IDLE
+        self.result = None
+        self.outcome = None
+        self.doubled = False
+        self.actions = []
+
+    @property
+    def player_value(self):
+        return calculate_hand_value(self.player_hand)
+
+    @property
+    def dealer_value(self):
+        return calculate_hand_value(self.dealer_hand)
+
+    @property
+    def dealer_bust(self):
+        return self.state == self.SETTLED and self.dealer_value > 21
+
+    @property
+    def can_double(self):
+        """规则允许且玩家只有首两张牌时可以加倍"""
+        return self.rules.double_down and self.state == self.PLAYER_TURN and len(self.player_hand) == 2
+
+    @property
+    def can_surrender(self):
+        """规则允许且玩家只有首两张牌时可以投降"""
+        return self.rules.surrender and self.state == self.PLAYER_TURN and len(self.player_hand) == 2
+
+    def deal(self, reset_deck=False):
+        """开始新的一局：玩家和庄家各发两张牌，庄家第二张为明牌
+
+        任一方为天然二十一点时直接结算（相当于庄家先检查暗牌）
+        """
+        if reset_deck:
+            self.deck.reset()
+        self.player_hand = [self.deck.deal(), self.deck.deal()]
+        self.dealer_hand = [self.deck.deal(), self.deck.deal()]
+        self.state = self.PLAYER_TURN
+        self.result = None
+        self.outcome = None
+        self.doubled = False
+        self.actions = []
+
+        player_natural = self.player_value == 21
+        dealer_natural = self.dealer_value == 21
+        if player_natural and dealer_natural:
+            self._settle('push')
+        elif player_natural:
+            self._settle('blackjack')
+        elif dealer_natural:
+            self._settle('loss')
+
+    def hit(self):
+        """玩家要牌，爆牌则直接结算为负，返回新牌"""
+        if self.state != self.PLAYER_TURN:
+            raise RuntimeError("当前不是玩家回合，不能要牌")
+        self.actions.append('hit')
+        return self._draw()
+
+    def double(self):
+        """玩家加倍：赌注翻倍，只再要一张牌后停牌，返回新牌"""
+        if not self.can_double:
+            raise RuntimeError("当前不能加倍")
+        self.doubled = True
+        self.actions.append('double')
+        card = self._draw()
+        if self.state == self.PLAYER_TURN:
+            self._dealer_turn()
+        return card
+
+    def surrender(self):
+        """玩家投降，输掉一半赌注"""
+        if not self.can_surrender:
+            raise RuntimeError("当前不能投降")
+        self.actions.append('surrender')
+        self._settle('surrender')
+
+    def stand(self):
+        """玩家停牌，庄家按规则要牌后结算，返回庄家新要的牌"""
+        if self.state != self.PLAYER_TURN:
+            raise RuntimeError("当前不是玩家回合，不能停牌")
+        self.actions.append('stand')
+        return self._dealer_turn()
+
+    def _draw(self):
+        """给玩家发一张牌，爆牌则直接结算为负"""
+        card = self.deck.deal()
+        self.player_hand.append(card)
+        if self.player_value > 21:
+            self._settle('loss')
+        return card
+
+    def _dealer_turn(self):
+        num_cards = len(self.dealer_hand)
+        dealer_value, soft = hand_total(self.dealer_hand)
+        while self.rules.dealer_hits(dealer_value, soft):
+            self.dealer_hand.append(self.deck.deal())
+            dealer_value, soft = hand_total(self.dealer_hand)
+
+        # 判定胜负
+        player_value = self.player_value
+        if dealer_value > 21 or player_value > dealer_value:
+            self._settle('win')
+        elif player_value < dealer_value:
+            self._settle('loss')
+        else:
+            self._settle('push')
+        return self.dealer_hand[num_cards:]
+
+    def _settle(self, outcome):
+        self.outcome = outcome
+        self.result = OUTCOME_RESULTS[outcome]
+        self.state = self.SETTLED
+
+    def payout(self, bet_amount):
+        """按结算结果和规则的赔付表计算本局输赢金额（加倍时按双倍赌注）"""
+        if self.state != self.SETTLED:
+            return 0
+        amount = payout_table(self.rules)[self.outcome] * bet_amount * (2 if self.doubled else 1)
+        return int(amount) if amount == int(amount) else amount
@@ -0,0 +1,301 @@
+from functools import lru_cache
+
+import numpy as np
+
+from blackjack_engine import Rules, OUTCOMES, OUTCOME_RESULTS, payout_table
+
+# 点数编码：0 表示 A，1~8 表示 2~9，9 表示 10、J、Q、K
+RANKS = ['A', '2', '3', '4', '5', '6', '7', '8', '9', '10']
+RANK_VALUES = np.array([11, 2, 3, 4, 5, 6, 7, 8, 9, 10])  # A初始值为11，需要时可变为1
+RANK_COUNTS = np.array([4, 4, 4, 4, 4, 4, 4, 4, 4, 16])  # 一副牌中各点数的张数
+RANK_PROBS = RANK_COUNTS / RANK_COUNTS.sum()
+
+# 将牌转换为点数编码
+def card_rank(card):
+    """把 '10♠' 形式的牌转换为点数编码"""
+    value = card[:-1]  # 去掉花色
+    if value == 'A':
+        return 0
+    if value in ('10', 'J', 'Q', 'K'):
+        return 9
+    return int(value) - 1
+
+# 批量牌组
+def new_shoe(num_hands, decks=1):
+    """为每一局准备一副新牌，返回形状为 (num_hands, 10) 的各点数剩余张数
+
+    decks=None 表示无限副牌（每张牌独立同分布）
+    """
+    if decks is None:
+        return None
+    return np.tile(RANK_COUNTS * decks, (num_hands, 1))
+
+def draw(rng, shoe, rows):
+    """为 rows 指定的各局各发一张牌（不放回），返回点数编码数组"""
+    if shoe is None:
+        return rng.choice(10, size=len(rows), p=RANK_PROBS)
+    cumulative = shoe[rows].cumsum(axis=1)
+    u = rng.random(len(rows)) * cumulative[:, -1]
+    ranks = (cumulative <= u[:, None]).sum(axis=1)
+    shoe[rows, ranks] -= 1
+    return ranks
+
+# 批量计算加牌后的点数
+def add_card(total, soft, ranks):
+    """在点数 total（其中 soft 张A按11点计）上加一张牌，返回新的 (total, soft)"""
+    total = total + RANK_VALUES[ranks]
+    soft = soft + (ranks == 0)
+    # 一次加牌最多需要把两张A从11改为1（如 A+10 再要一张A）
+    for _ in range(2):
+        fix = (total > 21) & (soft > 0)
+        total[fix] -= 10
+        soft[fix] -= 1
+    return total, soft
+
+# 玩家策略（查表形式）
+def threshold_policy(threshold=16):
+    """固定阈值策略的查表形式
+
+    返回:
+    policy: 形状为 (2, 22, 10) 的布尔表，policy[是否软牌, 点数, 庄家明牌] 为 True 表示要牌
+    """
+    policy = np.zeros((2, 22, 10), dtype=bool)
+    policy[:, :min(threshold, 20) + 1, :] = True
+    return policy
+
+# 按规则编译的查找表
+@lru_cache(maxsize=None)
+def compile_rules(rules):
+    """把规则编译成批量引擎使用的查找表，每种规则只编译一次
+
+    返回:
+    tables: 字典
+        dealer_hit: 形状为 (2, 32) 的布尔表，dealer_hit[是否软牌, 点数] 为 True 表示庄家要牌
+        payouts: 按 OUTCOMES 顺序的赔付数组（以下注金额为单位）
+        results: 按 OUTCOMES 顺序的游戏结果编码数组
+    """
+    dealer_hit = np.array([[rules.dealer_hits(total, soft) for total in range(32)] for soft in (False, True)])
+    payouts = payout_table(rules)
+    tables = {
+        'dealer_hit': dealer_hit,
+        'payouts': np.array([payouts[outcome] for outcome in OUTCOMES], dtype=float),
+        'results': np.array([OUTCOME_RESULTS[outcome] for outcome in OUTCOMES]),
+    }
+    for table in tables.values():
+        table.setflags(write=False)
+    return tables
+
+# 批量模拟
+def play_hands(num_hands, policy, decks=1, rng=None, rules=None, initial=None):
+    """向量化地同时模拟多局游戏，规则与 blackjack.play_game 相同
+
+    参数:
+    num_hands: 模拟的局数
+    policy: 玩家策略表，见 threshold_policy
+    decks: 每局使用的牌副数，None 表示无限副牌
+    rng: numpy 随机数生成器
+    rules: blackjack_engine.Rules，给定时其牌副数覆盖 decks
+    initial: 形状为 (num_hands, 3) 的点数编码数组，依次为玩家的两张牌和庄家明牌；
+             给定时这三张牌先从各局牌组中取出，其余的牌（含庄家暗牌）照常发
+
+    返回:
+    outcome: 包含各局结果数组的字典
+        result: 游戏结果 (1: 玩家胜, -1: 玩家负, 0: 平局)
+        outcome: 结算结果在 OUTCOMES 中的编号
+        payout: 按规则赔付表的每注输赢
+        player_total / dealer_total: 双方最终点数
+        player_bust / dealer_bust: 双方是否爆牌
+        up: 庄家明牌的点数编码
+        num_hits: 玩家要牌次数
+    """
+    rules = Rules(decks=decks) if rules is None else rules
+    tables = compile_rules(rules)
+    rng = np.random.default_rng() if rng is None else rng
+    shoe = new_shoe(num_hands, rules.decks)
+    rows = np.arange(num_hands)
+    zeros = np.zeros(num_hands, dtype=np.int64)
+
+    # 初始发牌：玩家两张，庄家两张（第二张为明牌）
+    if initial is None:
+        first, second = draw(rng, shoe, rows), draw(rng, shoe, rows)
+        hole = draw(rng, shoe, rows)
+        up = draw(rng, shoe, rows)
+    else:
+        first, second, up = (np.asarray(initial[:, k], dtype=np.intp) for k in range(3))
+        if shoe is not None:
+            for ranks in (first, second, up):
+                shoe[rows, ranks] -= 1
+        hole = draw(rng, shoe, rows)
+    player_total, player_soft = add_card(zeros, zeros, first)
+    player_total, player_soft = add_card(player_total, player_soft, second)
+    dealer_total, dealer_soft = add_card(zeros, zeros, hole)
+    dealer_total, dealer_soft = add_card(dealer_total, dealer_soft, up)
+    num_hits = zeros.copy()
+
+    # 天然二十一点直接结算，双方都不再要牌
+    player_natural = player_total == 21
+    dealer_natural = dealer_total == 21
+    natural = player_natural | dealer_natural
+
+    # 玩家回合
+    active = ~natural & (player_total < 21) & policy[(player_soft > 0).astype(np.intp), player_total, up]
+    while active.any():
+        rows = np.flatnonzero(active)
+        total, soft = add_card(player_total[rows], player_soft[rows], draw(rng, shoe, rows))
+        player_total[rows] = total
+        player_soft[rows] = soft
+        num_hits[rows] += 1
+        active[rows] = (total < 21) & policy[(soft > 0).astype(np.intp), np.minimum(total, 21), up[rows]]
+    player_bust = player_total > 21
+
+    # 庄家回合（玩家爆牌的局直接判负，庄家不再要牌）
+    dealer_hit = tables['dealer_hit']
+    active = ~player_bust & ~natural & dealer_hit[(dealer_soft > 0).astype(np.intp), dealer_total]
+    while active.any():
+        rows = np.flatnonzero(active)
+        total, soft = add_card(dealer_total[rows], dealer_soft[rows], draw(rng, shoe, rows))
+        dealer_total[rows] = total
+        dealer_soft[rows] = soft
+        active[rows] = dealer_hit[(soft > 0).astype(np.intp), total]
+    dealer_bust = dealer_total > 21
+
+    # 判定胜负
+    outcome = np.where(player_total > dealer_total, OUTCOMES.index('win'),
+                       np.where(player_total < dealer_total, OUTCOMES.index('loss'), OUTCOMES.index('push')))
+    outcome[dealer_bust] = OUTCOMES.index('win')
+    outcome[player_bust] = OUTCOMES.index('loss')
+    outcome[player_natural & ~dealer_natural] = OUTCOMES.index('blackjack')
+
+    return {
+        'result': tables['results'][outcome],
+        'outcome': outcome,
+        'payout': tables['payouts'][outcome],
+        'player_total': player_total,
+        'dealer_total': dealer_total,
+        'player_bust': player_bust,
+        'dealer_bust': dealer_bust,
+        'up': up,
+        'num_hits': num_hits,
+    }
+
+# 共用牌流的多策略批量模拟
+class _CardStream:
+    """每局发完初始四张牌后的共用牌流，按需向后补牌"""
+    def __init__(self, rng, shoe, num_hands, capacity=16):
+        self.rng = rng
+        self.shoe = shoe
+        self.cards = np.zeros((num_hands, capacity), dtype=np.int8)
+        self.length = np.zeros(num_hands, dtype=np.int64)
+        self._short = np.zeros(num_hands, dtype=bool)
+
+    def at(self, rows, positions):
+        """返回各局牌流中 positions 处的牌，不足时向后补牌（rows 可重复）"""
+        while True:
+            self._short[rows[self.length[rows] <= positions]] = True
+            short = np.flatnonzero(self._short)
+            if len(short) == 0:
+                return self.cards[rows, positions].astype(np.intp)
+            self._short[short] = False
+            if self.length[short].max() >= self.cards.shape[1]:
+                self.cards = np.concatenate([self.cards, np.zeros_like(self.cards)], axis=1)
+            self.cards[short, self.length[short]] = draw(self.rng, self.shoe, short)
+            self.length[short] += 1
+
+def play_policies(num_hands, policies, decks=1, rng=None, rules=None):
+    """一次模拟同时评估多个玩家策略：每局只发一次牌，各策略共用同一条牌流
+
+    各策略的玩家先共用发牌后的牌流要牌，某个策略停牌后，它的庄家从牌流的下一张开始要牌；
+    停在同一张牌的策略共用同一个庄家结果，只在要牌决定不同处分叉。
+    每个策略单独看与 play_hands 的分布完全相同，策略之间使用共同随机数，比较差异时方差更小。
+
+    参数:
+    num_hands: 模拟的局数
+    policies: 策略名 -> 玩家策略表的字典，见 threshold_policy
+    decks: 每局使用的牌副数，None 表示无限副牌
+    rng: numpy 随机数生成器
+    rules: blackjack_engine.Rules，给定时其牌副数覆盖 decks
+
+    返回:
+    outcomes: 策略名 -> 结果数组字典，字段与 play_hands 相同
+    """
+    rules = Rules(decks=decks) if rules is None else rules
+    tables = compile_rules(rules)
+    rng = np.random.default_rng() if rng is None else rng
+    names = list(policies)
+    stacked = np.stack([policies[name] for name in names])
+    shoe = new_shoe(num_hands, rules.decks)
+    rows = np.arange(num_hands)
+    zeros = np.zeros(num_hands, dtype=np.int64)
+
+    # 初始发牌（顺序与 play_hands 相同）
+    total, soft = add_card(zeros, zeros, draw(rng, shoe, rows))
+    total, soft = add_card(total, soft, draw(rng, shoe, rows))
+    dealer_start, dealer_start_soft = add_card(zeros, zeros, draw(rng, shoe, rows))
+    up = draw(rng, shoe, rows)
+    dealer_start, dealer_start_soft = add_card(dealer_start, dealer_start_soft, up)
+    player_natural = total == 21
+    dealer_natural = dealer_start == 21
+    natural = player_natural | dealer_natural
+    stream = _CardStream(rng, shoe, num_hands)
+
+    # 玩家回合：只要还有策略在要牌，就从牌流发下一张；各策略只记录自己的要牌数
+    history = [total.copy()]  # history[k]: 要 k 张牌后的点数
+    num_hits = np.zeros((len(names), num_hands), dtype=np.int8)
+    hitting = ~natural & (total < 21) & stacked[:, (soft > 0).astype(np.intp), total, up]
+    position = 0
+    while True:
+        rows = np.flatnonzero(hitting.any(axis=0))
+        if len(rows) == 0:
+            break
+        total[rows], soft[rows] = add_card(total[rows], soft[rows], stream.at(rows, np.full(len(rows), position)))
+        history.append(total.copy())
+        still = hitting[:, rows]
+        num_hits[:, rows] += still
+        hitting[:, rows] = still & (total[rows] < 21) & stacked[:, (soft[rows] > 0).astype(np.intp),
+                                                                np.minimum(total[rows], 21), up[rows]]
+        position += 1
+    player_total = np.stack(history)[num_hits, np.arange(num_hands)]
+    player_bust = player_total > 21
+
+    # 庄家回合：每个 (局, 玩家要牌数) 只模拟一次
+    dealer_hit = tables['dealer_hit']
+    plays = ~player_bust & ~natural & dealer_hit[(dealer_start_soft > 0).astype(np.intp), dealer_start]
+    play_keys = np.flatnonzero(plays) % num_hands * (position + 1) + num_hits[plays]
+    branch = np.zeros(num_hands * (position + 1), dtype=np.int32)
+    branch[play_keys] = 1
+    keys = np.flatnonzero(branch)
+    branch[keys] = np.arange(len(keys))
+    branch_rows, branch_pos = keys // (position + 1), keys % (position + 1)
+    branch_total, branch_soft = dealer_start[branch_rows], dealer_start_soft[branch_rows]
+    active = np.ones(len(keys), dtype=bool)
+    while active.any():
+        idx = np.flatnonzero(active)
+        t, s = add_card(branch_total[idx], branch_soft[idx], stream.at(branch_rows[idx], branch_pos[idx]))
+        branch_total[idx], branch_soft[idx] = t, s
+        branch_pos[idx] += 1
+        active[idx] = dealer_hit[(s > 0).astype(np.intp), t]
+    dealer_total = np.tile(dealer_start, (len(names), 1))
+    dealer_total[plays] = branch_total[branch[play_keys]]
+    dealer_bust = dealer_total > 21
+
+    # 判定胜负
+    outcome = np.where(player_total > dealer_total, OUTCOMES.index('win'),
+                       np.where(player_total < dealer_total, OUTCOMES.index('loss'), OUTCOMES.index('push')))
+    outcome[dealer_bust] = OUTCOMES.index('win')
+    outcome[player_bust] = OUTCOMES.index('loss')
+    outcome[:, player_natural & ~dealer_natural] = OUTCOMES.index('blackjack')
+
+    return {
+        name: {
+            'result': tables['results'][outcome[i]],
+            'outcome': outcome[i],
+            'payout': tables['payouts'][outcome[i]],
+            'player_total': player_total[i],
+            'dealer_total': dealer_total[i],
+            'player_bust': player_bust[i],
+            'dealer_bust': dealer_bust[i],
+            'up': up,
+            'num_hits': num_hits[i].astype(np.int64),
+        }
+        for i, name in enumerate(names)
+    }
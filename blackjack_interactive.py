@@ -10,6 +10,13 @@ import io
 import os
 import platform
 import time
+from collections import deque
+from streamlit.errors import StreamlitAPIException
+
+import blackjack_fast
+import blackjack_odds
+import blackjack_warmup
+from blackjack_engine import card_values, suits, Deck, GameEngine, Rules, DEFAULT_RULES
 
 
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']
@@ -23,59 +30,79 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# 定义牌的值
-card_values = {
-    '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10,
-    'J': 10, 'Q': 10, 'K': 10, 'A': 11  # A初始值为11，需要时可变为1
-}
-
-# 定义花色
-suits = ['♠', '♥', '♦', '♣']
-
-# 定义牌组
-class Deck:
-    def __init__(self):
-        self.reset()
-    
-    def reset(self):
-        """重置牌组为一副新牌"""
-        self.cards = []
-        for suit in suits:
-            for card, _ in card_values.items():
-                self.cards.append(card + suit)
-        random.shuffle(self.cards)
-    
-    def deal(self):
-        """发一张牌"""
-        if not self.cards:
-            self.reset()
-        return self.cards.pop()
-
-# 计算手牌点数
-def calculate_hand_value(hand):
-    """计算手牌的点数，考虑A可以是1或11"""
-    value = 0
-    aces = 0
-    
-    for card in hand:
-        card_value = card[:-1]  # 去掉花色
-        if card_value == 'A':
-            aces += 1
-            value += 11
+# 有界的资本历史记录
+class CapitalHistory:
+    """资本历史：最近的点原样保存在环形缓冲区中，更早的点按桶聚合成最小/最大值摘要，
+    因此无论玩了多少局，内存占用和绘图点数都有固定上限"""
+    def __init__(self, initial_capital, recent_size=100, summary_size=100):
+        self.recent = deque(maxlen=recent_size)  # (局数, 资本)
+        self.summary_size = summary_size
+        self.bucket_width = 1  # 每个摘要桶覆盖的局数，桶满时翻倍
+        self.buckets = []  # [桶编号, 最小值局数, 最小值, 最大值局数, 最大值]
+        self.count = 0
+        self.append(initial_capital)
+    
+    def __len__(self):
+        return self.count
+    
+    @property
+    def last(self):
+        """最近一次记录的资本"""
+        return self.recent[-1][1]
+    
+    def append(self, capital):
+        """追加一局后的资本，挤出环形缓冲区的点并入摘要"""
+        if len(self.recent) == self.recent.maxlen:
+            self._summarize(*self.recent[0])
+        self.recent.append((self.count, capital))
+        self.count += 1
+    
+    def extend(self, capitals):
+        """批量追加资本记录"""
+        for capital in capitals:
+            self.append(capital)
+    
+    def _summarize(self, round_index, capital):
+        """将一个点并入最小/最大值摘要"""
+        key = round_index // self.bucket_width
+        if self.buckets and self.buckets[-1][0] == key:
+            bucket = self.buckets[-1]
+            if capital < bucket[2]:
+                bucket[1], bucket[2] = round_index, capital
+            if capital > bucket[4]:
+                bucket[3], bucket[4] = round_index, capital
         else:
-            value += card_values[card_value]
-    
-    # 如果点数超过21且有A，则将A的值从11改为1
-    while value > 21 and aces > 0:
-        value -= 10  # 11 - 1 = 10
-        aces -= 1
-    
-    return value
-
-# 庄家策略（固定规则：小于17点必须要牌）
-def dealer_strategy(hand_value):
-    """庄家策略：点数小于17点时要牌，否则停牌"""
-    return hand_value < 17
+            self.buckets.append([key, round_index, capital, round_index, capital])
+        
+        # 摘要桶数超过上限时，相邻两桶合并，分辨率减半
+        if len(self.buckets) > self.summary_size:
+            self.bucket_width *= 2
+            merged = []
+            for bucket in self.buckets:
+                key = bucket[0] // 2
+                if merged and merged[-1][0] == key:
+                    last = merged[-1]
+                    if bucket[2] < last[2]:
+                        last[1], last[2] = bucket[1], bucket[2]
+                    if bucket[4] > last[4]:
+                        last[3], last[4] = bucket[3], bucket[4]
+                else:
+                    merged.append([key] + bucket[1:])
+            self.buckets = merged
+    
+    def points(self):
+        """返回用于绘图的 (局数, 资本) 序列，点数不超过 2 * summary_size + recent_size"""
+        rounds = []
+        capitals = []
+        for _, min_round, min_capital, max_round, max_capital in self.buckets:
+            # 按局数顺序输出每个桶的最小值和最大值点
+            for r, c in sorted({(min_round, min_capital), (max_round, max_capital)}):
+                rounds.append(r)
+                capitals.append(c)
+        for r, c in self.recent:
+            rounds.append(r)
+            capitals.append(c)
+        return rounds, capitals
 
 # 计算爆牌概率
 def calculate_bust_probability(hand_value):
@@ -119,109 +146,54 @@ def calculate_hit_expected_value(hand_value):
     return expected_value
 
 # 计算胜率
-def calculate_win_probability(player_value, dealer_card):
-    """计算当前玩家点数和庄家明牌下的胜率"""
-    if player_value > 21:  # 玩家已爆牌
-        return 0.0
-    
-    # 庄家明牌的值
-    dealer_card_value = dealer_card[:-1]  # 去掉花色
-    if dealer_card_value == 'A':
-        dealer_value = 11
-    else:
-        dealer_value = card_values[dealer_card_value]
-    
-    # 模拟庄家的可能结果
-    wins = 0
-    total_simulations = 1000
-    
-    for _ in range(total_simulations):
-        # 创建一副新牌
-        deck = Deck()
-        # 移除已知的牌
-        deck.cards = [card for card in deck.cards if card != dealer_card]
-        
-        # 庄家初始手牌
-        dealer_hand = [dealer_card]
-        dealer_hand.append(deck.deal())
-        current_dealer_value = calculate_hand_value(dealer_hand)
-        
-        # 庄家按规则要牌
-        while dealer_strategy(current_dealer_value):
-            dealer_hand.append(deck.deal())
-            current_dealer_value = calculate_hand_value(dealer_hand)
-        
-        # 判断胜负
-        if current_dealer_value > 21 or player_value > current_dealer_value:
-            wins += 1
-        elif player_value == current_dealer_value:
-            wins += 0.5  # 平局算半胜
-    
-    return (wins / total_simulations) * 100
+def calculate_win_probability(player_value, dealer_card, rules=DEFAULT_RULES):
+    """计算当前玩家点数和庄家明牌下的胜率（百分比，平局算半胜），使用按规则缓存的精确分布"""
+    return blackjack_odds.win_probability(player_value, blackjack_fast.card_rank(dealer_card), rules=rules) * 100
+
+# 牌面样式表：每次整页渲染只发送一次（见 main），每张牌只带类名，
+# 片段重跑时沿用页面上已有的样式表
+CARD_CSS = """<style>
+.bj-card{display:inline-block;position:relative;width:60px;height:90px;margin:5px;background:#fff;color:#000;
+border:1px solid #ccc;border-radius:5px;box-shadow:2px 2px 5px rgba(0,0,0,.2);text-align:center}
+.bj-card.r{color:red}
+.bj-card b{position:absolute;font-size:16px}
+.bj-card b:first-child{top:5px;left:5px}
+.bj-card b:last-child{bottom:5px;right:5px}
+.bj-card i{position:absolute;top:50%;left:50%;transform:translate(-50%,-50%);font-size:24px;font-style:normal}
+.bj-card.d{animation:bj-deal .4s ease-out both}
+@keyframes bj-deal{from{opacity:0;transform:translateY(-20px) rotateY(90deg)}to{opacity:1;transform:none}}
+</style>"""
+
+def inject_card_styles():
+    """向页面写入牌面样式表，每次整页运行调用一次"""
+    st.markdown(CARD_CSS, unsafe_allow_html=True)
 
 # 显示牌的函数
-def display_card(card):
-    """美化显示一张牌"""
+def display_card(card, delay=None):
+    """显示一张牌（样式见 CARD_CSS），delay 不为 None 时在浏览器端延迟 delay 秒后以动画显示"""
     suit = card[-1]
     value = card[:-1]
     
-    # 根据花色设置颜色
-    if suit in ['♥', '♦']:
-        color = "red"
-    else:
-        color = "black"
-    
-    # 使用HTML和CSS美化显示
-    card_html = f"""
-    <div style="
-        display: inline-block;
-        width: 60px;
-        height: 90px;
-        background-color: white;
-        border-radius: 5px;
-        border: 1px solid #ccc;
-        margin: 5px;
-        text-align: center;
-        box-shadow: 2px 2px 5px rgba(0,0,0,0.2);
-        position: relative;
-    ">
-        <div style="
-            position: absolute;
-            top: 5px;
-            left: 5px;
-            font-size: 16px;
-            color: {color};
-            font-weight: bold;
-        ">{value}</div>
-        <div style="
-            position: absolute;
-            bottom: 5px;
-            right: 5px;
-            font-size: 16px;
-            color: {color};
-            font-weight: bold;
-        ">{value}</div>
-        <div style="
-            position: absolute;
-            top: 50%;
-            left: 50%;
-            transform: translate(-50%, -50%);
-            font-size: 24px;
-            color: {color};
-        ">{suit}</div>
-    </div>
-    """
-    return card_html
+    # 红色花色加 r 类，动画牌加 d 类并单独设置延迟
+    classes = "bj-card r" if suit in ['♥', '♦'] else "bj-card"
+    if delay is None:
+        return f'<div class="{classes}"><b>{value}</b><i>{suit}</i><b>{value}</b></div>'
+    return (f'<div class="{classes} d" style="animation-delay:{delay:.1f}s">'
+            f'<b>{value}</b><i>{suit}</i><b>{value}</b></div>')
+
+DEAL_ANIMATION_STEP = 0.5  # 相邻两张动画牌之间的间隔（秒）
 
 # 显示手牌的函数
-def display_hand(hand, hide_first=False):
-    """显示一组手牌"""
+def display_hand(hand, hide_first=False, animate=()):
+    """显示一组手牌，animate 中的牌按顺序依次以动画显示"""
     html = ""
+    order = {index: step for step, index in enumerate(animate)}
     for i, card in enumerate(hand):
+        delay = order[i] * DEAL_ANIMATION_STEP if i in order else None
         if i == 0 and hide_first:
-            html += display_card("?")
+            html += display_card("?", delay)
         else:
-            html += display_card(card)
+            html += display_card(card, delay)
     return html
 
 # 生成图表的函数
@@ -256,9 +228,9 @@ def generate_probability_chart(player_value):
     return fig
 
 # 生成胜率图表
-def generate_win_probability_chart(player_value, dealer_card):
+def generate_win_probability_chart(player_value, dealer_card, rules=DEFAULT_RULES):
     """生成当前局面的胜率图表"""
-    win_prob = calculate_win_probability(player_value, dealer_card)
+    win_prob = calculate_win_probability(player_value, dealer_card, rules)
     plt.style.use('default')  # 使用默认样式
     fig, ax = plt.subplots(figsize=(8, 4))
     
@@ -278,271 +250,363 @@ def generate_win_probability_chart(player_value, dealer_card):
     plt.tight_layout()
     return fig
 
-# 主应用函数
-def main():
-    # 设置标题和说明
-    st.title("二十一点 (Blackjack) 交互式模拟")
-    st.markdown("""
-    这是一个二十一点游戏的交互式模拟界面，您可以体验游戏过程并观察不同决策的概率和期望收益变化。
-    
-    **游戏规则**：
-    - 玩家和庄家各发两张牌，庄家只有一张牌可见
-    - 玩家可以选择要牌（Hit）或停牌（Stand）
-    - 玩家点数超过21点则爆牌，自动输掉游戏
-    - 庄家必须在点数小于17时要牌
-    - 点数大者获胜，庄家爆牌则玩家获胜
-    """)
-    
-    # 侧边栏 - 游戏设置
-    st.sidebar.header("游戏设置")
-    initial_capital = st.sidebar.slider("初始资本 (元)", 10, 1000, 100)
-    bet_amount = st.sidebar.slider("下注金额 (元)", 1, 50, 10)
-    
-    # 侧边栏 - 统计信息
-    st.sidebar.header("游戏统计")
-    
-    # 初始化会话状态
-    if 'game_active' not in st.session_state:
-        st.session_state.game_active = False
-    if 'deck' not in st.session_state:
-        st.session_state.deck = Deck()
-    if 'player_hand' not in st.session_state:
-        st.session_state.player_hand = []
-    if 'dealer_hand' not in st.session_state:
-        st.session_state.dealer_hand = []
-    if 'game_result' not in st.session_state:
-        st.session_state.game_result = None
-    if 'capital' not in st.session_state:
-        st.session_state.capital = initial_capital
-    if 'games_played' not in st.session_state:
-        st.session_state.games_played = 0
-    if 'games_won' not in st.session_state:
-        st.session_state.games_won = 0
-    if 'games_lost' not in st.session_state:
-        st.session_state.games_lost = 0
-    if 'games_tied' not in st.session_state:
-        st.session_state.games_tied = 0
-    if 'capital_history' not in st.session_state:
-        st.session_state.capital_history = [initial_capital]
-    
-    # 显示统计信息
-    st.sidebar.metric("当前资本", f"{st.session_state.capital} 元")
-    st.sidebar.metric("游戏局数", st.session_state.games_played)
+# 图表转为 PNG
+def figure_png(fig):
+    """把图表渲染成 PNG 字节并关闭图表"""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+# 决策分析结果缓存：同一局面（玩家点数、庄家明牌、规则）只计算和绘制一次，所有会话共用
+# （主脚本每次重跑都会重新执行，函数级缓存须用 st.cache_data 才能跨重跑保留）
+@st.cache_data(max_entries=1024, show_spinner=False)
+def analyze_position(player_value, dealer_card, rules=DEFAULT_RULES):
+    """返回当前局面的 (概率图表 PNG, 胜率图表 PNG, 建议操作)，dealer_card 的花色不影响结果"""
+    bust_prob = calculate_bust_probability(player_value)
+    win_prob = calculate_win_probability(player_value, dealer_card, rules)
+    return (figure_png(generate_probability_chart(player_value)),
+            figure_png(generate_win_probability_chart(player_value, dealer_card, rules)),
+            blackjack_odds.recommend_action(player_value, bust_prob, win_prob))
+
+def advisor_card(card):
+    """决策分析使用的庄家明牌：花色和 J/Q/K 不影响分析结果，统一成同一张牌以提高缓存命中率"""
+    value = card[:-1]
+    return ('10' if card_values[value] == 10 else value) + suits[0]
+
+def prime_caches(rules, budget):
+    """在 budget 秒内按出现概率从高到低预先填充决策分析缓存，并构建批量引擎和决策建议的查找表
+
+    由 blackjack_warmup 在就绪前以 ?warmup=秒数&token=令牌 打开的预热会话调用，缓存在服务器进程内所有会话共用。
+    """
+    blackjack_fast.compile_rules(rules)
+    blackjack_odds.advisor_policy(rules)
+    deadline = time.perf_counter() + budget
+    for player_value, up in blackjack_warmup.common_positions():
+        if time.perf_counter() > deadline:
+            break
+        analyze_position(player_value, up + suits[0], rules)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def capital_chart(rounds, capitals):
+    """绘制侧边栏的资本变化图表，返回 PNG 字节（资本历史不变时直接复用）"""
+    fig, ax = plt.subplots(figsize=(4, 2))
+    ax.plot(rounds, capitals, marker='o', markersize=3)
+    ax.set_xlabel("Round")
+    ax.set_ylabel("Capital")
+    ax.grid(True, alpha=0.3)
+    return figure_png(fig)
+
+# 快速自动模拟
+def run_autoplay(num_hands, policy, bet_amount, rules=DEFAULT_RULES):
+    """用批量引擎一次性进行多局游戏，并批量更新资本和统计信息
+
+    参数:
+    num_hands: 自动进行的局数
+    policy: blackjack_fast 的策略表
+    bet_amount: 每局下注金额
+    rules: 牌桌规则
+
+    返回:
+    played: 实际进行的局数（资本不足以下注时提前停止）
+    """
+    outcome = blackjack_fast.play_hands(num_hands, policy, rules=rules)
+    
+    # 与手动游戏的结算方式一致：按规则的赔付表结算
+    payouts = outcome['payout'] * bet_amount
+    capitals = st.session_state.capital + np.cumsum(payouts)
+    
+    # 资本不足以下注的那一局起停止
+    capitals_before = np.concatenate(([st.session_state.capital], capitals[:-1]))
+    broke = np.flatnonzero(capitals_before < bet_amount)
+    played = int(broke[0]) if len(broke) else num_hands
+    if played == 0:
+        return 0
+    
+    results = outcome['result'][:played]
+    st.session_state.games_played += played
+    st.session_state.games_won += int(np.sum(results == 1))
+    st.session_state.games_lost += int(np.sum(results == -1))
+    st.session_state.games_tied += int(np.sum(results == 0))
+    st.session_state.capital = _amount(capitals[played - 1])
+    st.session_state.capital_history.extend(capitals[:played].tolist())
+    return played
+
+# 开始新的一局
+def start_new_game(bet_amount):
+    """检查资本后发牌，开始新的一局"""
+    if st.session_state.capital < bet_amount:
+        st.error("资本不足，无法下注！")
+        return
+    st.session_state.game.deal(reset_deck=True)
+    if st.session_state.game.state == GameEngine.SETTLED:
+        record_result(bet_amount)  # 天然二十一点在发牌时已结算
+    st.session_state.game_active = True
+    st.session_state.animate = {'player': [0, 1], 'dealer': [0, 1]}
+    st.rerun()
+
+# 记录一局的结算结果
+def record_result(bet_amount):
+    """按游戏引擎的结算结果更新资本和统计信息"""
+    game = st.session_state.game
+    st.session_state.games_played += 1
+    if game.result == 1:
+        st.session_state.games_won += 1
+    elif game.result == -1:
+        st.session_state.games_lost += 1
+    else:
+        st.session_state.games_tied += 1
+    st.session_state.capital = _amount(st.session_state.capital + game.payout(bet_amount))
+    st.session_state.capital_history.append(st.session_state.capital)
+
+def _amount(value):
+    """把资本规整为整数或两位小数（3:2、6:5 赔付可能产生小数）"""
+    value = round(float(value), 2)
+    return int(value) if value.is_integer() else value
+
+# 侧边栏统计
+@st.fragment
+def sidebar_stats():
+    """侧边栏的统计信息和资本变化图表，只在整页重跑（资本变化）时更新"""
+    st.header("游戏统计")
+    st.metric("当前资本", f"{st.session_state.capital} 元")
+    st.metric("游戏局数", st.session_state.games_played)
     win_rate = 0 if st.session_state.games_played == 0 else (st.session_state.games_won / st.session_state.games_played) * 100
-    st.sidebar.metric("胜率", f"{win_rate:.1f}%")
+    st.metric("胜率", f"{win_rate:.1f}%")
     
     # 资本变化图表
     if len(st.session_state.capital_history) > 1:
-        st.sidebar.subheader("资本变化")
-        capital_df = pd.DataFrame({
-            "Round": range(len(st.session_state.capital_history)),
-            "Capital": st.session_state.capital_history
-        })
-        fig, ax = plt.subplots(figsize=(4, 2))
-        ax.plot(capital_df["Round"], capital_df["Capital"], marker='o', markersize=3)
-        ax.set_xlabel("Round")
-        ax.set_ylabel("Capital")
-        ax.grid(True, alpha=0.3)
-        st.sidebar.pyplot(fig)
-    
-    # 游戏区域
+        st.subheader("资本变化")
+        # 只绘制降采样后的固定数量的点，长时间游戏也不会变慢
+        rounds, capitals = st.session_state.capital_history.points()
+        st.image(capital_chart(tuple(rounds), tuple(capitals)))
+
+def rerun_fragment():
+    """只重跑当前片段；当前是整页重跑时（如 AppTest 中）退回整页重跑"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+# 游戏区域
+@st.fragment
+def game_area(bet_amount):
+    """游戏区域和决策分析
+
+    作为片段独立重跑：要牌后一局未结束时只重跑这一部分；一局结算、开始新游戏等
+    会改变资本或侧边栏状态的操作才整页重跑。
+    """
     col1, col2 = st.columns([2, 1])
     
     with col1:
         # 游戏状态和手牌显示
         st.subheader("游戏区域")
+        game = st.session_state.game
+        # 动画只在操作后的第一次重跑中播放
+        animate = st.session_state.animate
+        st.session_state.animate = {}
         
         # 开始新游戏按钮
         if not st.session_state.game_active:
             if st.button("开始新游戏", key="start_game"):
-                # 检查资本是否足够
-                if st.session_state.capital < bet_amount:
-                    st.error("资本不足，无法下注！")
-                else:
-                    # 初始化游戏
-                    st.session_state.deck.reset()
-                    st.session_state.player_hand = [st.session_state.deck.deal(), st.session_state.deck.deal()]
-                    st.session_state.dealer_hand = [st.session_state.deck.deal(), st.session_state.deck.deal()]
-                    st.session_state.game_active = True
-                    st.session_state.game_result = None
-                    st.rerun()
+                start_new_game(bet_amount)
         
         # 显示游戏状态
         if st.session_state.game_active:
             # 显示下注金额
-            st.write(f"当前下注: {bet_amount} 元")
+            st.write(f"当前下注: {bet_amount * 2 if game.doubled else bet_amount} 元")
             
             # 显示庄家手牌
             st.subheader("庄家手牌")
-            dealer_value = calculate_hand_value(st.session_state.dealer_hand)
             
             # 如果游戏结束，显示全部手牌，否则隐藏第一张
-            hide_dealer_card = st.session_state.game_result is None
-            st.markdown(display_hand(st.session_state.dealer_hand, hide_first=hide_dealer_card), unsafe_allow_html=True)
+            hide_dealer_card = game.state == GameEngine.PLAYER_TURN
+            st.markdown(display_hand(game.dealer_hand, hide_first=hide_dealer_card,
+                                     animate=animate.get('dealer', ())), unsafe_allow_html=True)
             
             if not hide_dealer_card:
-                st.write(f"庄家点数: {dealer_value}")
+                st.write(f"庄家点数: {game.dealer_value}")
+                if len(game.dealer_hand) > 2:
+                    st.caption("庄家要牌: " + "、".join(game.dealer_hand[2:]))
             else:
                 # 只显示第二张牌的点数
-                visible_card = st.session_state.dealer_hand[1]
+                visible_card = game.dealer_hand[1]
                 visible_value = card_values[visible_card[:-1]]
                 st.write(f"庄家明牌点数: {visible_value}")
             
             # 显示玩家手牌
             st.subheader("玩家手牌")
-            player_value = calculate_hand_value(st.session_state.player_hand)
-            st.markdown(display_hand(st.session_state.player_hand), unsafe_allow_html=True)
-            st.write(f"玩家点数: {player_value}")
+            st.markdown(display_hand(game.player_hand, animate=animate.get('player', ())), unsafe_allow_html=True)
+            st.write(f"玩家点数: {game.player_value}")
             
             # 游戏结果显示
-            if st.session_state.game_result is not None:
-                if st.session_state.game_result == "win":
+            if game.state == GameEngine.SETTLED:
+                if game.outcome == 'blackjack':
+                    st.success(f"天然二十一点！你赢了 {game.payout(bet_amount)} 元！")
+                elif game.result == 1 and game.dealer_bust:
+                    st.success("庄家爆牌，你赢了！")
+                elif game.result == 1:
                     st.success("恭喜，你赢了！")
-                elif st.session_state.game_result == "lose":
+                elif game.outcome == 'surrender':
+                    st.warning("你投降了，输掉一半赌注。")
+                elif game.player_value > 21:
+                    st.error("爆牌了！你输了！")
+                elif len(game.player_hand) == 2 and len(game.dealer_hand) == 2 and game.dealer_value == 21:
+                    st.error("庄家天然二十一点，你输了！")
+                elif game.result == -1:
                     st.error("很遗憾，你输了！")
                 else:  # tie
                     st.info("平局！")
                 
                 # 显示新游戏按钮
                 if st.button("开始新游戏", key="restart_game"):
-                    # 检查资本是否足够
-                    if st.session_state.capital < bet_amount:
-                        st.error("资本不足，无法下注！")
-                    else:
-                        # 初始化游戏
-                        st.session_state.deck.reset()
-                        st.session_state.player_hand = [st.session_state.deck.deal(), st.session_state.deck.deal()]
-                        st.session_state.dealer_hand = [st.session_state.deck.deal(), st.session_state.deck.deal()]
-                        st.session_state.game_active = True
-                        st.session_state.game_result = None
-                        st.rerun()
+                    start_new_game(bet_amount)
             else:
                 # 游戏进行中，显示操作按钮
-                col_hit, col_stand = st.columns(2)
+                col_hit, col_stand, col_double, col_surrender = st.columns(4)
                 
                 with col_hit:
                     if st.button("要牌 (Hit)", key="hit"):
-                        # 玩家要牌
-                        new_player_card = st.session_state.deck.deal()
-                        st.session_state.player_hand.append(new_player_card)
-                        player_value = calculate_hand_value(st.session_state.player_hand)
-                        
-                        # 显示玩家新牌
-                        st.markdown("玩家要牌：")
-                        st.markdown(display_card(new_player_card), unsafe_allow_html=True)
-                        st.write(f"玩家当前点数: {player_value}")
-                        
-                        # 检查是否爆牌
-                        if player_value > 21:
-                            # 玩家爆牌，游戏结束
-                            st.session_state.game_result = "lose"
-                            st.session_state.games_played += 1
-                            st.session_state.games_lost += 1
-                            st.session_state.capital -= bet_amount
-                            st.session_state.capital_history.append(st.session_state.capital)
-                            st.error("爆牌了！")
-                        
-                        # 使用 spinner 来提供更好的视觉反馈
-                        with st.spinner("更新游戏状态..."):
-                            time.sleep(1)  # 给用户更多时间看到新牌
-                            st.rerun()
+                        # 玩家要牌，爆牌时引擎直接结算
+                        game.hit()
+                        st.session_state.animate = {'player': [len(game.player_hand) - 1]}
+                        if game.state == GameEngine.SETTLED:
+                            record_result(bet_amount)
+                            st.rerun()  # 资本和统计变化，整页重跑
+                        rerun_fragment()
                 
                 with col_stand:
                     if st.button("停牌 (Stand)", key="stand"):
-                        # 玩家停牌，庄家开始行动
-                        dealer_value = calculate_hand_value(st.session_state.dealer_hand)
-                        
-                        # 显示庄家完整手牌
-                        st.markdown("庄家手牌：")
-                        st.markdown(display_hand(st.session_state.dealer_hand), unsafe_allow_html=True)
-                        st.write(f"庄家初始点数: {dealer_value}")
-                        
-                        # 庄家按规则要牌
-                        dealer_actions = []
-                        while dealer_strategy(dealer_value):
-                            new_dealer_card = st.session_state.deck.deal()
-                            st.session_state.dealer_hand.append(new_dealer_card)
-                            dealer_value = calculate_hand_value(st.session_state.dealer_hand)
-                            
-                            # 记录庄家要牌动作
-                            dealer_actions.append(f"庄家要了一张牌: {new_dealer_card}, 当前点数: {dealer_value}")
-                        
-                        # 显示庄家要牌过程
-                        if dealer_actions:
-                            st.markdown("庄家要牌过程：")
-                            for action in dealer_actions:
-                                st.write(action)
-                                time.sleep(0.5) # 逐步显示庄家行动
-                        else:
-                            st.write("庄家不需要要牌")
-                        
-                        # 显示最终手牌
-                        st.markdown("庄家最终手牌：")
-                        st.markdown(display_hand(st.session_state.dealer_hand), unsafe_allow_html=True)
-                        st.write(f"庄家最终点数: {dealer_value}")
-                        
-                        # 判定胜负
-                        player_value = calculate_hand_value(st.session_state.player_hand)
-                        
-                        if dealer_value > 21:  # 庄家爆牌，玩家获得双倍赌注
-                            st.session_state.game_result = "win"
-                            st.session_state.games_won += 1
-                            st.session_state.capital += bet_amount * 2  # 双倍赌注
-                            st.session_state.capital_history.append(st.session_state.capital)
-                            st.success("庄家爆牌，你赢了双倍赌注！")
-                        elif player_value > dealer_value:  # 玩家点数大于庄家
-                            st.session_state.game_result = "win"
-                            st.session_state.games_won += 1
-                            st.session_state.capital += bet_amount
-                            st.session_state.capital_history.append(st.session_state.capital)
-                            st.success("你赢了！")
-                        elif player_value < dealer_value:  # 玩家点数小于庄家
-                            st.session_state.game_result = "lose"
-                            st.session_state.games_lost += 1
-                            st.session_state.capital -= bet_amount
-                            st.session_state.capital_history.append(st.session_state.capital)
-                            st.error("你输了！")
-                        else:  # 平局
-                            st.session_state.game_result = "tie"
-                            st.session_state.games_tied += 1
-                            st.session_state.capital_history.append(st.session_state.capital)
-                            st.info("平局！")
-                        
-                        st.session_state.games_played += 1
-                        
-                        # 使用 spinner 来提供更好的视觉反馈
-                        with st.spinner("更新游戏状态..."):
-                            time.sleep(1)  # 给用户更多时间看结果
-                            st.rerun()
+                        # 玩家停牌，庄家按规则要牌并结算（瞬间完成）
+                        game.stand()
+                        record_result(bet_amount)
+                        # 翻开暗牌后逐张显示庄家要的牌，由浏览器端动画完成
+                        st.session_state.animate = {'dealer': [0] + list(range(2, len(game.dealer_hand)))}
+                        st.rerun()
+                
+                with col_double:
+                    can_double = game.can_double and st.session_state.capital >= 2 * bet_amount
+                    if can_double and st.button("加倍 (Double)", key="double"):
+                        # 赌注翻倍，只再要一张牌后自动停牌
+                        game.double()
+                        record_result(bet_amount)
+                        st.session_state.animate = {'player': [len(game.player_hand) - 1],
+                                                    'dealer': [0] + list(range(2, len(game.dealer_hand)))}
+                        st.rerun()
+                
+                with col_surrender:
+                    if game.can_surrender and st.button("投降 (Surrender)", key="surrender"):
+                        game.surrender()
+                        record_result(bet_amount)
+                        st.session_state.animate = {'dealer': [0]}
+                        st.rerun()
     
     with col2:
         # 概率和决策分析区域
-        if st.session_state.game_active and st.session_state.game_result is None:
+        if game.state == GameEngine.PLAYER_TURN:
             st.subheader("决策分析")
             
-            # 显示当前爆牌概率和期望值
-            player_value = calculate_hand_value(st.session_state.player_hand)
-            prob_fig = generate_probability_chart(player_value)
-            st.pyplot(prob_fig)
-            
-            # 显示当前胜率
-            win_fig = generate_win_probability_chart(player_value, st.session_state.dealer_hand[1])
-            st.pyplot(win_fig)
+            # 同一局面的图表和建议只计算一次（见 analyze_position）
+            up_card = advisor_card(game.dealer_hand[1])
+            prob_png, win_png, action = analyze_position(game.player_value, up_card, game.rules)
+            st.image(prob_png)
+            st.image(win_png)
             
             # 决策建议
             st.subheader("决策建议")
-            bust_prob = calculate_bust_probability(player_value)
-            win_prob = calculate_win_probability(player_value, st.session_state.dealer_hand[1])
-            
-            if player_value >= 17 and win_prob > 45:
+            if action == 'stand':
                 st.info("建议: 停牌 (Stand)")
-            elif bust_prob < 30 or (player_value <= 11):
-                st.info("建议: 要牌 (Hit)")
             else:
-                if win_prob > 40:
-                    st.info("建议: 停牌 (Stand)")
-                else:
-                    st.info("建议: 要牌 (Hit)")
+                st.info("建议: 要牌 (Hit)")
+
+# 主应用函数
+def main():
+    # 设置标题和说明
+    st.title("二十一点 (Blackjack) 交互式模拟")
+    st.markdown("""
+    这是一个二十一点游戏的交互式模拟界面，您可以体验游戏过程并观察不同决策的概率和期望收益变化。
+    
+    **游戏规则**：
+    - 玩家和庄家各发两张牌，庄家只有一张牌可见
+    - 玩家可以选择要牌（Hit）或停牌（Stand）
+    - 玩家点数超过21点则爆牌，自动输掉游戏
+    - 首两张牌为21点即天然二十一点，按侧边栏设置的赔率获胜；双方都是则平局
+    - 首两张牌时可以加倍（赌注翻倍且只再要一张牌），规则允许时可以投降（输掉一半赌注）
+    - 庄家必须在点数小于17时要牌，H17 规则下软17也要牌
+    - 点数大者获胜，庄家爆牌则玩家获胜
+    """)
+    
+    # 侧边栏 - 游戏设置
+    st.sidebar.header("游戏设置")
+    initial_capital = st.sidebar.slider("初始资本 (元)", 10, 1000, 100)
+    bet_amount = st.sidebar.slider("下注金额 (元)", 1, 50, 10)
+    
+    # 侧边栏 - 牌桌规则（当前一局结束后生效）
+    st.sidebar.header("牌桌规则")
+    payout_options = {"3:2": 1.5, "6:5": 1.2, "1:1": 1.0}
+    rules = Rules(
+        dealer_hits_soft_17=st.sidebar.checkbox("庄家软17要牌 (H17)", value=False),
+        blackjack_payout=payout_options[st.sidebar.selectbox("天然二十一点赔率", list(payout_options))],
+        double_down=st.sidebar.checkbox("允许加倍", value=True),
+        surrender=st.sidebar.checkbox("允许投降", value=False),
+    )
+    
+    # 预热会话（见 blackjack_warmup）：只填充缓存，不是真实用户；没有启动器的令牌时忽略 ?warmup=
+    budget = blackjack_warmup.warmup_budget(st.query_params)
+    if budget is not None:
+        prime_caches(rules, budget)
+        return
+    
+    # 初始化会话状态
+    if 'game_active' not in st.session_state:
+        st.session_state.game_active = False
+    if 'game' not in st.session_state:
+        st.session_state.game = GameEngine(Deck(), rules)
+    if 'animate' not in st.session_state:
+        st.session_state.animate = {}
+    if 'capital' not in st.session_state:
+        st.session_state.capital = initial_capital
+    if 'games_played' not in st.session_state:
+        st.session_state.games_played = 0
+    if 'games_won' not in st.session_state:
+        st.session_state.games_won = 0
+    if 'games_lost' not in st.session_state:
+        st.session_state.games_lost = 0
+    if 'games_tied' not in st.session_state:
+        st.session_state.games_tied = 0
+    if 'capital_history' not in st.session_state:
+        st.session_state.capital_history = CapitalHistory(initial_capital)
+    
+    # 侧边栏 - 统计信息
+    with st.sidebar:
+        sidebar_stats()
+    
+    # 侧边栏 - 快速自动模拟
+    st.sidebar.header("快速自动模拟")
+    autoplay_hands = st.sidebar.number_input("自动进行局数", min_value=1, max_value=100000, value=1000, step=100)
+    autoplay_strategy = st.sidebar.radio("自动策略", ["固定阈值", "决策建议"], horizontal=True)
+    if autoplay_strategy == "固定阈值":
+        autoplay_threshold = st.sidebar.slider("要牌阈值", 11, 20, 16)
+        autoplay_policy = blackjack_fast.threshold_policy(autoplay_threshold)
+    else:
+        autoplay_policy = blackjack_odds.advisor_policy(rules)
+    
+    hand_in_progress = st.session_state.game.state == GameEngine.PLAYER_TURN
+    if not hand_in_progress:
+        st.session_state.game.rules = rules
+    if st.sidebar.button("自动进行", key="autoplay", disabled=hand_in_progress):
+        if st.session_state.capital < bet_amount:
+            st.sidebar.error("资本不足，无法下注！")
+        else:
+            played = run_autoplay(int(autoplay_hands), autoplay_policy, bet_amount, rules)
+            st.session_state.autoplay_message = f"已自动进行 {played} 局"
+            st.rerun()
+    if st.session_state.get('autoplay_message'):
+        st.sidebar.caption(st.session_state.autoplay_message)
+    
+    # 游戏区域和决策分析（要牌等操作只重跑这一部分）
+    inject_card_styles()
+    game_area(bet_amount)
 
 # 运行应用
 if __name__ == "__main__":
@@ -1,33 +1,69 @@
-
+import argparse
+import secrets
 import subprocess
 import os
 import sys
 import time
 
-def run_streamlit_app():
+import blackjack_warmup
+
+def run_streamlit_app(port=8501, address=None, ready_file=blackjack_warmup.READY_FILE,
+                      prime_seconds=blackjack_warmup.DEFAULT_PRIME_SECONDS):
+    """启动 Streamlit 应用并预热，预热完成后写入就绪文件（见 blackjack_warmup）"""
+    started = time.perf_counter()
+
     # 获取当前脚本所在目录
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    
+
     # 设置Streamlit应用路径
     app_path = os.path.join(script_dir, "blackjack_interactive.py")
-    
+
     # 启动Streamlit应用
     print("正在启动二十一点交互式模拟应用...")
-    print("应用启动后将自动在浏览器中打开")
     print("请稍候...")
-    
+    blackjack_warmup.clear_ready(ready_file)
+
+    # 字体缓存和字节码写在磁盘上，先在本进程中构建，服务器进程启动时直接使用
+    timings = blackjack_warmup.warm_up_local()
+    print("本地预热完成: " + "，".join(f"{name} {seconds:.2f} 秒" for name, seconds in timings.items()), flush=True)
+
     # 使用subprocess启动Streamlit
-    cmd = [sys.executable, "-m", "streamlit", "run", app_path, "--server.headless", "true"]
-    process = subprocess.Popen(cmd)
-    
-    # 等待几秒钟让服务器启动
-    time.sleep(3)
-    
+    cmd = [sys.executable, "-m", "streamlit", "run", app_path, "--server.headless", "true", f"--server.port={port}"]
+    if address is not None:
+        cmd.append(f"--server.address={address}")
+    # 预热令牌只有本进程和服务器进程知道，访问者的 ?warmup= 不会被执行（见 blackjack_warmup.warmup_budget）
+    token = secrets.token_hex(16)
+    process = subprocess.Popen(cmd, env=dict(os.environ, **{blackjack_warmup.WARMUP_TOKEN_ENV: token}))
+
+    # 等待服务器启动并完成预热，之后才报告就绪
+    try:
+        report = blackjack_warmup.warm_start(port, path=ready_file, prime_seconds=prime_seconds,
+                                             process=process, started=started, timings=timings,
+                                             log=lambda message: print(message, flush=True), token=token)
+        print(f"请访问 http://localhost:{port}", flush=True)
+    except (RuntimeError, TimeoutError, OSError) as e:
+        print(f"预热失败: {e}", flush=True)
+        if process.poll() is None:
+            process.terminate()
+        sys.exit(1)
+
     # 保持进程运行直到用户关闭
     try:
         process.wait()
     except KeyboardInterrupt:
         process.terminate()
+    finally:
+        blackjack_warmup.clear_ready(ready_file)
+
+def main():
+    parser = argparse.ArgumentParser(description="启动二十一点交互式模拟应用")
+    parser.add_argument("--port", type=int, default=8501, help="服务器端口")
+    parser.add_argument("--address", help="监听地址，如容器中为 0.0.0.0")
+    parser.add_argument("--ready-file", default=blackjack_warmup.READY_FILE, help="就绪文件路径")
+    parser.add_argument("--prime-seconds", type=float, default=blackjack_warmup.DEFAULT_PRIME_SECONDS,
+                        help="服务器进程填充决策分析缓存的时间预算（秒）")
+    args = parser.parse_args()
+    run_streamlit_app(args.port, args.address, args.ready_file, args.prime_seconds)
 
 if __name__ == "__main__":
-    run_streamlit_app()
+    main()
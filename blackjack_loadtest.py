@@ -0,0 +1,247 @@
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+from blackjack_engine import GameEngine
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blackjack_interactive.py")
+
+# 读取进程的 CPU 时间和常驻内存
+def _process_usage(pid):
+    """返回进程累计的 CPU 时间（秒）和常驻内存（字节），进程已退出时返回 None"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/statm') as f:
+            rss_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    ticks = os.sysconf('SC_CLK_TCK')
+    cpu = (int(fields[11]) + int(fields[12])) / ticks  # utime + stime
+    return cpu, rss_pages * os.sysconf('SC_PAGE_SIZE')
+
+# 资源监控
+class ResourceMonitor(threading.Thread):
+    """后台线程，按固定间隔采样一组进程的总 CPU 占用率和总常驻内存（依赖 Linux 的 /proc）"""
+    def __init__(self, pids, interval=1.0):
+        super().__init__(daemon=True)
+        self.pids = list(pids)
+        self.interval = interval
+        self.samples = []  # (秒, CPU %, 常驻内存 MB)
+        self._cpu = {}
+        self._stop_event = threading.Event()
+
+    def _sample(self):
+        cpu_delta = 0.0
+        rss = 0
+        for pid in self.pids:
+            usage = _process_usage(pid)
+            if usage is None:
+                continue
+            cpu, pid_rss = usage
+            cpu_delta += cpu - self._cpu.get(pid, cpu)
+            self._cpu[pid] = cpu
+            rss += pid_rss
+        return cpu_delta, rss
+
+    def run(self):
+        start = time.perf_counter()
+        last_wall = start
+        self._sample()
+        while not self._stop_event.wait(self.interval):
+            wall = time.perf_counter()
+            cpu_delta, rss = self._sample()
+            self.samples.append((wall - start, cpu_delta / (wall - last_wall) * 100, rss / 2**20))
+            last_wall = wall
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+# 模拟一名玩家
+def simulate_player(seed, deadline, think_time, hit_threshold, results, timeout=60):
+    """用 AppTest 模拟一名玩家按真实节奏点击 开始/要牌/停牌，记录每次重跑的延迟
+
+    参数:
+    seed: 玩家随机种子
+    deadline: 结束时间（time.time 时刻）
+    think_time: 两次点击之间的平均思考时间（秒，指数分布）
+    hit_threshold: 玩家点数小于等于该值时要牌
+    results: 进程间队列，结束时放入 动作名 -> 延迟列表（秒）的字典
+    timeout: 单次重跑的超时时间（秒）
+    """
+    rng = random.Random(seed)
+    latencies = {}
+
+    def timed(action, run):
+        start = time.perf_counter()
+        at = run()
+        latencies.setdefault(action, []).append(time.perf_counter() - start)
+        return at
+
+    at = timed('load', lambda: AppTest.from_file(APP_PATH, default_timeout=timeout).run())
+    while time.time() < deadline:
+        if think_time > 0:
+            time.sleep(rng.expovariate(1 / think_time))
+
+        game = at.session_state['game']
+        if game.state != GameEngine.PLAYER_TURN:
+            key = 'restart_game' if at.session_state['game_active'] else 'start_game'
+            at = timed('start', at.button(key=key).click().run)
+            if len(at.error):
+                # 资本不足无法下注，换一个新会话继续
+                at = timed('load', lambda: AppTest.from_file(APP_PATH, default_timeout=timeout).run())
+        elif game.player_value <= hit_threshold:
+            at = timed('hit', at.button(key='hit').click().run)
+        else:
+            at = timed('stand', at.button(key='stand').click().run)
+    results.put(latencies)
+
+def _next_result(results, processes, poll=1.0):
+    """等待下一名玩家提交结果；有玩家进程未提交结果就退出（异常、内存不足被杀等）时抛出 RuntimeError"""
+    while True:
+        try:
+            return results.get(timeout=poll)
+        except queue.Empty:
+            pass
+        # 玩家只在最后一步提交结果，非零退出码说明它不会再提交了
+        for i, process in enumerate(processes):
+            if process.exitcode not in (None, 0):
+                raise RuntimeError(f"玩家 {i} 的进程 (pid {process.pid}) 以退出码 {process.exitcode} 退出，未提交结果")
+        if all(process.exitcode is not None for process in processes):
+            try:
+                return results.get(timeout=poll)
+            except queue.Empty:
+                raise RuntimeError("所有玩家进程都已退出，但仍有玩家未提交结果") from None
+
+# 运行负载测试
+def run_load_test(players=10, duration=30.0, think_time=1.0, hit_threshold=16, sample_interval=1.0, seed=0):
+    """并发运行多个玩家会话并汇总结果
+
+    AppTest 依赖进程内唯一的运行时，不能在同一进程中并发，因此每名玩家运行在独立的进程中，
+    CPU 和内存按所有玩家进程求和。有玩家进程未提交结果就退出时抛出 RuntimeError，不会无限等待。
+
+    返回:
+    report: 包含延迟分位数、吞吐量和资源采样的字典
+    """
+    results = multiprocessing.Queue()
+    start = time.perf_counter()
+    deadline = time.time() + duration
+    processes = [
+        multiprocessing.Process(
+            target=simulate_player,
+            args=(seed + i, deadline, think_time, hit_threshold, results),
+            daemon=True,
+        )
+        for i in range(players)
+    ]
+    for process in processes:
+        process.start()
+    monitor = ResourceMonitor([process.pid for process in processes], sample_interval)
+    monitor.start()
+
+    latencies = {}
+    try:
+        for _ in processes:
+            for action, values in _next_result(results, processes).items():
+                latencies.setdefault(action, []).extend(values)
+    except RuntimeError:
+        monitor.stop()
+        for process in processes:
+            process.terminate()
+        raise
+    for process in processes:
+        process.join()
+    wall = time.perf_counter() - start
+    monitor.stop()
+
+    report = {
+        'players': players,
+        'duration': wall,
+        'actions': {},
+        'resources': [
+            {'time': t, 'cpu_percent': cpu, 'rss_mb': rss} for t, cpu, rss in monitor.samples
+        ],
+    }
+    all_latencies = []
+    for action, values in sorted(latencies.items()):
+        values = np.array(values) * 1000
+        all_latencies.extend(values)
+        report['actions'][action] = _summarize(values)
+    report['total'] = _summarize(np.array(all_latencies))
+    report['throughput'] = len(all_latencies) / wall
+    return report
+
+def _summarize(values_ms):
+    """延迟分位数（毫秒）"""
+    if len(values_ms) == 0:
+        return {'count': 0}
+    p50, p90, p99 = np.percentile(values_ms, [50, 90, 99])
+    return {
+        'count': int(len(values_ms)),
+        'p50_ms': float(p50),
+        'p90_ms': float(p90),
+        'p99_ms': float(p99),
+        'max_ms': float(np.max(values_ms)),
+    }
+
+# 打印报告
+def print_report(report):
+    print(f"\n===== 负载测试结果 ({report['players']} 名玩家, {report['duration']:.1f} 秒) =====\n")
+    print(f"{'动作':<8}{'次数':>8}{'p50 (ms)':>12}{'p90 (ms)':>12}{'p99 (ms)':>12}{'max (ms)':>12}")
+    for action, stats in list(report['actions'].items()) + [('total', report['total'])]:
+        if stats['count'] == 0:
+            continue
+        print(f"{action:<8}{stats['count']:>8}{stats['p50_ms']:>12.1f}{stats['p90_ms']:>12.1f}"
+              f"{stats['p99_ms']:>12.1f}{stats['max_ms']:>12.1f}")
+    print(f"\n吞吐量: {report['throughput']:.1f} 次重跑/秒")
+
+    if report['resources']:
+        print(f"\n{'时间 (s)':<10}{'CPU (%)':>10}{'RSS (MB)':>10}")
+        for sample in report['resources']:
+            print(f"{sample['time']:<10.1f}{sample['cpu_percent']:>10.1f}{sample['rss_mb']:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="二十一点交互式应用的本地负载测试")
+    parser.add_argument("--players", type=int, default=10, help="并发玩家数")
+    parser.add_argument("--duration", type=float, default=30.0, help="测试时长（秒）")
+    parser.add_argument("--think-time", type=float, default=1.0, help="平均思考时间（秒）")
+    parser.add_argument("--hit-threshold", type=int, default=16, help="玩家点数小于等于该值时要牌")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="CPU/内存采样间隔（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--json", help="将报告写入该 JSON 文件")
+    parser.add_argument("--max-p99-ms", type=float, help="总体 p99 延迟超过该值时以非零状态退出")
+    args = parser.parse_args()
+
+    try:
+        report = run_load_test(
+            players=args.players,
+            duration=args.duration,
+            think_time=args.think_time,
+            hit_threshold=args.hit_threshold,
+            sample_interval=args.sample_interval,
+            seed=args.seed,
+        )
+    except RuntimeError as e:
+        sys.exit(f"负载测试失败: {e}")
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.max_p99_ms is not None and report['total'].get('p99_ms', 0) > args.max_p99_ms:
+        print(f"\n总体 p99 延迟超过 {args.max_p99_ms:.0f} ms，容量回归！")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import argparse
+import os
+
+import numpy as np
+
+from blackjack_engine import OUTCOMES, hand_total
+from blackjack_fast import card_rank
+
+# 每条记录保存的最多牌数，超出的牌只计入张数（实际几乎不会出现）
+MAX_CARDS = 12
+
+# 玩家操作编码，-1 表示没有操作（天然二十一点或爆牌结束）
+ACTIONS = ('hit', 'stand', 'double', 'surrender')
+
+# 定长二进制记录：每手牌 38 字节
+HAND_DTYPE = np.dtype([
+    ('player', 'i1', (MAX_CARDS,)),  # 玩家各张牌的点数编码，-1 为空位
+    ('dealer', 'i1', (MAX_CARDS,)),  # 庄家各张牌的点数编码（第二张为明牌）
+    ('num_player_cards', 'u1'),
+    ('num_dealer_cards', 'u1'),
+    ('up', 'i1'),                    # 庄家明牌的点数编码
+    ('start_total', 'u1'),           # 玩家首两张牌的点数
+    ('player_total', 'u1'),
+    ('dealer_total', 'u1'),
+    ('num_hits', 'u1'),              # 玩家要牌次数
+    ('final_action', 'i1'),          # 要牌之后的最后一个操作，见 ACTIONS
+    ('outcome', 'i1'),               # 结算结果，见 blackjack_engine.OUTCOMES
+    ('threshold', 'i1'),             # 玩家策略的阈值参数
+    ('payout', '<f4'),               # 每注输赢（含加倍和天然二十一点赔率）
+])
+
+# 文件头：魔数 + 记录长度，之后紧接定长记录，可直接内存映射
+MAGIC = b'BJHANDS1'
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('itemsize', '<u4'), ('reserved', '<u4')])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+
+# 写入手牌记录
+class HandRecorder:
+    """把每一手牌追加写入定长二进制日志
+
+    记录先攒在内存中，每 buffer_size 手批量写入一次；文件不存在时先写文件头。
+    可作为上下文管理器使用，退出时写入剩余记录。
+    """
+    def __init__(self, path, buffer_size=65536):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.pending = []
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not new_file:
+            _check_header(path)
+        self.file = open(path, 'ab')
+        if new_file:
+            header = np.array([(MAGIC, HAND_DTYPE.itemsize, 0)], dtype=HEADER_DTYPE)
+            self.file.write(header.tobytes())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, game, threshold=0):
+        """记录一局已结算的 GameEngine"""
+        player = [card_rank(card) for card in game.player_hand]
+        dealer = [card_rank(card) for card in game.dealer_hand]
+        actions = game.actions
+        final_action = ACTIONS.index(actions[-1]) if actions and actions[-1] != 'hit' else -1
+        self.pending.append((
+            _pad(player), _pad(dealer), len(player), len(dealer), dealer[1],
+            hand_total(game.player_hand[:2])[0], game.player_value, game.dealer_value,
+            actions.count('hit'), final_action, OUTCOMES.index(game.outcome), threshold,
+            game.payout(1),
+        ))
+        if len(self.pending) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.file.write(np.array(self.pending, dtype=HAND_DTYPE).tobytes())
+            self.pending = []
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+def _pad(ranks):
+    ranks = ranks[:MAX_CARDS]
+    return ranks + [-1] * (MAX_CARDS - len(ranks))
+
+def _check_header(path):
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if len(header) == 0 or header['magic'][0] != MAGIC:
+        raise ValueError(f"{path} 不是手牌日志文件")
+    if header['itemsize'][0] != HAND_DTYPE.itemsize:
+        raise ValueError(f"{path} 的记录长度为 {header['itemsize'][0]}，与当前格式 ({HAND_DTYPE.itemsize}) 不一致")
+
+# 读取手牌记录
+def open_log(path):
+    """以只读内存映射打开手牌日志，返回 HAND_DTYPE 结构化数组（零拷贝，按需从磁盘分页读入）"""
+    _check_header(path)
+    num_records = (os.path.getsize(path) - HEADER_SIZE) // HAND_DTYPE.itemsize
+    if num_records == 0:
+        return np.zeros(0, dtype=HAND_DTYPE)
+    return np.memmap(path, dtype=HAND_DTYPE, mode='r', offset=HEADER_SIZE, shape=(num_records,))
+
+def read_dataframe(path, columns=None):
+    """把手牌日志读成 pandas DataFrame
+
+    参数:
+    path: 日志文件路径
+    columns: 需要的字段，默认为所有标量字段；牌面数组字段展开为 player_0、player_1 等列
+
+    返回:
+    df: DataFrame，outcome 列为分类类型
+    """
+    import pandas as pd
+
+    records = open_log(path)
+    if columns is None:
+        columns = [name for name in HAND_DTYPE.names if HAND_DTYPE[name].shape == ()]
+    data = {}
+    for name in columns:
+        field = records[name]
+        if field.ndim == 2:
+            for i in range(field.shape[1]):
+                data[f'{name}_{i}'] = field[:, i]
+        elif name == 'outcome':
+            data[name] = pd.Categorical.from_codes(field, categories=OUTCOMES)
+        else:
+            data[name] = field
+    return pd.DataFrame(data, copy=False)
+
+# 事后聚合
+def summarize(records, by='up', chunk_size=10 ** 7):
+    """按某个标量字段分组统计结果，分块扫描，内存占用与总手数无关
+
+    参数:
+    records: open_log 返回的结构化数组
+    by: 分组字段，如 'up'（庄家明牌）、'start_total'（起手点数）、'threshold'
+    chunk_size: 每块扫描的手数
+
+    返回:
+    summary: DataFrame，每组的手数、各结算结果比例和平均每注输赢
+    """
+    import pandas as pd
+
+    num_keys = 256
+    counts = np.zeros((num_keys, len(OUTCOMES)))
+    payouts = np.zeros(num_keys)
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        keys = chunk[by].astype(np.int64) % num_keys
+        counts += np.bincount(keys * len(OUTCOMES) + chunk['outcome'],
+                              minlength=num_keys * len(OUTCOMES)).reshape(num_keys, -1)
+        payouts += np.bincount(keys, weights=chunk['payout'], minlength=num_keys)
+
+    hands = counts.sum(axis=1)
+    present = np.flatnonzero(hands)
+    summary = pd.DataFrame(counts[present] / hands[present, None], columns=[f'{o}_rate' for o in OUTCOMES])
+    summary.insert(0, 'hands', hands[present].astype(np.int64))
+    summary['mean_payout'] = payouts[present] / hands[present]
+    summary.index = pd.Index(np.where(present >= 128, present - num_keys, present)
+                             if HAND_DTYPE[by].kind == 'i' else present, name=by)
+    return summary.sort_index()
+
+def main():
+    parser = argparse.ArgumentParser(description="按字段汇总二十一点手牌日志")
+    parser.add_argument("path", help="手牌日志文件")
+    parser.add_argument("--by", default='up', help="分组字段，如 up、start_total、threshold")
+    args = parser.parse_args()
+
+    records = open_log(args.path)
+    print(f"共 {len(records)} 手牌\n")
+    print(summarize(records, args.by).to_string(float_format=lambda x: f"{x:.4f}"))
+
+if __name__ == "__main__":
+    main()
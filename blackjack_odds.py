@@ -0,0 +1,444 @@
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+
+from blackjack_engine import Rules, payout_table
+from blackjack_fast import RANK_VALUES, RANK_COUNTS, RANK_PROBS
+
+# 庄家最终结果：17、18、19、20、21点与爆牌
+DEALER_OUTCOMES = [17, 18, 19, 20, 21, 'bust']
+
+# 精确评估内部额外区分庄家的天然二十一点，它排在 DEALER_OUTCOMES 之后
+_DEALER_NATURAL = len(DEALER_OUTCOMES)
+
+# 固定阈值策略可能出现的结算结果（不加倍、不投降）
+SETTLE_OUTCOMES = ('blackjack', 'win', 'push', 'loss')
+
+# 计算加牌后的点数
+def _add_card(total, soft, rank):
+    """在点数 total（其中 soft 张A按11点计）上加一张牌，返回新的 (total, soft)"""
+    total += int(RANK_VALUES[rank])
+    soft += rank == 0
+    while total > 21 and soft > 0:
+        total -= 10
+        soft -= 1
+    return total, soft
+
+@lru_cache(maxsize=None)
+def _dealer_distribution(counts, total, soft, rules):
+    """庄家从剩余牌 counts 中按规则要牌的最终结果分布
+
+    counts 为各点数剩余张数的元组，None 表示无限副牌
+    """
+    dist = np.zeros(len(DEALER_OUTCOMES))
+    if total > 21:
+        dist[-1] = 1.0
+        return dist
+    if not rules.dealer_hits(total, soft):
+        dist[total - 17] = 1.0
+        return dist
+
+    if counts is None:
+        for rank, prob in enumerate(RANK_PROBS):
+            dist += prob * _dealer_distribution(None, *_add_card(total, soft, rank), rules)
+        return dist
+
+    remaining = sum(counts)
+    for rank, count in enumerate(counts):
+        if count:
+            rest = counts[:rank] + (count - 1,) + counts[rank + 1:]
+            dist += count / remaining * _dealer_distribution(rest, *_add_card(total, soft, rank), rules)
+    return dist
+
+# 按多重集枚举手牌
+def _enumerate_hands(limits, keep_drawing):
+    """枚举从空手开始、按 keep_drawing(点数, 软A数, 张数) 决定是否继续要牌时所有可能的最终手牌
+
+    手牌按各点数的张数（多重集）记录。同一手牌的每种有效发牌顺序在任何剩余牌组成下的
+    概率都相同，因此只需统计每手牌有多少种有效顺序，不必对每种剩余牌组成重新递归。
+
+    参数:
+    limits: 各点数最多可用的张数，None 表示不限（无限副牌）
+    keep_drawing: 判断是否继续要牌的函数
+
+    返回:
+    hands: 形状为 (n, 10) 的各点数张数
+    orderings: 每手牌的有效发牌顺序数
+    totals: 每手牌的最终点数
+    """
+    frontier = {(0,) * 10: (1, 0, 0)}  # 仍在要牌的手牌 -> (顺序数, 点数, 软A数)
+    final = {}
+    num_cards = 0
+    while frontier:
+        num_cards += 1
+        next_frontier = {}
+        for hand, (orderings, total, soft) in frontier.items():
+            for rank in range(10):
+                if limits is not None and hand[rank] >= limits[rank]:
+                    continue
+                new_hand = hand[:rank] + (hand[rank] + 1,) + hand[rank + 1:]
+                new_total, new_soft = _add_card(total, soft, rank)
+                if new_total <= 21 and keep_drawing(new_total, new_soft, num_cards):
+                    target = next_frontier
+                else:
+                    target = final
+                if new_hand in target:
+                    target[new_hand] = (target[new_hand][0] + orderings, new_total, new_soft)
+                else:
+                    target[new_hand] = (orderings, new_total, new_soft)
+        frontier = next_frontier
+
+    hands = np.array(list(final.keys()))
+    orderings = np.array([value[0] for value in final.values()], dtype=float)
+    totals = np.array([value[1] for value in final.values()])
+    return hands, orderings, totals
+
+# 手牌出现的概率
+def _hand_log_probs(hands, orderings, counts):
+    """按剩余牌 counts（形状为 (b, 10)）批量计算每手牌出现概率的对数，返回形状 (b, n)
+
+    一种发牌顺序的概率为 prod_r ff(counts[r], hands[r]) / ff(sum(counts), 张数)，
+    ff 为下降阶乘；这里在对数空间中用一次矩阵乘法对所有 (剩余牌组成, 手牌) 求值。
+    """
+    counts = np.atleast_2d(counts).astype(float)
+    max_cards = hands.max()
+    steps = np.arange(max_cards)
+    with np.errstate(divide='ignore'):
+        # log_falling[b, r, m] = log ff(counts[b, r], m)，牌不够时为 -inf
+        logs = np.log(np.clip(counts[:, :, None] - steps, 0, None))
+        log_falling = np.concatenate([np.zeros(counts.shape + (1,)), np.cumsum(logs, axis=2)], axis=2)
+        remaining = counts.sum(axis=1)
+        log_falling_total = np.concatenate(
+            [np.zeros((len(counts), 1)), np.cumsum(np.log(remaining[:, None] - np.arange(hands.sum(axis=1).max())), axis=1)],
+            axis=1)
+    # 矩阵乘法中 0 * -inf 会得到 nan，用足够小的有限值代替 -inf
+    log_falling = np.maximum(log_falling, -1e4)
+
+    # 每手牌对应 (点数, 张数) 的独热矩阵
+    selector = np.zeros((len(hands), 10 * (max_cards + 1)))
+    selector[np.arange(len(hands))[:, None], np.arange(10) * (max_cards + 1) + hands] = 1
+    log_probs = log_falling.reshape(len(counts), -1) @ selector.T
+    return log_probs - log_falling_total[:, hands.sum(axis=1)] + np.log(orderings)
+
+@lru_cache(maxsize=None)
+def _dealer_hands(rules):
+    """庄家从空手开始（先发两张）按规则要牌直到停牌时所有可能的最终手牌，以及对应的结果编号
+
+    每种规则只枚举一次；首两张为21点的手牌记为天然二十一点 (_DEALER_NATURAL)
+    """
+    limits = None if rules.decks is None else RANK_COUNTS * rules.decks
+    hands, orderings, totals = _enumerate_hands(limits, lambda total, soft, num_cards: rules.dealer_hits(total, soft))
+    outcomes = np.where(totals > 21, len(DEALER_OUTCOMES) - 1, totals - 17)
+    outcomes[(totals == 21) & (hands.sum(axis=1) == 2)] = _DEALER_NATURAL
+    return hands, orderings, outcomes
+
+def _dealer_distributions(counts, rules):
+    """庄家从每一种剩余牌组成 counts（形状为 (b, 10)）中发两张并按规则要牌的最终结果分布
+
+    返回形状为 (b, len(DEALER_OUTCOMES) + 1)，最后一列为天然二十一点
+    """
+    hands, orderings, outcomes = _dealer_hands(rules)
+    probs = np.exp(_hand_log_probs(hands, orderings, counts))
+    return probs @ np.eye(len(DEALER_OUTCOMES) + 1)[outcomes]
+
+# 庄家最终点数分布
+def dealer_final_distribution(up_rank, decks=1, rules=None, no_natural=True):
+    """计算庄家明牌为 up_rank 时，庄家最终结果的精确分布
+
+    GameEngine 发牌后立即结算天然二十一点，轮到玩家行动时庄家一定不是天然二十一点，
+    因此默认只在暗牌不与明牌组成天然二十一点的条件下计算（只影响明牌为A和10的情况）。
+
+    参数:
+    up_rank: 庄家明牌的点数编码
+    decks: 牌副数（从新牌中移除明牌后发牌），None 表示无限副牌
+    rules: blackjack_engine.Rules，给定时其牌副数覆盖 decks
+    no_natural: 是否以庄家不是天然二十一点为条件
+
+    返回:
+    dist: 依次为庄家停在17、18、19、20、21点和爆牌的概率
+    """
+    rules = _dealer_rules(Rules(decks=decks) if rules is None else rules)
+    decks = rules.decks
+    total, soft = _add_card(0, 0, up_rank)
+    if decks is None:
+        counts = None
+    else:
+        counts = RANK_COUNTS * decks
+        counts[up_rank] -= 1
+        counts = tuple(int(c) for c in counts)
+    if not no_natural or up_rank not in (0, 9):
+        return _dealer_distribution(counts, total, soft, rules).copy()
+
+    # 逐一展开暗牌，跳过与明牌组成天然二十一点的点数（A配10、10配A）
+    excluded = 9 if up_rank == 0 else 0
+    weights = RANK_PROBS if counts is None else np.array(counts, dtype=float)
+    dist = np.zeros(len(DEALER_OUTCOMES))
+    for rank, weight in enumerate(weights):
+        if rank == excluded or weight == 0:
+            continue
+        rest = None if counts is None else counts[:rank] + (counts[rank] - 1,) + counts[rank + 1:]
+        dist += weight * _dealer_distribution(rest, *_add_card(total, soft, rank), rules)
+    return dist / (weights.sum() - weights[excluded])
+
+# 计算胜率
+def win_probability(player_value, up_rank, decks=1, rules=None):
+    """计算玩家停牌于 player_value 时的胜率（平局算半胜），庄家不是天然二十一点（见 dealer_final_distribution）"""
+    if player_value > 21:  # 玩家已爆牌
+        return 0.0
+    dist = dealer_final_distribution(up_rank, decks, rules)
+    win = dist[-1]
+    for i, dealer_value in enumerate(DEALER_OUTCOMES[:-1]):
+        if player_value > dealer_value:
+            win += dist[i]
+        elif player_value == dealer_value:
+            win += 0.5 * dist[i]
+    return win
+
+# 计算爆牌概率
+def bust_probability(hand_value):
+    """计算当前点数下要牌的爆牌概率（百分比），与交互界面的分析口径一致"""
+    if hand_value >= 21:
+        return 100.0
+    safe_count = sum(count for value, count in zip(RANK_VALUES, RANK_COUNTS)
+                     if hand_value + min(value, 11) <= 21)
+    return (1 - safe_count / RANK_COUNTS.sum()) * 100
+
+# 决策建议
+def recommend_action(player_value, bust_prob, win_prob):
+    """根据点数、爆牌概率和胜率（百分比）给出建议：'hit' 或 'stand'"""
+    if player_value >= 17 and win_prob > 45:
+        return 'stand'
+    elif bust_prob < 30 or player_value <= 11:
+        return 'hit'
+    elif win_prob > 40:
+        return 'stand'
+    else:
+        return 'hit'
+
+@lru_cache(maxsize=None)
+def _advisor_policy(rules):
+    policy = np.zeros((2, 22, 10), dtype=bool)
+    for player_value in range(4, 21):
+        bust_prob = bust_probability(player_value)
+        for up_rank in range(10):
+            win_prob = win_probability(player_value, up_rank, rules=rules) * 100
+            policy[:, player_value, up_rank] = recommend_action(player_value, bust_prob, win_prob) == 'hit'
+    return policy
+
+def advisor_policy(rules=None):
+    """把决策建议编译成 blackjack_fast 的策略表，胜率使用规则 rules 下的精确值
+
+    决策建议只依赖庄家结果分布，策略表按影响庄家的规则（牌副数、软17）缓存
+    """
+    rules = Rules() if rules is None else rules
+    return _advisor_policy(_dealer_rules(rules)).copy()
+
+# 精确评估固定阈值策略
+def _dealer_rules(rules):
+    """只保留影响庄家要牌的规则，作为庄家结果分布的缓存键"""
+    return Rules(decks=rules.decks, dealer_hits_soft_17=rules.dealer_hits_soft_17)
+
+def _settle_probabilities(player_totals, player_natural, dealer_dists):
+    """玩家停牌点数为 player_totals、庄家结果分布为 dealer_dists 时各结算结果的概率
+
+    player_natural 标记玩家是否为天然二十一点；返回形状 (n, len(SETTLE_OUTCOMES))
+    """
+    dealer_values = np.array(DEALER_OUTCOMES[:-1])
+    player_totals = np.asarray(player_totals)[:, None]
+    stand = dealer_dists[:, :len(dealer_values)]
+    bust = dealer_dists[:, len(dealer_values)]
+    dealer_natural = dealer_dists[:, _DEALER_NATURAL]
+    win = bust + np.sum(stand * (player_totals > dealer_values), axis=1)
+    loss = np.sum(stand * (player_totals < dealer_values), axis=1) + dealer_natural
+    draw = np.sum(stand * (player_totals == dealer_values), axis=1)
+    # 玩家天然二十一点：庄家也是天然二十一点时平局，否则按天然二十一点赔付
+    blackjack = np.where(player_natural, 1 - dealer_natural, 0)
+    win = np.where(player_natural, 0, win)
+    loss = np.where(player_natural, 0, loss)
+    draw = np.where(player_natural, dealer_natural, draw)
+    return np.stack([blackjack, win, draw, loss], axis=1)
+
+@lru_cache(maxsize=None)
+def _player_hands(decks, threshold):
+    """玩家按固定阈值策略要牌时所有可能的最终手牌"""
+    limits = None if decks is None else RANK_COUNTS * decks
+    return _enumerate_hands(
+        limits, lambda total, soft, num_cards: num_cards < 2 or (total <= threshold and total < 21))
+
+def outcome_probabilities(thresholds=range(11, 21), decks=1, rules=None):
+    """不经抽样，精确计算一组固定阈值策略各结算结果的概率
+
+    玩家的最终手牌和庄家的最终手牌都按多重集枚举，并对每种有效发牌顺序的概率做精确累加；
+    有限副牌时庄家从去掉玩家手牌后的剩余牌中发牌（每局一副新牌），
+    所有阈值用到的剩余牌组成一次性批量计算庄家结果分布。
+    任一方为天然二十一点时直接结算，与 GameEngine 一致。
+
+    参数:
+    thresholds: 玩家策略的阈值列表
+    decks: 每局使用的牌副数，None 表示无限副牌
+    rules: blackjack_engine.Rules，给定时其牌副数覆盖 decks
+
+    返回:
+    results: 阈值 -> {结算结果: 概率}，结算结果见 SETTLE_OUTCOMES
+    """
+    rules = Rules(decks=decks) if rules is None else rules
+    decks = rules.decks
+    dealer_rules = _dealer_rules(rules)
+    full_counts = RANK_COUNTS * (1 if decks is None else decks)
+    # 阈值达到21及以上时都等价于一直要到21点
+    player_hands = {t: _player_hands(decks, min(t, 21)) for t in thresholds}
+
+    if decks is None:
+        dealer_dist = _dealer_distributions_infinite(dealer_rules)
+    else:
+        # 所有阈值下玩家停牌（未爆牌）的手牌，去重后批量计算庄家结果分布
+        standing = np.unique(np.concatenate(
+            [hands[totals <= 21] for hands, _, totals in player_hands.values()]), axis=0)
+        dealer_dists = _dealer_distributions(full_counts - standing, dealer_rules)
+        index = {hand.tobytes(): i for i, hand in enumerate(standing)}
+
+    results = {}
+    for threshold, (hands, orderings, totals) in player_hands.items():
+        if decks is None:
+            probs = orderings * np.prod(RANK_PROBS ** hands, axis=1)
+        else:
+            probs = np.exp(_hand_log_probs(hands, orderings, full_counts)[0])
+
+        bust = totals > 21
+        outcome = np.zeros(len(SETTLE_OUTCOMES))
+        outcome[SETTLE_OUTCOMES.index('loss')] = probs[bust].sum()
+        if decks is None:
+            dists = np.tile(dealer_dist, (np.sum(~bust), 1))
+        else:
+            dists = dealer_dists[[index[hand.tobytes()] for hand in hands[~bust]]]
+        natural = (totals[~bust] == 21) & (hands[~bust].sum(axis=1) == 2)
+        outcome += probs[~bust] @ _settle_probabilities(totals[~bust], natural, dists)
+        results[threshold] = {name: float(p) for name, p in zip(SETTLE_OUTCOMES, outcome)}
+    return results
+
+def threshold_outcomes(thresholds=range(11, 21), decks=1, rules=None):
+    """不经抽样，精确计算一组固定阈值策略的胜负平局率（天然二十一点计入胜率）
+
+    返回:
+    results: 阈值 -> (win_rate, loss_rate, draw_rate)
+    """
+    return {
+        threshold: (probs['blackjack'] + probs['win'], probs['loss'], probs['push'])
+        for threshold, probs in outcome_probabilities(thresholds, decks, rules).items()
+    }
+
+def _dealer_distributions_infinite(rules):
+    """无限副牌时庄家的最终结果分布"""
+    hands, orderings, outcomes = _dealer_hands(rules)
+    probs = orderings * np.prod(RANK_PROBS ** hands, axis=1)
+    return np.bincount(outcomes, weights=probs, minlength=len(DEALER_OUTCOMES) + 1)
+
+def threshold_outcome(threshold=16, decks=1, rules=None):
+    """精确计算单个固定阈值策略的结果分布
+
+    返回:
+    win_rate: 玩家胜率
+    loss_rate: 玩家败率
+    draw_rate: 平局率
+    """
+    return threshold_outcomes([threshold], decks, rules)[threshold]
+
+def threshold_payouts(threshold=16, decks=1, rules=None):
+    """固定阈值策略每注输赢的精确分布
+
+    返回:
+    payouts: 按 SETTLE_OUTCOMES 顺序的每注输赢（按规则的赔付表）
+    probs: 对应的概率
+    """
+    rules = Rules(decks=decks) if rules is None else rules
+    table = payout_table(rules)
+    outcome = outcome_probabilities([threshold], rules=rules)[threshold]
+    return (np.array([table[name] for name in SETTLE_OUTCOMES], dtype=float),
+            np.array([outcome[name] for name in SETTLE_OUTCOMES]))
+
+# 资本变化的精确分布（马尔可夫链）
+def capital_distribution(initial_capital=100, bet_amount=1, player_threshold=16, num_games=1000,
+                         decks=1, record_games=100, max_capital=None, rules=None):
+    """逐局传播资本的概率向量，精确计算资本分布、破产概率和破产局数分布
+
+    每局的输赢分布由 threshold_payouts 精确给出，资本为0时为吸收态；
+    与 simulate_capital_change 相同，资本不足一注时押上全部资本（非整数赔付向下取整到资本网格）。
+    天然二十一点的赔率不是整数时，资本网格按赔率的分母细分（如 3:2 时以半元为单位）。
+    每局的转移只是把概率向量按各结算结果的输赢平移后加权相加（稀疏卷积），
+    整个计算量为 O(局数 × 可达资本数)。
+
+    参数:
+    initial_capital: 初始资本（整数）
+    bet_amount: 每局下注金额（整数）
+    player_threshold: 玩家策略的阈值参数
+    num_games: 游戏局数
+    decks: 每局使用的牌副数，None 表示无限副牌
+    record_games: 记录完整资本分布的前若干局（用于热图）
+    max_capital: 热图记录的最大资本，默认为初始资本的3倍
+    rules: blackjack_engine.Rules，给定时其牌副数覆盖 decks
+
+    返回:
+    result: 字典
+        heatmap: 形状为 (max_capital + 1, record_games + 1) 的数组，第 t 列为第 t 局后资本（向下取整到元）的概率分布
+        ruin_probability: num_games 局内破产的概率
+        ruin_time: 长度为 num_games + 1 的数组，第 t 项为恰好在第 t 局破产的概率
+        final_distribution: num_games 局后资本（向下取整到元）的概率分布
+    """
+    payouts, probs = threshold_payouts(player_threshold, decks, rules)
+    keep = probs > 0
+    payouts, probs = payouts[keep], probs[keep]
+    max_capital = int(initial_capital * 3) if max_capital is None else max_capital
+    record_games = min(record_games, num_games)
+
+    # 资本网格：每元细分为 scale 格，使整注的各种输赢都落在网格上
+    scale = 1
+    for payout in payouts:
+        scale = np.lcm(scale, Fraction(float(payout * bet_amount)).limit_denominator(1000).denominator)
+    scale = int(scale)
+    bet = bet_amount * scale
+    steps = np.rint(payouts * bet).astype(int)
+
+    size = initial_capital * scale + num_games * max(int(steps.max()), 0) + 1
+    dist = np.zeros(size)
+    dist[initial_capital * scale] = 1.0
+    heatmap = np.zeros((max_capital + 1, record_games + 1))
+    ruin_time = np.zeros(num_games + 1)
+    small = np.arange(1, min(bet, size))  # 资本不足一注的状态
+    grid_capital = np.arange(size) // scale
+
+    def to_yuan(dist):
+        return np.bincount(grid_capital, weights=dist)
+
+    def record(t):
+        yuan = to_yuan(dist)
+        rows = min(max_capital + 1, len(yuan))
+        heatmap[:rows, t] = yuan[:rows]
+
+    record(0)
+    top = initial_capital * scale  # 当前可达的最大资本
+    for t in range(1, num_games + 1):
+        new = np.zeros(size)
+        active = dist[bet:top + 1]
+        for step, prob in zip(steps, probs):
+            new[bet + step:top + step + 1] += prob * active
+
+        # 资本不足一注时押上全部
+        low_states = small[small <= top]
+        low = dist[low_states]
+        for payout, prob in zip(payouts, probs):
+            np.add.at(new, np.floor(low_states * (1 + payout)).astype(int), prob * low)
+
+        new[0] += dist[0]  # 破产为吸收态
+        ruin_time[t] = new[0] - dist[0]
+        dist = new
+        top = min(top + max(int(steps.max()), 0), size - 1)
+        if t <= record_games:
+            record(t)
+
+    return {
+        'heatmap': heatmap,
+        'ruin_probability': float(dist[0]),
+        'ruin_time': ruin_time,
+        'final_distribution': to_yuan(dist),
+    }
@@ -0,0 +1,191 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+# 耗时分类：按 (文件名, 函数名) 或第三方包归类，未匹配的计入 other
+CATEGORY_LABELS = {
+    'dealing': '发牌',
+    'hand_evaluation': '手牌计算',
+    'policy': '策略判断',
+    'progress_bar': '进度条',
+    'plotting': '绘图',
+    'other': '其他',
+}
+
+_FUNCTION_CATEGORIES = {
+    ('blackjack_engine.py', 'Deck.deal'): 'dealing',
+    ('blackjack_engine.py', 'Deck.reset'): 'dealing',
+    ('blackjack_engine.py', 'GameEngine._draw'): 'dealing',
+    ('blackjack_fast.py', 'draw'): 'dealing',
+    ('blackjack_fast.py', 'new_shoe'): 'dealing',
+    ('random.py', 'Random.shuffle'): 'dealing',
+    ('blackjack_engine.py', 'hand_total'): 'hand_evaluation',
+    ('blackjack_engine.py', 'calculate_hand_value'): 'hand_evaluation',
+    ('blackjack_engine.py', 'GameEngine.player_value'): 'hand_evaluation',
+    ('blackjack_engine.py', 'GameEngine.dealer_value'): 'hand_evaluation',
+    ('blackjack_fast.py', 'add_card'): 'hand_evaluation',
+    ('blackjack_odds.py', '_add_card'): 'hand_evaluation',
+    ('blackjack.py', 'player_strategy_fixed_threshold'): 'policy',
+    ('blackjack_engine.py', 'dealer_strategy'): 'policy',
+    ('blackjack_engine.py', 'Rules.dealer_hits'): 'policy',
+    ('blackjack_odds.py', 'recommend_action'): 'policy',
+}
+
+_PACKAGE_CATEGORIES = {'tqdm': 'progress_bar', 'matplotlib': 'plotting', 'seaborn': 'plotting', 'PIL': 'plotting'}
+
+_qualnames = {}  # (代码对象, 类) -> 限定名，Python 3.10 及更早版本使用
+
+def _frame_name(code, frame=None):
+    """栈帧的限定名（如 Deck.deal）
+
+    Python 3.11 起代码对象自带 co_qualname；更早的版本（如 Docker 镜像中的 3.10）由第一个参数
+    self/cls 所属的类推出：沿 MRO 找到定义这个代码对象的类（含属性和类方法）。
+    """
+    qualname = getattr(code, 'co_qualname', None)
+    if qualname is not None:
+        return qualname
+    if frame is None or not code.co_argcount or code.co_varnames[0] not in ('self', 'cls'):
+        return code.co_name
+    owner = frame.f_locals.get(code.co_varnames[0])
+    cls = owner if isinstance(owner, type) else type(owner)
+    key = (code, cls)
+    if key not in _qualnames:
+        _qualnames[key] = code.co_name
+        for klass in cls.__mro__:
+            attr = klass.__dict__.get(code.co_name)
+            func = getattr(attr, 'fget', None) or getattr(attr, '__func__', None) or attr
+            if getattr(func, '__code__', None) is code:
+                _qualnames[key] = f"{klass.__name__}.{code.co_name}"
+                break
+    return _qualnames[key]
+
+def _classify(code, frame=None):
+    """返回一个栈帧所属的耗时分类，不属于任何分类时返回 None"""
+    path = code.co_filename
+    category = _FUNCTION_CATEGORIES.get((os.path.basename(path), _frame_name(code, frame)))
+    if category is not None:
+        return category
+    for package, category in _PACKAGE_CATEGORIES.items():
+        if f'{os.sep}{package}{os.sep}' in path:
+            return category
+    return None
+
+# 采样分析
+class StackSampler:
+    """后台线程定期采样目标线程的调用栈，汇总成折叠栈 (collapsed stack) 计数
+
+    折叠栈每行为 "根帧;...;叶帧 次数"，可直接交给 flamegraph.pl 或 speedscope 绘制火焰图。
+    每个样本归入栈上离叶端最近的已知分类（如 numpy 调用发生在绘图函数内则计入绘图）。
+    """
+    def __init__(self, interval=0.001, thread_id=None):
+        self.interval = interval
+        self.thread_id = threading.get_ident() if thread_id is None else thread_id
+        self.stacks = Counter()
+        self.categories = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # 缩短解释器的线程切换间隔，否则繁忙的目标线程会让采样线程长时间拿不到 GIL
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._switch_interval)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            category = None
+            while frame is not None:
+                code = frame.f_code
+                if category is None:
+                    category = _classify(code, frame)
+                names.append(f"{_frame_name(code, frame)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.categories[category or 'other'] += 1
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+# 分析一次调用
+def profile_call(func, *args, output_prefix=None, top=20, sample_interval=0.001, **kwargs):
+    """在 cProfile 和栈采样下运行 func(*args, **kwargs)
+
+    参数:
+    func: 要分析的函数
+    output_prefix: 输出文件前缀，给定时写出 前缀.collapsed（折叠栈）、前缀.pstats（cProfile 数据）
+                   和 前缀.txt（摘要）
+    top: 摘要中列出的自身耗时最高的函数数
+    sample_interval: 采样间隔（秒）
+
+    返回:
+    result: func 的返回值
+    report: 字典
+        elapsed: 墙钟时间（秒）
+        categories: 分类 -> 耗时占比（按样本数）
+        overview: 用时和分类占比
+        summary: overview 加上自身耗时前 top 的函数
+    """
+    profiler = cProfile.Profile()
+    sampler = StackSampler(sample_interval)
+    start = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        sampler.stop()
+    elapsed = time.perf_counter() - start
+
+    total = sum(sampler.categories.values())
+    categories = {name: sampler.categories[name] / total if total else 0.0 for name in CATEGORY_LABELS}
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats('tottime').print_stats(top)
+    lines = [f"{getattr(func, '__name__', repr(func))}: 用时 {elapsed:.3f} 秒，采样 {total} 次，耗时分类:"]
+    for name, share in sorted(categories.items(), key=lambda item: -item[1]):
+        lines.append(f"  {CATEGORY_LABELS[name]}: {share * 100:.1f}% ({share * elapsed:.3f} 秒)")
+    overview = '\n'.join(lines)
+    summary = overview + '\n\n' + stream.getvalue()
+
+    if output_prefix is not None:
+        directory = os.path.dirname(output_prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        sampler.write_collapsed(f"{output_prefix}.collapsed")
+        stats.dump_stats(f"{output_prefix}.pstats")
+        with open(f"{output_prefix}.txt", 'w', encoding='utf-8') as f:
+            f.write(summary)
+
+    return result, {'elapsed': elapsed, 'categories': categories, 'overview': overview, 'summary': summary}
+
+def profiled(func):
+    """给模拟入口函数增加 profile 参数：profile 为输出文件前缀时在分析器下运行并写出分析结果"""
+    @functools.wraps(func)
+    def wrapper(*args, profile=None, **kwargs):
+        if profile is None:
+            return func(*args, **kwargs)
+        result, report = profile_call(func, *args, output_prefix=profile, **kwargs)
+        print(report['overview'])
+        print(f"分析结果已写入 {profile}.collapsed / .pstats / .txt")
+        return result
+    return wrapper
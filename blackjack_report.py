@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# 渲染缓存清单：图表名 -> {'inputs': 输入数据哈希, 'sources': {源码文件: 哈希}}
+CACHE_FILE = '.render_cache.json'
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _file_hash(name):
+    """本目录下源码文件的哈希，文件不存在时为 None"""
+    path = os.path.join(SCRIPT_DIR, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _loaded_sources():
+    """当前进程已导入的本目录模块的源码哈希
+
+    在绘制图表之后调用，得到的就是图表实际依赖的源码（包括函数内部才导入的模块），
+    其中任一文件变化时缓存失效，不需要手工维护依赖列表。
+    """
+    names = set()
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path and os.path.dirname(os.path.abspath(path)) == SCRIPT_DIR:
+            names.add(os.path.basename(path))
+    return {name: _file_hash(name) for name in sorted(names)}
+
+def figure_hash(job, formats, dpi):
+    """计算一张图表的输入哈希（绘图函数、参数和输出格式），源码的变化由 _loaded_sources 单独记录"""
+    payload = {
+        'plot': job['plot'],
+        'kwargs': job.get('kwargs', {}),
+        'formats': sorted(formats),
+        'dpi': dpi,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=repr, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+def _is_fresh(entry, digest):
+    """缓存条目的输入哈希与当前一致，且记录的源码都没有变化"""
+    return (isinstance(entry, dict) and entry.get('inputs') == digest
+            and all(_file_hash(name) == source for name, source in entry.get('sources', {}).items()))
+
+def _init_worker():
+    """工作进程使用无界面的 Agg 后端"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+def _render(job, output_dir, formats, dpi):
+    """在工作进程中绘制一张图表并按各格式保存，返回 (保存的文件路径, 绘制时已导入的源码哈希)"""
+    import matplotlib.pyplot as plt
+    import blackjack
+
+    # 每张图表都从相同的随机种子开始，保证结果与渲染顺序和进程无关
+    np.random.seed(42)
+    random.seed(42)
+
+    fig = getattr(blackjack, job['plot'])(**job.get('kwargs', {}))
+    paths = []
+    for fmt in formats:
+        path = os.path.join(output_dir, f"{job['name']}.{fmt}")
+        fig.savefig(path, dpi=dpi)
+        paths.append(path)
+    plt.close(fig)
+    return paths, _loaded_sources()
+
+# 并行渲染图表
+def render_figures(jobs, output_dir, formats=('png',), dpi=300, workers=None, use_cache=True):
+    """在多个工作进程中并行渲染图表，跳过输入数据未变化的图表
+
+    参数:
+    jobs: 图表任务列表，每项为 {'name': 文件名, 'plot': blackjack 中的绘图函数名, 'kwargs': 参数}
+    output_dir: 输出目录
+    formats: 输出格式，如 ('png', 'svg', 'pdf')
+    dpi: 位图格式的分辨率
+    workers: 工作进程数，默认为 CPU 核数；0 表示在当前进程中依次渲染（便于调试和性能分析）
+    use_cache: 是否跳过输入哈希和所依赖源码都未变化且文件已存在的图表
+
+    每张图表绘制完成后立即写入缓存清单，某张图表失败时已完成的图表仍会被缓存，
+    所有任务结束后再抛出第一个失败的异常。
+
+    返回:
+    status: 图表名 -> 'cached' 或 'rendered'
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache_path = os.path.join(output_dir, CACHE_FILE)
+    cache = {}
+    if use_cache and os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as f:
+            cache = json.load(f)
+
+    status = {}
+    pending = []
+    for job in jobs:
+        digest = figure_hash(job, formats, dpi)
+        outputs_exist = all(os.path.exists(os.path.join(output_dir, f"{job['name']}.{fmt}")) for fmt in formats)
+        if use_cache and outputs_exist and _is_fresh(cache.get(job['name']), digest):
+            status[job['name']] = 'cached'
+        else:
+            pending.append((job, digest))
+
+    def finished(job, digest, sources):
+        cache[job['name']] = {'inputs': digest, 'sources': sources}
+        status[job['name']] = 'rendered'
+        _write_cache(cache_path, cache)
+
+    if pending and workers == 0:
+        for job, digest in pending:
+            _, sources = _render(job, output_dir, formats, dpi)
+            finished(job, digest, sources)
+    elif pending:
+        errors = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {pool.submit(_render, job, output_dir, formats, dpi): (job, digest) for job, digest in pending}
+            for future in as_completed(futures):
+                try:
+                    _, sources = future.result()
+                except Exception as e:
+                    errors.append(e)
+                else:
+                    finished(*futures[future], sources)
+        if errors:
+            raise errors[0]
+
+    _write_cache(cache_path, cache)
+    return {job['name']: status[job['name']] for job in jobs}
+
+def _write_cache(cache_path, cache):
+    """原子地写入缓存清单（先写临时文件再替换），中途中断不会留下损坏的清单"""
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
@@ -0,0 +1,164 @@
+import argparse
+import itertools
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+import blackjack_fast
+
+# 庄家明牌分组：2~6 为弱牌，7~A 为强牌
+WEAK_UPCARDS = [1, 2, 3, 4, 5]
+STRONG_UPCARDS = [0, 6, 7, 8, 9]
+
+# 参数化策略
+def strategy_policy(hard_weak=16, hard_strong=16, soft=17):
+    """按庄家明牌强弱和软/硬牌分别设置阈值的策略表
+
+    参数:
+    hard_weak: 硬牌、庄家明牌为 2~6 时的要牌阈值
+    hard_strong: 硬牌、庄家明牌为 7~A 时的要牌阈值
+    soft: 软牌（有按11点计的A）时的要牌阈值
+
+    返回:
+    policy: blackjack_fast 的策略表
+    """
+    policy = np.zeros((2, 22, 10), dtype=bool)
+    policy[0, :min(hard_weak, 20) + 1, WEAK_UPCARDS] = True
+    policy[0, :min(hard_strong, 20) + 1, STRONG_UPCARDS] = True
+    policy[1, :min(soft, 20) + 1, :] = True
+    return policy
+
+def default_candidates():
+    """默认的候选策略空间：硬牌阈值按庄家明牌强弱分开，加上软牌阈值"""
+    return [
+        {'hard_weak': hard_weak, 'hard_strong': hard_strong, 'soft': soft}
+        for hard_weak, hard_strong, soft in itertools.product(range(11, 18), range(11, 19), range(15, 21))
+    ]
+
+# 逐轮淘汰搜索
+def search_strategies(candidates=None, initial_hands=2000, eta=2, confidence=0.95, max_rounds=12,
+                      decks=1, seed=0, rules=None, validation_hands=None):
+    """用竞速 (racing) 加逐次减半 (successive halving) 搜索期望收益最高的策略
+
+    每一轮所有存活的候选策略使用相同的随机数流（公共随机数）各玩一批牌，
+    先淘汰置信上界低于最优置信下界的候选（统计上被支配），再只保留平均收益排名前 1/eta 的候选，
+    下一轮每个候选的局数乘以 eta，把预算集中在接近的竞争者上。
+
+    选出最优策略所用的牌局上的平均收益偏高、区间偏窄（赢家诅咒，Bonferroni 校正不能消除选择偏差），
+    因此报告的期望收益和置信区间来自用独立随机数流重新模拟的 validation_hands 局。
+
+    参数:
+    candidates: 候选策略参数列表，每项为 strategy_policy 的关键字参数，默认为 default_candidates()
+    initial_hands: 第一轮每个候选的局数
+    eta: 每轮保留的比例的倒数和局数的增长倍数
+    confidence: 置信区间的置信水平（对存活候选数做 Bonferroni 校正）
+    max_rounds: 最大轮数
+    decks: 每局使用的牌副数，None 表示无限副牌
+    seed: 随机种子
+    rules: blackjack_engine.Rules，给定时其牌副数覆盖 decks（收益按其赔付表计算）
+    validation_hands: 复验最优策略的局数，默认与最优策略在搜索中的局数相同
+
+    返回:
+    report: 字典
+        winner: 最优策略的参数
+        expected_return: 最优策略在复验牌局上的平均收益
+        ci: 复验牌局上平均收益的置信区间
+        search_return: 最优策略在搜索牌局上的平均收益（有选择偏差，仅供对比）
+        validation_hands: 复验的局数
+        hands: 搜索共模拟的局数（不含复验）
+        exhaustive_hands: 让每个候选都达到最优策略同样局数的穷举成本
+        rounds: 每轮的存活候选数和每候选局数
+    """
+    candidates = default_candidates() if candidates is None else list(candidates)
+    policies = [strategy_policy(**params) for params in candidates]
+    stats = np.zeros((len(candidates), 3))  # 局数, 收益和, 收益平方和
+    alive = np.arange(len(candidates))
+    hands_per_candidate = initial_hands
+    total_hands = 0
+    rounds = []
+
+    for round_index in range(max_rounds):
+        for i in alive:
+            rng = np.random.default_rng([seed, round_index])
+            returns = blackjack_fast.play_hands(hands_per_candidate, policies[i], decks=decks, rng=rng,
+                                                rules=rules)['payout']
+            stats[i] += [len(returns), returns.sum(), np.sum(returns ** 2)]
+        total_hands += hands_per_candidate * len(alive)
+        rounds.append({'candidates': len(alive), 'hands_per_candidate': hands_per_candidate})
+
+        # 竞速：淘汰统计上被支配的候选
+        mean, low, high = _confidence_bounds(stats[alive], confidence, len(alive))
+        alive = alive[high >= low.max()]
+        # 逐次减半：只保留平均收益排名靠前的候选
+        mean = _confidence_bounds(stats[alive], confidence, len(alive))[0]
+        keep = max(1, math.ceil(len(alive) / eta))
+        alive = alive[np.argsort(-mean)[:keep]]
+        if len(alive) == 1:
+            break
+        hands_per_candidate *= eta
+
+    mean = _confidence_bounds(stats[alive], confidence, len(alive))[0]
+    best_index = int(np.argmax(mean))
+    best = alive[best_index]
+
+    # 在新的牌局上复验最优策略；各轮的随机数流为 [seed, 轮次]，轮次小于 max_rounds
+    validation_hands = int(stats[best, 0]) if validation_hands is None else validation_hands
+    rng = np.random.default_rng([seed, max_rounds])
+    returns = blackjack_fast.play_hands(validation_hands, policies[best], decks=decks, rng=rng,
+                                        rules=rules)['payout']
+    validation = np.array([[len(returns), returns.sum(), np.sum(returns ** 2)]])
+    validated, low, high = _confidence_bounds(validation, confidence, 1)
+    return {
+        'winner': candidates[best],
+        'expected_return': float(validated[0]),
+        'ci': (float(low[0]), float(high[0])),
+        'search_return': float(mean[best_index]),
+        'validation_hands': validation_hands,
+        'hands': int(total_hands),
+        'exhaustive_hands': int(stats[best, 0] * len(candidates)),
+        'rounds': rounds,
+    }
+
+def _confidence_bounds(stats, confidence, num_comparisons):
+    """由 (局数, 收益和, 收益平方和) 计算平均收益及其置信区间"""
+    n, total, total_sq = stats.T
+    mean = total / n
+    variance = np.maximum(total_sq / n - mean ** 2, 0) * n / np.maximum(n - 1, 1)
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / (2 * num_comparisons))
+    half_width = z * np.sqrt(variance / n)
+    return mean, mean - half_width, mean + half_width
+
+def main():
+    parser = argparse.ArgumentParser(description="二十一点策略参数空间的竞速/逐次减半搜索")
+    parser.add_argument("--initial-hands", type=int, default=2000, help="第一轮每个候选的局数")
+    parser.add_argument("--eta", type=int, default=2, help="每轮保留 1/eta 的候选，局数乘以 eta")
+    parser.add_argument("--confidence", type=float, default=0.95, help="置信水平")
+    parser.add_argument("--max-rounds", type=int, default=12, help="最大轮数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--validation-hands", type=int, help="复验最优策略的局数，默认与其搜索局数相同")
+    args = parser.parse_args()
+
+    report = search_strategies(
+        initial_hands=args.initial_hands,
+        eta=args.eta,
+        confidence=args.confidence,
+        max_rounds=args.max_rounds,
+        seed=args.seed,
+        validation_hands=args.validation_hands,
+    )
+    print("\n===== 策略搜索结果 =====\n")
+    for i, round_info in enumerate(report['rounds'], 1):
+        print(f"第{i}轮: {round_info['candidates']} 个候选, 每个 {round_info['hands_per_candidate']} 局")
+    winner = report['winner']
+    low, high = report['ci']
+    print(f"\n最优策略: 硬牌阈值 (庄家2~6) = {winner['hard_weak']}, "
+          f"硬牌阈值 (庄家7~A) = {winner['hard_strong']}, 软牌阈值 = {winner['soft']}")
+    print(f"期望收益（独立复验 {report['validation_hands']} 局）: {report['expected_return']*100:.2f}% "
+          f"({args.confidence:.0%} 置信区间: {low*100:.2f}% ~ {high*100:.2f}%)，"
+          f"搜索牌局上为 {report['search_return']*100:.2f}%")
+    print(f"共模拟 {report['hands']} 局，穷举同等精度需要 {report['exhaustive_hands']} 局 "
+          f"({report['hands'] / report['exhaustive_hands']:.1%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import random
+import signal
+import sys
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import blackjack_odds
+from blackjack_engine import Rules, OUTCOMES
+from blackjack_fast import RANKS, play_policies, threshold_policy
+
+# 单次模拟请求允许的最大局数
+MAX_SIMULATION_HANDS = 5_000_000
+
+# 默认的请求合并窗口（秒）：窗口内到达的同类请求合并成一次向量化计算
+DEFAULT_BATCH_WINDOW = 0.005
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                500: 'Internal Server Error'}
+
+# 请求解析
+def parse_rules(data):
+    """从请求的 rules 字段构造 Rules，未给出的字段使用默认值
+
+    每个字段都检查类型（Rules 是各模块查找表的缓存键，不能让无效的规则进入缓存）：
+    开关字段必须是 JSON 布尔值，赔率必须是正数，decks 必须是正整数或 null。
+    """
+    fields = data.get('rules') or {}
+    if not isinstance(fields, dict):
+        raise ValueError("rules 必须是对象")
+    unknown = set(fields) - set(Rules.__dataclass_fields__)
+    if unknown:
+        raise ValueError(f"未知的规则字段: {sorted(unknown)}")
+    for name in ('dealer_hits_soft_17', 'double_down', 'surrender'):
+        if name in fields and not isinstance(fields[name], bool):
+            raise ValueError(f"{name} 必须是 true 或 false")
+    payout = fields.get('blackjack_payout', Rules.blackjack_payout)
+    if isinstance(payout, bool) or not isinstance(payout, (int, float)) or not 0 < payout < float('inf'):
+        raise ValueError("blackjack_payout 必须是正数")
+    decks = fields.get('decks', Rules.decks)
+    if decks is not None and (isinstance(decks, bool) or not isinstance(decks, int) or decks < 1):
+        raise ValueError("decks 必须是正整数或 null（无限副牌）")
+    return Rules(**fields)
+
+def parse_advisor(data):
+    """决策建议请求: {"player_value": 16, "dealer_card": "10", "rules": {...}}"""
+    player_value = data.get('player_value')
+    if isinstance(player_value, bool) or not isinstance(player_value, int) or not 4 <= player_value <= 21:
+        raise ValueError("player_value 必须是 4 到 21 之间的整数")
+    dealer_card = str(data.get('dealer_card', ''))
+    dealer_card = '10' if dealer_card in ('J', 'Q', 'K') else dealer_card
+    if dealer_card not in RANKS:
+        raise ValueError(f"dealer_card 必须是 {', '.join(RANKS)} 或 J/Q/K")
+    return {'player_value': player_value, 'up_rank': RANKS.index(dealer_card), 'rules': parse_rules(data)}
+
+def parse_simulation(data):
+    """模拟请求: {"policy": 16 或 "advisor", "num_hands": 100000, "seed": 可选, "rules": {...}}"""
+    policy = data.get('policy', 16)
+    if policy != 'advisor' and (isinstance(policy, bool) or not isinstance(policy, int) or not 4 <= policy <= 21):
+        raise ValueError("policy 必须是 4 到 21 之间的要牌阈值或 \"advisor\"")
+    num_hands = data.get('num_hands', 100000)
+    if isinstance(num_hands, bool) or not isinstance(num_hands, int) or not 1 <= num_hands <= MAX_SIMULATION_HANDS:
+        raise ValueError(f"num_hands 必须是 1 到 {MAX_SIMULATION_HANDS} 之间的整数")
+    seed = data.get('seed')
+    if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int) or seed < 0):
+        raise ValueError("seed 必须是非负整数")
+    return {'policy': policy, 'num_hands': num_hands, 'seed': seed, 'rules': parse_rules(data)}
+
+# 批量计算
+def advisor_batch(rules, requests):
+    """同一规则下的一批决策建议请求：每种庄家明牌只取一次精确分布，胜率一次向量化算出
+
+    返回与 requests 顺序相同的结果列表
+    """
+    up_ranks = np.array([request['up_rank'] for request in requests])
+    player_values = np.array([request['player_value'] for request in requests])
+    unique_ups, index = np.unique(up_ranks, return_inverse=True)
+    dists = np.array([blackjack_odds.dealer_final_distribution(int(up), rules=rules) for up in unique_ups])[index]
+
+    # 与 blackjack_odds.win_probability 相同：庄家爆牌或点数小于玩家算胜，平局算半胜
+    dealer_values = np.array(blackjack_odds.DEALER_OUTCOMES[:-1])
+    stand = dists[:, :len(dealer_values)]
+    win = dists[:, -1] + np.sum(stand * (player_values[:, None] > dealer_values), axis=1) \
+        + 0.5 * np.sum(stand * (player_values[:, None] == dealer_values), axis=1)
+
+    results = []
+    for request, dist, win_prob in zip(requests, dists, win):
+        bust_prob = blackjack_odds.bust_probability(request['player_value'])
+        results.append({
+            'player_value': request['player_value'],
+            'dealer_card': RANKS[request['up_rank']],
+            'dealer_distribution': {str(outcome): float(p) for outcome, p in zip(blackjack_odds.DEALER_OUTCOMES, dist)},
+            'win_probability': float(win_prob),
+            'bust_probability': bust_prob / 100,
+            'action': blackjack_odds.recommend_action(request['player_value'], bust_prob, win_prob * 100),
+        })
+    return results
+
+def simulation_batch(rules, policies, num_hands, seed):
+    """在工作进程中执行的一批模拟：所有策略共用一条牌流一次模拟 num_hands 局（见 blackjack_fast.play_policies）
+
+    返回 策略 -> 每局输赢数组和结算结果数组
+    """
+    tables = {policy: blackjack_odds.advisor_policy(rules) if policy == 'advisor' else threshold_policy(policy)
+              for policy in policies}
+    results = play_policies(num_hands, tables, rng=np.random.default_rng(seed), rules=rules)
+    return {policy: (result['payout'], result['outcome'].astype(np.int8)) for policy, result in results.items()}
+
+def summarize_simulation(policy, num_hands, seed, payout, outcome):
+    """取一批模拟结果的前 num_hands 局，整理成与 blackjack.compare_thresholds 相同的统计"""
+    payout, outcome = payout[:num_hands], outcome[:num_hands]
+    counts = dict(zip(OUTCOMES, np.bincount(outcome, minlength=len(OUTCOMES))))
+    return {
+        'policy': policy,
+        'num_hands': num_hands,
+        'seed': seed,
+        'win_rate': float((counts['blackjack'] + counts['win']) / num_hands),
+        'loss_rate': float((counts['loss'] + counts['surrender']) / num_hands),
+        'draw_rate': float(counts['push'] / num_hands),
+        'expected_return': float(payout.mean()),
+        'std_error': float(payout.std() / math.sqrt(num_hands)),
+    }
+
+# 请求合并
+class BatchQueue:
+    """把同一个键的请求合并成批，每批交给 handler 一次处理
+
+    一个键的第一个请求到达后等待 window 秒再处理这一批；同一个键的上一批还在处理时，
+    新到的请求继续累积，上一批完成后立即作为下一批处理。
+    handler(params_list) 是协程，返回与 params_list 顺序相同的结果列表；
+    它抛出的异常会传给这一批的所有请求。
+    """
+    def __init__(self, handler, window=DEFAULT_BATCH_WINDOW):
+        self.handler = handler
+        self.window = window
+        self.requests = 0
+        self.batches = 0
+        self._pending = {}
+        self._running = set()
+        self._tasks = set()
+
+    async def submit(self, key, params):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        group = self._pending.get(key)
+        if group is None:
+            group = self._pending[key] = []
+            if key not in self._running:
+                loop.call_later(self.window, self._start_flush, key)
+        group.append((params, future))
+        return await future
+
+    def _start_flush(self, key):
+        self._running.add(key)
+        task = asyncio.ensure_future(self._flush(key, self._pending.pop(key)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, key, group):
+        self.requests += len(group)
+        self.batches += 1
+        try:
+            results = await self.handler([params for params, _ in group])
+        except Exception as e:
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(group, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._running.discard(key)
+            if key in self._pending:
+                self._start_flush(key)
+
+    def stats(self):
+        return {'requests': self.requests, 'batches': self.batches,
+                'requests_per_batch': self.requests / self.batches if self.batches else 0.0}
+
+# 服务
+class BlackjackService:
+    """基于 asyncio 的 JSON/HTTP 服务
+
+    接口:
+    GET  /health    存活检查
+    GET  /stats     各接口的请求数和合并后的批次数
+    POST /advisor   决策建议：庄家结果分布、胜率、爆牌概率和建议动作（精确计算）
+    POST /simulate  用批量引擎模拟固定策略，返回胜负比例和每注期望
+
+    决策建议按规则分组合并；模拟请求按 (规则, 种子, 局数量级) 分组，同组的不同策略在工作进程中
+    共用一条牌流一次模拟，局数取组内最大值，各请求取前 num_hands 局。相同的请求因此得到相同的结果。
+    只有显式给出种子的模拟请求才会合并：未给出种子的请求各自抽取独立的种子（随结果返回），
+    否则同时到达的请求会得到完全相同的"随机"结果。
+    """
+    def __init__(self, workers=None, window=DEFAULT_BATCH_WINDOW):
+        self.pool = ProcessPoolExecutor(workers or multiprocessing.cpu_count())
+        self.advisor_queue = BatchQueue(self._run_advisor, window)
+        self.simulation_queue = BatchQueue(self._run_simulations, window)
+
+    async def _run_advisor(self, requests):
+        # 精确分布按规则缓存，命中后每组只需几十微秒，直接在事件循环中计算
+        return advisor_batch(requests[0]['rules'], requests)
+
+    async def _run_simulations(self, requests):
+        first = requests[0]
+        seed = first['seed']
+        policies = sorted({request['policy'] for request in requests}, key=str)
+        num_hands = max(request['num_hands'] for request in requests)
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self.pool, simulation_batch, first['rules'], policies, num_hands, seed)
+        return [summarize_simulation(request['policy'], request['num_hands'], seed, *results[request['policy']])
+                for request in requests]
+
+    async def advisor(self, data):
+        request = parse_advisor(data)
+        return await self.advisor_queue.submit(request['rules'], request)
+
+    async def simulate(self, data):
+        request = parse_simulation(data)
+        if request['seed'] is None:
+            request['seed'] = random.getrandbits(63)
+        key = (request['rules'], request['seed'], int(math.log10(request['num_hands'])))
+        return await self.simulation_queue.submit(key, request)
+
+    def stats(self):
+        return {'advisor': self.advisor_queue.stats(), 'simulate': self.simulation_queue.stats()}
+
+    async def dispatch(self, method, target, body):
+        """处理一个请求，返回 (状态码, JSON 对象)"""
+        path = urllib.parse.urlsplit(target).path
+        routes = {'/health': ('GET', None), '/stats': ('GET', None),
+                  '/advisor': ('POST', self.advisor), '/simulate': ('POST', self.simulate)}
+        if path not in routes:
+            return 404, {'error': f"未知路径: {path}"}
+        expected, handler = routes[path]
+        if method != expected:
+            return 405, {'error': f"{path} 只接受 {expected}"}
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            return 200, self.stats()
+        try:
+            data = json.loads(body or b'{}')
+            if not isinstance(data, dict):
+                raise ValueError("请求体必须是 JSON 对象")
+            return 200, await handler(data)
+        except (ValueError, TypeError) as e:
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+
+    async def handle_connection(self, reader, writer):
+        """处理一个连接上的 HTTP/1.1 请求（支持 keep-alive）"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, payload = await self.dispatch(method, target, body)
+                data = json.dumps(payload, ensure_ascii=False).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write((f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                              f"Content-Type: application/json; charset=utf-8\r\n"
+                              f"Content-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # 客户端断开或请求格式错误，直接关闭连接
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8600, ready=None):
+        """开始监听直到收到 SIGTERM；ready 为 multiprocessing.Event 时开始监听后置位"""
+        loop = asyncio.get_running_loop()
+        # 先启动工作进程并导入引擎，第一批模拟不需要等待
+        await loop.run_in_executor(self.pool, simulation_batch, Rules(), [16], 1, 0)
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"二十一点服务已启动: http://{host}:{port}", flush=True)
+        if ready is not None:
+            ready.set()
+        # SIGTERM 时正常退出，由 run_service 关闭工作进程池（否则工作进程会遗留下来）
+        stop = loop.create_future()
+        loop.add_signal_handler(signal.SIGTERM, stop.set_result, None)
+        async with server:
+            await stop
+
+def run_service(host='127.0.0.1', port=8600, workers=None, window=DEFAULT_BATCH_WINDOW, ready=None):
+    service = BlackjackService(workers, window)
+    try:
+        asyncio.run(service.serve(host, port, ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.pool.shutdown(cancel_futures=True)
+
+# 本地负载生成器
+async def _http_request(reader, writer, method, path, payload=None):
+    """在已有连接上发送一个请求并读取 JSON 响应，返回 (状态码, JSON 对象)"""
+    body = b'' if payload is None else json.dumps(payload).encode()
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+def _random_request(rng, simulate_fraction, num_hands):
+    """按比例生成一个决策建议或模拟请求"""
+    if rng.random() < simulate_fraction:
+        # 只有给出种子的请求会合并，模拟的调用方使用少量固定种子复现结果
+        return 'simulate', {'policy': rng.choice([12, 13, 14, 15, 16, 17, 'advisor']), 'num_hands': num_hands,
+                            'seed': rng.randrange(4)}
+    return 'advisor', {'player_value': rng.randint(4, 20), 'dealer_card': rng.choice(RANKS),
+                       'rules': {'decks': rng.choice([1, 6])}}
+
+async def _client(host, port, rng, deadline, simulate_fraction, num_hands, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            kind, payload = _random_request(rng, simulate_fraction, num_hands)
+            start = time.perf_counter()
+            status, _ = await _http_request(reader, writer, 'POST', f'/{kind}', payload)
+            latencies.setdefault(kind, []).append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+def _summarize(values_ms):
+    """延迟分位数（毫秒），与 blackjack_loadtest 的报告格式相同"""
+    if len(values_ms) == 0:
+        return {'count': 0}
+    p50, p90, p99 = np.percentile(values_ms, [50, 90, 99])
+    return {
+        'count': int(len(values_ms)),
+        'p50_ms': float(p50),
+        'p90_ms': float(p90),
+        'p99_ms': float(p99),
+        'max_ms': float(np.max(values_ms)),
+    }
+
+async def _load_test(host, port, clients, duration, simulate_fraction, num_hands, seed):
+    rng = random.Random(seed)
+    latencies, errors = {}, []
+    reader, writer = await asyncio.open_connection(host, port)
+    _, before = await _http_request(reader, writer, 'GET', '/stats')
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(_client(host, port, random.Random(rng.getrandbits(32)), deadline, simulate_fraction,
+                                   num_hands, latencies, errors) for _ in range(clients)))
+    wall = time.perf_counter() - start
+    _, after = await _http_request(reader, writer, 'GET', '/stats')
+    writer.close()
+
+    report = {'clients': clients, 'duration': wall, 'errors': len(errors), 'actions': {}, 'batching': {}}
+    all_latencies = []
+    for kind, values in sorted(latencies.items()):
+        values = np.array(values) * 1000
+        all_latencies.extend(values)
+        report['actions'][kind] = _summarize(values)
+    for kind in after:
+        requests = after[kind]['requests'] - before[kind]['requests']
+        batches = after[kind]['batches'] - before[kind]['batches']
+        report['batching'][kind] = {'requests': requests, 'batches': batches,
+                                    'requests_per_batch': requests / batches if batches else 0.0}
+    report['total'] = _summarize(np.array(all_latencies))
+    report['throughput'] = len(all_latencies) / wall
+    return report
+
+def run_load_test(host='127.0.0.1', port=8600, clients=50, duration=10.0, simulate_fraction=0.05,
+                  num_hands=20000, seed=0):
+    """用 clients 个并发连接持续发送请求（收到响应后立即发下一个），返回延迟分位数、吞吐量和合并情况"""
+    return asyncio.run(_load_test(host, port, clients, duration, simulate_fraction, num_hands, seed))
+
+def print_report(report):
+    print(f"\n===== 服务负载测试结果 ({report['clients']} 个并发连接, {report['duration']:.1f} 秒) =====\n")
+    print(f"{'请求':<10}{'次数':>8}{'p50 (ms)':>12}{'p90 (ms)':>12}{'p99 (ms)':>12}{'max (ms)':>12}{'每批请求':>10}")
+    for kind, stats in list(report['actions'].items()) + [('total', report['total'])]:
+        if stats['count'] == 0:
+            continue
+        batching = report['batching'].get(kind)
+        per_batch = f"{batching['requests_per_batch']:>10.1f}" if batching else ''
+        print(f"{kind:<10}{stats['count']:>8}{stats['p50_ms']:>12.1f}{stats['p90_ms']:>12.1f}"
+              f"{stats['p99_ms']:>12.1f}{stats['max_ms']:>12.1f}{per_batch}")
+    print(f"\n吞吐量: {report['throughput']:.1f} 请求/秒，错误 {report['errors']} 个")
+
+def main():
+    parser = argparse.ArgumentParser(description="二十一点决策建议和模拟的本地 JSON/HTTP 服务")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_server_args(p):
+        p.add_argument("--host", default='127.0.0.1', help="监听地址")
+        p.add_argument("--port", type=int, default=8600, help="监听端口")
+
+    def add_load_args(p):
+        p.add_argument("--clients", type=int, default=50, help="并发连接数")
+        p.add_argument("--duration", type=float, default=10.0, help="测试时长（秒）")
+        p.add_argument("--simulate-fraction", type=float, default=0.05, help="模拟请求所占比例，其余为决策建议")
+        p.add_argument("--num-hands", type=int, default=20000, help="每个模拟请求的局数")
+        p.add_argument("--seed", type=int, default=0, help="随机种子")
+        p.add_argument("--json", help="将报告写入该 JSON 文件")
+        p.add_argument("--max-p99-ms", type=float, help="总体 p99 延迟超过该值时以非零状态退出")
+
+    serve = subparsers.add_parser('serve', help="启动服务")
+    add_server_args(serve)
+    serve.add_argument("--workers", type=int, help="模拟工作进程数，默认为 CPU 核数")
+    serve.add_argument("--batch-window", type=float, default=DEFAULT_BATCH_WINDOW, help="请求合并窗口（秒）")
+
+    load = subparsers.add_parser('loadtest', help="对运行中的服务做负载测试")
+    add_server_args(load)
+    add_load_args(load)
+
+    local = subparsers.add_parser('local', help="在本机启动服务并做负载测试")
+    add_server_args(local)
+    add_load_args(local)
+    local.add_argument("--workers", type=int, help="模拟工作进程数，默认为 CPU 核数")
+    local.add_argument("--batch-window", type=float, default=DEFAULT_BATCH_WINDOW, help="请求合并窗口（秒）")
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        run_service(args.host, args.port, args.workers, args.batch_window)
+        return
+
+    server = None
+    if args.command == 'local':
+        ready = multiprocessing.Event()
+        # 服务进程需要创建工作进程，不能是守护进程，结束时显式终止
+        server = multiprocessing.Process(target=run_service,
+                                         args=(args.host, args.port, args.workers, args.batch_window, ready))
+        server.start()
+        deadline = time.perf_counter() + 60
+        while not ready.wait(0.1):
+            if not server.is_alive() or time.perf_counter() > deadline:
+                server.terminate()
+                sys.exit("服务未能启动")
+    try:
+        report = run_load_test(args.host, args.port, args.clients, args.duration, args.simulate_fraction,
+                               args.num_hands, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.max_p99_ms is not None and report['total'].get('p99_ms', 0) > args.max_p99_ms:
+        print(f"\n总体 p99 延迟超过 {args.max_p99_ms:.0f} ms，容量回归！")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
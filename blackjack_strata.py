@@ -0,0 +1,187 @@
+import argparse
+from functools import lru_cache
+
+import numpy as np
+
+from blackjack_engine import Rules, OUTCOMES
+from blackjack_fast import RANKS, RANK_COUNTS, RANK_PROBS, add_card, play_hands, threshold_policy
+
+# 初始发牌的分层
+@lru_cache(maxsize=None)
+def _strata(decks):
+    """按 (玩家起手点数, 是否软牌, 庄家明牌) 对初始发牌分层，给出各层的精确概率
+
+    每层内具体的 (玩家第一张, 玩家第二张, 庄家明牌) 组合按条件概率抽取，
+    庄家暗牌与其余牌一样在剩余的牌中发出，因此分层抽样与整体抽样的分布一致。
+
+    返回:
+    strata: 字典
+        keys: 形状为 (层数, 3) 的数组，每行为 (起手点数, 是否软牌, 庄家明牌编码)
+        weights: 各层的精确概率
+        triples: 形状为 (1000, 3) 的全部有序起手组合，按所属层排序
+        stratum: 各组合所属的层号
+        cumulative: 层号加上层内累积条件概率，用于按层抽取组合
+    """
+    first, second, up = (grid.ravel() for grid in np.meshgrid(np.arange(10), np.arange(10), np.arange(10), indexing='ij'))
+    if decks is None:
+        probs = RANK_PROBS[first] * RANK_PROBS[second] * RANK_PROBS[up]
+    else:
+        counts = RANK_COUNTS * decks
+        n = counts.sum()
+        probs = (counts[first] / n
+                 * (counts[second] - (second == first)) / (n - 1)
+                 * (counts[up] - (up == first) - (up == second)) / (n - 2))
+
+    # 起手点数与批量引擎的计法一致（A+x 为软 x+11，两张A为软12，A+10 为天然二十一点单独成层）
+    total, soft = add_card(*add_card(np.zeros_like(first), np.zeros_like(first), first), second)
+    soft = soft > 0
+    keys, stratum = np.unique(np.stack([total, soft, up], axis=1), axis=0, return_inverse=True)
+    stratum = stratum.ravel()
+    weights = np.bincount(stratum, weights=probs, minlength=len(keys))
+
+    order = np.argsort(stratum, kind='stable')
+    stratum = stratum[order]
+    conditional = probs[order] / weights[stratum]
+    cumulative = np.cumsum(conditional)
+    starts = np.searchsorted(stratum, np.arange(len(keys)))
+    cumulative -= np.repeat(cumulative[starts] - conditional[starts], np.bincount(stratum))
+    cumulative += stratum
+    ends = np.append(starts[1:], len(stratum)) - 1
+    cumulative[ends] = np.arange(1, len(keys) + 1)  # 消除舍入误差，保证层内抽样不越界
+
+    strata = {
+        'keys': keys,
+        'weights': weights,
+        'triples': np.stack([first, second, up], axis=1)[order],
+        'stratum': stratum,
+        'cumulative': cumulative,
+    }
+    for table in strata.values():
+        table.setflags(write=False)
+    return strata
+
+def _allocate(total, shares, min_hands=0):
+    """按比例把 total 局分配到各层（最大余数法），每层至少 min_hands 局"""
+    shares = shares / shares.sum()
+    exact = total * shares
+    hands = np.floor(exact).astype(np.int64)
+    remainder = int(total - hands.sum())
+    if remainder > 0:
+        hands[np.argsort(hands - exact, kind='stable')[:remainder]] += 1
+    return np.maximum(hands, min_hands)
+
+def _sample(strata, hands, policy, rules, rng):
+    """按各层的局数抽取起手组合并用批量引擎模拟，返回各层的结算结果计数、赔付和及平方和"""
+    num_strata = len(strata['weights'])
+    labels = np.repeat(np.arange(num_strata), hands)
+    picks = np.searchsorted(strata['cumulative'], labels + rng.random(len(labels)), side='right')
+    outcome = play_hands(len(labels), policy, rng=rng, rules=rules, initial=strata['triples'][picks])
+    counts = np.bincount(labels * len(OUTCOMES) + outcome['outcome'],
+                         minlength=num_strata * len(OUTCOMES)).reshape(num_strata, -1)
+    payout_sum = np.bincount(labels, weights=outcome['payout'], minlength=num_strata)
+    payout_sq = np.bincount(labels, weights=outcome['payout'] ** 2, minlength=num_strata)
+    return counts, payout_sum, payout_sq
+
+# 分层抽样
+def stratified_simulation(num_hands=100000, policy=None, allocation='proportional', decks=1, rng=None, rules=None,
+                          pilot_fraction=0.1, min_hands=2):
+    """按初始发牌分层的蒙特卡洛模拟
+
+    初始发牌 (玩家起手点数, 是否软牌, 庄家明牌) 的各层概率可以精确计算，层间的差异不再贡献抽样方差。
+    proportional 按层概率分配局数；neyman 先用 pilot_fraction 的局数按比例试算各层赔付的标准差，
+    再把其余局数按 层概率 × 标准差 分配（Neyman 分配），把样本集中到结果最不确定的层。
+
+    参数:
+    num_hands: 总局数
+    policy: 玩家策略表，见 blackjack_fast.threshold_policy，默认为阈值16
+    allocation: 'proportional' 或 'neyman'
+    decks: 每局使用的牌副数，None 表示无限副牌
+    rng: numpy 随机数生成器
+    rules: blackjack_engine.Rules，给定时其牌副数覆盖 decks
+    pilot_fraction: neyman 分配时试算所用的局数比例
+    min_hands: 每层至少模拟的局数（用于估计层内方差）
+
+    返回:
+    result: 字典
+        win_rate / loss_rate / draw_rate: 胜（含天然二十一点）、负、平局率
+        expected_return: 每注期望收益
+        std_error: 每注期望收益的标准误差
+        variance_reduction: 相同局数下普通蒙特卡洛的方差与本估计方差之比
+        strata: 每层一行的 DataFrame，索引为 (start_total, soft, up)，
+                含层概率、局数、各结算结果比例、平均每注输赢及其标准误差
+    """
+    import pandas as pd
+
+    if allocation not in ('proportional', 'neyman'):
+        raise ValueError(f"未知的分配方式: {allocation}")
+    rules = Rules(decks=decks) if rules is None else rules
+    policy = threshold_policy() if policy is None else policy
+    rng = np.random.default_rng() if rng is None else rng
+    strata = _strata(rules.decks)
+    weights = strata['weights']
+
+    if allocation == 'proportional':
+        hands = _allocate(num_hands, weights, min_hands)
+        counts, payout_sum, payout_sq = _sample(strata, hands, policy, rules, rng)
+    else:
+        hands = _allocate(int(num_hands * pilot_fraction), weights, min_hands)
+        counts, payout_sum, payout_sq = _sample(strata, hands, policy, rules, rng)
+        remaining = num_hands - hands.sum()
+        if remaining > 0:
+            mean = payout_sum / hands
+            std = np.sqrt(np.maximum(payout_sq - hands * mean ** 2, 0) / (hands - 1))
+            shares = weights * std if (weights * std).sum() > 0 else weights
+            extra = _allocate(remaining, shares)
+            more = _sample(strata, extra, policy, rules, rng)
+            hands = hands + extra
+            counts, payout_sum, payout_sq = counts + more[0], payout_sum + more[1], payout_sq + more[2]
+
+    # 各层估计按精确的层概率加权合并
+    rates = counts / hands[:, None]
+    mean = payout_sum / hands
+    var = np.maximum(payout_sq - hands * mean ** 2, 0) / (hands - 1)
+    expected_return = float(weights @ mean)
+    variance = float(np.sum(weights ** 2 * var / hands))
+    plain_variance = float(weights @ (var + (mean - expected_return) ** 2)) / hands.sum()
+    outcome_rates = dict(zip(OUTCOMES, weights @ rates))
+
+    keys = strata['keys']
+    table = pd.DataFrame(rates, columns=[f'{o}_rate' for o in OUTCOMES])
+    table.insert(0, 'hands', hands)
+    table.insert(0, 'weight', weights)
+    table['mean_payout'] = mean
+    table['std_error'] = np.sqrt(var / hands)
+    table.index = pd.MultiIndex.from_arrays([keys[:, 0], keys[:, 1].astype(bool), keys[:, 2]],
+                                            names=['start_total', 'soft', 'up'])
+
+    return {
+        'win_rate': float(outcome_rates['blackjack'] + outcome_rates['win']),
+        'loss_rate': float(outcome_rates['loss'] + outcome_rates['surrender']),
+        'draw_rate': float(outcome_rates['push']),
+        'expected_return': expected_return,
+        'std_error': variance ** 0.5,
+        'variance_reduction': float(plain_variance / variance) if variance > 0 else float('inf'),
+        'strata': table,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="按初始发牌分层模拟二十一点阈值策略")
+    parser.add_argument("--threshold", type=int, default=16, help="玩家策略的阈值参数")
+    parser.add_argument("--num-hands", type=int, default=1000000, help="总局数")
+    parser.add_argument("--allocation", choices=['proportional', 'neyman'], default='neyman', help="各层局数的分配方式")
+    parser.add_argument("--decks", type=int, default=1, help="每局使用的牌副数")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    args = parser.parse_args()
+
+    result = stratified_simulation(args.num_hands, threshold_policy(args.threshold), args.allocation,
+                                   decks=args.decks, rng=np.random.default_rng(args.seed))
+    print(f"每注期望收益: {result['expected_return']:.5f} ± {result['std_error']:.5f}"
+          f"（方差是普通蒙特卡洛的 1/{result['variance_reduction']:.2f}）")
+    print(f"胜率 {result['win_rate']:.4f}，败率 {result['loss_rate']:.4f}，平局率 {result['draw_rate']:.4f}\n")
+    table = result['strata']['mean_payout'].unstack('up')
+    table.columns = [RANKS[up] for up in table.columns]
+    print("各起手点数对庄家明牌的平均每注输赢:")
+    print(table.to_string(float_format=lambda x: f"{x:+.3f}"))
+
+if __name__ == "__main__":
+    main()
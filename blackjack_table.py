@@ -0,0 +1,206 @@
+import argparse
+import multiprocessing
+import time
+
+import numpy as np
+
+import blackjack_odds
+from blackjack_engine import Rules, OUTCOMES
+from blackjack_fast import RANK_COUNTS, add_card, compile_rules, draw, new_shoe, threshold_policy
+
+# 一轮中每个座位（和庄家）预留的牌数，牌靴剩余不足时提前洗牌
+CARDS_PER_HAND = 6
+
+def _deal(rng, shoe, rows, full):
+    """从 rows 指定各桌的共用牌靴各发一张牌；牌靴在一轮中途发完时（极少见）换一副新牌靴"""
+    empty = rows[shoe[rows].sum(axis=1) == 0]
+    if len(empty):
+        shoe[empty] = full
+    return draw(rng, shoe, rows)
+
+# 多座位牌桌
+def play_tables(num_tables, num_rounds, policies, decks=6, penetration=0.75, rng=None, rules=None):
+    """向量化地同时模拟多张牌桌，每张桌上若干座位共用一个牌靴，每轮对同一个庄家结算
+
+    发牌顺序与赌场一致：各座位依次一张、庄家明牌、各座位第二张、庄家暗牌；
+    庄家天然二十一点时直接结算，否则各座位按顺序用自己的策略从同一牌靴要牌，
+    至少有一个座位未爆牌且不是天然二十一点时庄家才要牌。
+    牌靴发到 penetration 比例（或剩余牌不足一轮所需）时在下一轮开始前重新洗牌。
+
+    参数:
+    num_tables: 同时模拟的牌桌数
+    num_rounds: 每张牌桌进行的轮数
+    policies: 各座位的玩家策略表列表，见 blackjack_fast.threshold_policy
+    decks: 牌靴的牌副数
+    penetration: 洗牌前发出的牌占牌靴的比例
+    rng: numpy 随机数生成器
+    rules: blackjack_engine.Rules，给定时其牌副数覆盖 decks
+
+    返回:
+    result: 字典
+        hands: 每个座位的手数
+        outcome_counts: 形状为 (座位数, len(OUTCOMES)) 的结算结果计数
+        payout_sum / payout_sq: 每个座位每注输赢的和及平方和
+        shuffles: 洗牌次数（含开局）
+    """
+    rules = Rules(decks=decks) if rules is None else rules
+    if rules.decks is None:
+        raise ValueError("多座位牌桌需要有限副牌的共用牌靴")
+    tables = compile_rules(rules)
+    rng = np.random.default_rng() if rng is None else rng
+    stacked = np.stack(policies)
+    num_seats = len(policies)
+    full = RANK_COUNTS * rules.decks
+    cut = max(int(full.sum() * (1 - penetration)), CARDS_PER_HAND * (num_seats + 1))
+    dealer_hit = tables['dealer_hit']
+
+    shoe = new_shoe(num_tables, rules.decks)
+    shuffles = num_tables
+    all_tables = np.arange(num_tables)
+    seats = np.arange(num_seats)
+    zeros = np.zeros((num_tables, num_seats), dtype=np.int64)
+    outcome_counts = np.zeros(num_seats * len(OUTCOMES), dtype=np.int64)
+    payout_sum = np.zeros(num_seats)
+    payout_sq = np.zeros(num_seats)
+
+    for _ in range(num_rounds):
+        # 牌靴剩余不足切牌位置时重新洗牌
+        low = shoe.sum(axis=1) < cut
+        shoe[low] = full
+        shuffles += int(low.sum())
+
+        # 初始发牌
+        player_total, player_soft = zeros.copy(), zeros.copy()
+        for s in seats:
+            player_total[:, s], player_soft[:, s] = add_card(player_total[:, s], player_soft[:, s],
+                                                             _deal(rng, shoe, all_tables, full))
+        up = _deal(rng, shoe, all_tables, full)
+        for s in seats:
+            player_total[:, s], player_soft[:, s] = add_card(player_total[:, s], player_soft[:, s],
+                                                             _deal(rng, shoe, all_tables, full))
+        dealer_total, dealer_soft = add_card(np.zeros(num_tables, dtype=np.int64),
+                                             np.zeros(num_tables, dtype=np.int64), up)
+        dealer_total, dealer_soft = add_card(dealer_total, dealer_soft, _deal(rng, shoe, all_tables, full))
+        dealer_natural = dealer_total == 21
+        player_natural = player_total == 21
+
+        # 各座位依次要牌
+        for s in seats:
+            total, soft = player_total[:, s], player_soft[:, s]
+            active = ~dealer_natural & (total < 21) & stacked[s][(soft > 0).astype(np.intp), total, up]
+            while active.any():
+                rows = np.flatnonzero(active)
+                t, f = add_card(total[rows], soft[rows], _deal(rng, shoe, rows, full))
+                total[rows], soft[rows] = t, f
+                active[rows] = (t < 21) & stacked[s][(f > 0).astype(np.intp), np.minimum(t, 21), up[rows]]
+        player_bust = player_total > 21
+
+        # 庄家回合（所有座位都已爆牌或天然二十一点时不要牌）
+        live = (~player_bust & ~player_natural).any(axis=1)
+        active = live & ~dealer_natural & dealer_hit[(dealer_soft > 0).astype(np.intp), dealer_total]
+        while active.any():
+            rows = np.flatnonzero(active)
+            t, f = add_card(dealer_total[rows], dealer_soft[rows], _deal(rng, shoe, rows, full))
+            dealer_total[rows], dealer_soft[rows] = t, f
+            active[rows] = dealer_hit[(f > 0).astype(np.intp), t]
+        dealer_bust = (dealer_total > 21)[:, None]
+        dealer_final = dealer_total[:, None]
+
+        # 判定胜负（与 blackjack_fast.play_hands 相同）
+        outcome = np.where(player_total > dealer_final, OUTCOMES.index('win'),
+                           np.where(player_total < dealer_final, OUTCOMES.index('loss'), OUTCOMES.index('push')))
+        outcome = np.where(dealer_bust & ~player_bust, OUTCOMES.index('win'), outcome)
+        outcome[player_bust] = OUTCOMES.index('loss')
+        outcome[player_natural & ~dealer_natural[:, None]] = OUTCOMES.index('blackjack')
+
+        payout = tables['payouts'][outcome]
+        outcome_counts += np.bincount((seats * len(OUTCOMES) + outcome).ravel(), minlength=len(outcome_counts))
+        payout_sum += payout.sum(axis=0)
+        payout_sq += (payout ** 2).sum(axis=0)
+
+    return {
+        'hands': np.full(num_seats, num_tables * num_rounds),
+        'outcome_counts': outcome_counts.reshape(num_seats, len(OUTCOMES)),
+        'payout_sum': payout_sum,
+        'payout_sq': payout_sq,
+        'shuffles': shuffles,
+    }
+
+def merge_results(results):
+    """合并多批 play_tables 的结果"""
+    return {key: sum(result[key] for result in results) for key in results[0]}
+
+def summarize_seats(result, names=None):
+    """把 play_tables 的结果整理成每个座位一行的 DataFrame：各结算结果比例、平均每注输赢及其标准误差"""
+    import pandas as pd
+
+    hands = result['hands']
+    mean = result['payout_sum'] / hands
+    var = np.maximum(result['payout_sq'] / hands - mean ** 2, 0)
+    summary = pd.DataFrame(result['outcome_counts'] / hands[:, None], columns=[f'{o}_rate' for o in OUTCOMES])
+    summary.insert(0, 'hands', hands)
+    summary['mean_payout'] = mean
+    summary['std_error'] = np.sqrt(var / hands)
+    summary.index = pd.Index(names if names is not None else range(1, len(hands) + 1), name='seat')
+    return summary
+
+# 多进程运行
+def _run_batch(args):
+    """在工作进程中模拟一批牌桌，返回 (结果, 模拟用时秒数)，用时不含进程启动"""
+    num_tables, num_rounds, policies, rules, seed = args
+    start = time.perf_counter()
+    result = play_tables(num_tables, num_rounds, policies, rng=np.random.default_rng(seed), rules=rules)
+    return result, time.perf_counter() - start
+
+def run_tables(num_tables, num_rounds, policies, rules=None, workers=1, seed=None):
+    """把牌桌平均分给 workers 个进程并合并结果
+
+    返回 (结果, 各进程的模拟用时秒数列表)；牌桌数少于 workers 时只启动有牌桌的批次，列表长度即实际使用的进程数
+    """
+    rules = Rules(decks=6) if rules is None else rules
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    sizes = [num_tables // workers + (i < num_tables % workers) for i in range(workers)]
+    batches = [(size, num_rounds, policies, rules, s) for size, s in zip(sizes, seeds) if size > 0]
+    if len(batches) == 1:
+        outputs = [_run_batch(batches[0])]
+    else:
+        with multiprocessing.Pool(len(batches)) as pool:
+            outputs = pool.map(_run_batch, batches)
+    results, seconds = zip(*outputs)
+    return merge_results(results), list(seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟多座位共用牌靴的二十一点牌桌")
+    parser.add_argument("--seats", nargs='+', default=['16'] * 7,
+                        help="各座位的策略：阈值（如 16）或 advisor（决策建议），最多7个座位")
+    parser.add_argument("--tables", type=int, default=10000, help="同时模拟的牌桌数")
+    parser.add_argument("--rounds", type=int, default=100, help="每张牌桌的轮数")
+    parser.add_argument("--decks", type=int, default=6, help="牌靴的牌副数")
+    parser.add_argument("--penetration", type=float, default=0.75, help="洗牌前发出的牌占牌靴的比例")
+    parser.add_argument("--h17", action='store_true', help="庄家软17要牌（默认软17停牌）")
+    parser.add_argument("--workers", type=int, default=1, help="并行进程数")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    args = parser.parse_args()
+    if len(args.seats) > 7:
+        parser.error("一张牌桌最多7个座位")
+
+    rules = Rules(decks=args.decks, dealer_hits_soft_17=args.h17)
+    policies = [blackjack_odds.advisor_policy(rules) if seat == 'advisor' else threshold_policy(int(seat))
+                for seat in args.seats]
+    result, seconds = run_tables(args.tables, args.rounds, policies, rules, args.workers, args.seed)
+
+    summary = summarize_seats(result, [f"{i + 1}:{seat}" for i, seat in enumerate(args.seats)])
+    # 单人对庄家（每局新牌）的精确期望，对比共用牌靴的影响
+    summary['heads_up'] = [np.dot(*blackjack_odds.threshold_payouts(int(seat), rules=rules)) if seat != 'advisor'
+                           else np.nan for seat in args.seats]
+    print(summary.to_string(float_format=lambda x: f"{x:.4f}"))
+
+    total_hands = int(result['hands'].sum())
+    print(f"\n{args.tables} 张牌桌 × {args.rounds} 轮，共 {total_hands} 手，洗牌 {result['shuffles']} 次")
+    # 用时只计工作进程内的模拟时间；每核速度按实际运行的进程数（各进程用时之和）计算
+    elapsed = max(seconds)
+    print(f"用时 {elapsed:.2f} 秒（{len(seconds)} 个进程），{total_hands / elapsed:,.0f} 手/秒，"
+          f"每核 {total_hands / sum(seconds):,.0f} 手/秒")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import math
+
+import numpy as np
+
+import blackjack_odds
+
+# 指数倾斜
+def tilted_distribution(payouts, probs, theta):
+    """把每注输赢的分布按 exp(theta * 输赢) 加权后归一化，theta < 0 时偏向输钱"""
+    weights = probs * np.exp(theta * payouts)
+    return weights / weights.sum()
+
+def solve_tilt(payouts, probs, target_mean, low=-20.0, high=20.0, iterations=100):
+    """二分求倾斜参数 theta，使倾斜后每注输赢的均值等于 target_mean（均值随 theta 单调递增）"""
+    for _ in range(iterations):
+        theta = (low + high) / 2
+        if np.dot(tilted_distribution(payouts, probs, theta), payouts) < target_mean:
+            low = theta
+        else:
+            high = theta
+    return (low + high) / 2
+
+# 重要性抽样估计尾部风险
+def loss_probability(loss_fraction=0.9, num_games=10000, initial_capital=100, bet_amount=1, player_threshold=16,
+                     num_paths=10000, tilt='auto', decks=1, rules=None, seed=None):
+    """用重要性抽样估计固定下注时在 num_games 局内亏掉 loss_fraction 比例资本的概率
+
+    每局的输赢按 blackjack_odds.threshold_payouts 的精确分布经指数倾斜后抽样，使稀有的大额亏损频繁出现；
+    每条路径在首次达到亏损线时停止，按似然比 prod p(x)/q(x) = M(theta)^n * exp(-theta * S_n) 加权，
+    加权平均是原概率的无偏估计。tilt='auto' 时倾斜到每局平均亏损恰好在 num_games 局内达到亏损线，
+    原分布已足以到达亏损线时不倾斜（普通蒙特卡洛）。
+
+    参数:
+    loss_fraction: 亏损线占初始资本的比例（1 表示输光）
+    num_games: 局数上限
+    initial_capital: 初始资本
+    bet_amount: 每局下注金额
+    player_threshold: 玩家策略的阈值参数
+    num_paths: 抽样路径数
+    tilt: 倾斜参数 theta，'auto' 为自动选择，0 为普通蒙特卡洛
+    decks: 每局使用的牌副数，None 表示无限副牌
+    rules: blackjack_engine.Rules，给定时其牌副数覆盖 decks
+    seed: 随机种子
+
+    返回:
+    result: 字典
+        probability: 概率估计
+        std_error: 估计的标准误差
+        relative_error: 相对误差（标准误差 / 估计值）
+        tilt: 使用的倾斜参数
+        hit_fraction: 抽样路径中达到亏损线的比例
+        variance_reduction: 相同路径数下普通蒙特卡洛的方差与本估计方差之比
+    """
+    payouts, probs = blackjack_odds.threshold_payouts(player_threshold, decks, rules)
+    keep = probs > 0
+    payouts, probs = payouts[keep], probs[keep]
+    loss_line = loss_fraction * initial_capital / bet_amount  # 以注为单位的亏损线
+
+    if tilt == 'auto':
+        target_mean = -loss_line / num_games
+        tilt = solve_tilt(payouts, probs, target_mean) if target_mean < np.dot(probs, payouts) else 0.0
+    q = tilted_distribution(payouts, probs, tilt)
+    log_ratio = np.log(probs) - np.log(q)
+    cumulative = np.cumsum(q)[:-1]
+
+    rng = np.random.default_rng(seed)
+    total = np.zeros(num_paths)
+    log_weight = np.zeros(num_paths)
+    alive = np.ones(num_paths, dtype=bool)
+    hit = np.zeros(num_paths, dtype=bool)
+    for _ in range(num_games):
+        rows = np.flatnonzero(alive)
+        if len(rows) == 0:
+            break
+        outcome = np.searchsorted(cumulative, rng.random(len(rows)), side='right')
+        total[rows] += payouts[outcome]
+        log_weight[rows] += log_ratio[outcome]
+        reached = rows[total[rows] <= -loss_line + 1e-9]
+        hit[reached] = True
+        alive[reached] = False
+
+    weights = np.where(hit, np.exp(log_weight), 0.0)
+    probability = float(weights.mean())
+    std_error = float(weights.std(ddof=1) / math.sqrt(num_paths))
+    variance = weights.var(ddof=1)
+    return {
+        'probability': probability,
+        'std_error': std_error,
+        'relative_error': std_error / probability if probability > 0 else math.inf,
+        'tilt': float(tilt),
+        'hit_fraction': float(hit.mean()),
+        'variance_reduction': float(probability * (1 - probability) / variance) if variance > 0 else math.inf,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="用重要性抽样估计二十一点资本的尾部风险")
+    parser.add_argument("--loss-fraction", type=float, default=0.9, help="亏损线占初始资本的比例")
+    parser.add_argument("--num-games", type=int, default=10000, help="局数上限")
+    parser.add_argument("--initial-capital", type=float, default=100, help="初始资本")
+    parser.add_argument("--bet-amount", type=float, default=1, help="每局下注金额")
+    parser.add_argument("--threshold", type=int, default=16, help="玩家策略的阈值参数")
+    parser.add_argument("--num-paths", type=int, default=10000, help="抽样路径数")
+    parser.add_argument("--tilt", default='auto', help="倾斜参数，'auto' 为自动选择，0 为普通蒙特卡洛")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    args = parser.parse_args()
+
+    result = loss_probability(
+        loss_fraction=args.loss_fraction,
+        num_games=args.num_games,
+        initial_capital=args.initial_capital,
+        bet_amount=args.bet_amount,
+        player_threshold=args.threshold,
+        num_paths=args.num_paths,
+        tilt=args.tilt if args.tilt == 'auto' else float(args.tilt),
+        seed=args.seed,
+    )
+    print(f"{args.num_games} 局内亏损 {args.loss_fraction:.0%} 资本的概率: "
+          f"{result['probability']:.4g} ± {result['std_error']:.2g} (相对误差 {result['relative_error']:.1%})")
+    print(f"倾斜参数 {result['tilt']:.4f}，{result['hit_fraction']:.1%} 的路径达到亏损线，"
+          f"方差是普通蒙特卡洛的 1/{result['variance_reduction']:.3g}")
+
+if __name__ == "__main__":
+    main()
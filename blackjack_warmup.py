@@ -0,0 +1,276 @@
+import argparse
+import base64
+import compileall
+import hmac
+import json
+import os
+import socket
+import struct
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+from blackjack_fast import RANKS, RANK_PROBS, RANK_VALUES
+
+# 就绪文件：预热完成后写入，启动器和容器健康检查据此判断应用是否可以接收用户
+READY_FILE = os.environ.get('BLACKJACK_READY_FILE', os.path.join(tempfile.gettempdir(), 'blackjack.ready'))
+
+# 预热会话在服务器进程中填充决策分析缓存的默认时间预算（秒）及上限
+DEFAULT_PRIME_SECONDS = 10.0
+MAX_PRIME_SECONDS = 60.0
+
+# 预热令牌的环境变量：启动器随机生成后传给 Streamlit 服务器进程，预热会话以 ?token= 带上；
+# 没有设置或不匹配时忽略 ?warmup=，任意访问者不能让服务器进程空转预热
+WARMUP_TOKEN_ENV = 'BLACKJACK_WARMUP_TOKEN'
+
+def warmup_budget(query_params, environ=os.environ):
+    """预热会话的时间预算：?token= 与环境变量 WARMUP_TOKEN_ENV 一致时返回 ?warmup= 的解析结果，否则返回 None"""
+    expected = environ.get(WARMUP_TOKEN_ENV)
+    token = query_params.get('token')
+    if not expected or not isinstance(token, str) or not hmac.compare_digest(token.encode(), expected.encode()):
+        return None
+    return parse_prime_seconds(query_params.get('warmup'))
+
+def parse_prime_seconds(value):
+    """解析 ?warmup= 的时间预算，限制在 [0, MAX_PRIME_SECONDS] 内；不是有限数字时返回 None
+
+    查询参数来自任意访问者，无效的值直接忽略，不应让页面报错。
+    """
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    if seconds != seconds or seconds in (float('inf'), float('-inf')):
+        return None
+    return min(max(seconds, 0.0), MAX_PRIME_SECONDS)
+
+# 常见局面
+def common_positions():
+    """按起手两张牌出现的概率从高到低排列的 (玩家点数, 庄家明牌) 局面，用于按优先级预热缓存
+
+    概率按无限副牌近似，只用于排序；天然二十一点在发牌时已结算，不需要决策分析。
+    """
+    probs = {}
+    for first in range(10):
+        for second in range(10):
+            total = RANK_VALUES[first] + RANK_VALUES[second]
+            total = 12 if total > 21 else total  # 两张A
+            if total == 21:
+                continue
+            for up in range(10):
+                key = (int(total), RANKS[up])
+                probs[key] = probs.get(key, 0.0) + RANK_PROBS[first] * RANK_PROBS[second] * RANK_PROBS[up]
+    return sorted(probs, key=probs.get, reverse=True)
+
+# 本进程预热（结果保存在磁盘上，服务器进程直接受益）
+def warm_up_local():
+    """构建 matplotlib 字体缓存并预编译本目录的字节码，返回各步耗时（秒）"""
+    timings = {}
+    start = time.perf_counter()
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib import font_manager
+    timings['imports'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    font_manager.fontManager.findfont(font_manager.FontProperties(family=['sans-serif']))  # 缓存不存在时扫描系统字体并写入
+    fig, ax = plt.subplots(figsize=(2, 1))
+    ax.set_title('warm up')
+    fig.canvas.draw()
+    plt.close(fig)
+    timings['font_cache'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compileall.compile_dir(os.path.dirname(os.path.abspath(__file__)), maxlevels=0, quiet=1)
+    timings['bytecode'] = time.perf_counter() - start
+    return timings
+
+# 等待服务器
+def health_url(port=8501, host='localhost'):
+    return f"http://{host}:{port}/_stcore/health"
+
+def server_healthy(port=8501, host='localhost', timeout=2.0):
+    """Streamlit 的存活检查端点是否返回 ok"""
+    try:
+        with urllib.request.urlopen(health_url(port, host), timeout=timeout) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+def wait_for_server(port=8501, host='localhost', timeout=120.0, interval=0.1, process=None):
+    """轮询存活检查端点直到服务器开始监听，返回等待的秒数
+
+    process 为服务器的 Popen 对象时，服务器进程提前退出则抛出 RuntimeError。
+    """
+    start = time.perf_counter()
+    while not server_healthy(port, host):
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Streamlit 进程已退出（返回码 {process.returncode}）")
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError(f"{timeout:.0f} 秒内服务器未启动")
+        time.sleep(interval)
+    return time.perf_counter() - start
+
+# 预热服务器进程
+def prime_server(port=8501, host='localhost', prime_seconds=DEFAULT_PRIME_SECONDS, timeout=300.0, token=None):
+    """以 ?warmup=秒数&token=令牌 打开一个会话并等待脚本运行结束，返回用时（秒）
+
+    token 须与服务器进程的环境变量 WARMUP_TOKEN_ENV 一致，否则服务器把它当作普通访问（见 warmup_budget）。
+
+    服务器进程在这次运行中完成应用的首次导入和查找表构建，并在时间预算内预先填充决策分析缓存
+    （见 blackjack_interactive.prime_caches）。会话通过 Streamlit 的 websocket 协议直接驱动，不需要浏览器。
+    """
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    start = time.perf_counter()
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        _websocket_handshake(sock, host, port, '/_stcore/stream')
+        message = BackMsg()
+        message.rerun_script.query_string = urllib.parse.urlencode(
+            {'warmup': f"{prime_seconds:g}", 'token': token or ''})
+        _send_frame(sock, message.SerializeToString())
+        while True:
+            payload = _read_message(sock)
+            if payload is None:
+                raise ConnectionError("预热会话被服务器关闭")
+            forward = ForwardMsg()
+            forward.ParseFromString(payload)
+            if forward.WhichOneof('type') == 'script_finished':
+                break
+    return time.perf_counter() - start
+
+def _websocket_handshake(sock, host, port, path):
+    key = base64.b64encode(os.urandom(16)).decode()
+    sock.sendall((f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+    response = b''
+    while b'\r\n\r\n' not in response:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ConnectionError("websocket 握手失败")
+        response += chunk
+    status = response.split(b'\r\n', 1)[0]
+    if b' 101 ' not in status:
+        raise ConnectionError(f"websocket 握手失败: {status.decode(errors='replace')}")
+
+def _send_frame(sock, payload):
+    """发送一个带掩码的二进制帧（客户端发出的帧必须加掩码）"""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x82, 0x80 | length)
+    elif length < 2 ** 16:
+        header = struct.pack('!BBH', 0x82, 0x80 | 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x82, 0x80 | 127, length)
+    mask = os.urandom(4)
+    sock.sendall(header + mask + bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload)))
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("websocket 连接中断")
+        data += chunk
+    return data
+
+def _read_message(sock):
+    """读取一条完整的数据消息（合并分片），收到关闭帧时返回 None"""
+    message = b''
+    while True:
+        first, second = _recv_exact(sock, 2)
+        length = second & 0x7f
+        if length == 126:
+            length = struct.unpack('!H', _recv_exact(sock, 2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', _recv_exact(sock, 8))[0]
+        payload = _recv_exact(sock, length)
+        opcode = first & 0x0f
+        if opcode == 0x8:
+            return None
+        if opcode in (0x0, 0x1, 0x2):
+            message += payload
+            if first & 0x80:
+                return message
+        # 忽略 ping/pong 等控制帧
+
+# 就绪文件
+def clear_ready(path=READY_FILE):
+    if os.path.exists(path):
+        os.remove(path)
+
+def write_ready(report, path=READY_FILE):
+    """原子地写入就绪文件，内容为预热耗时报告"""
+    temp = f"{path}.tmp"
+    with open(temp, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(temp, path)
+
+def is_ready(port=8501, host='localhost', path=READY_FILE):
+    """就绪检查：预热已完成且服务器仍在响应"""
+    return os.path.exists(path) and server_healthy(port, host)
+
+def wait_until_ready(port=8501, host='localhost', path=READY_FILE, timeout=300.0, interval=0.2):
+    """轮询直到就绪，超时返回 False"""
+    deadline = time.perf_counter() + timeout
+    while not is_ready(port, host, path):
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+# 完整的预热流程
+def warm_start(port=8501, host='localhost', path=READY_FILE, prime_seconds=DEFAULT_PRIME_SECONDS,
+               process=None, started=None, timings=None, log=print, token=None):
+    """等待服务器启动，预热服务器进程，然后写入就绪文件并记录冷启动耗时
+
+    参数:
+    port / host: Streamlit 服务器地址
+    path: 就绪文件路径
+    prime_seconds: 服务器进程填充决策分析缓存的时间预算（秒）
+    process: 服务器的 Popen 对象，用于检测服务器提前退出
+    started: 冷启动的起始时刻（time.perf_counter），默认为调用时刻
+    timings: 之前各阶段的耗时（如 warm_up_local 的结果），一并写入报告
+    log: 日志输出函数
+    token: 预热令牌，须与服务器进程的环境变量 WARMUP_TOKEN_ENV 一致
+
+    返回:
+    report: 各阶段耗时（秒）
+    """
+    started = time.perf_counter() if started is None else started
+    report = dict(timings or {})
+    report['server_start'] = wait_for_server(port, host, process=process)
+    log(f"服务器已启动（{report['server_start']:.2f} 秒），正在预热...")
+    report['prime'] = prime_server(port, host, prime_seconds, token=token)
+    report['cold_start'] = time.perf_counter() - started
+    report['ready_at'] = time.time()
+    write_ready(report, path)
+    log(f"应用已就绪：冷启动用时 {report['cold_start']:.2f} 秒"
+        f"（服务器启动 {report['server_start']:.2f} 秒，预热 {report['prime']:.2f} 秒）")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="二十一点交互式应用的预热与就绪检查")
+    parser.add_argument("--port", type=int, default=8501, help="Streamlit 服务器端口")
+    parser.add_argument("--host", default='localhost', help="Streamlit 服务器地址")
+    parser.add_argument("--ready-file", default=READY_FILE, help="就绪文件路径")
+    parser.add_argument("--prime-seconds", type=float, default=DEFAULT_PRIME_SECONDS,
+                        help="服务器进程填充决策分析缓存的时间预算（秒）")
+    parser.add_argument("--token", default=os.environ.get(WARMUP_TOKEN_ENV),
+                        help=f"预热令牌，须与服务器进程的环境变量 {WARMUP_TOKEN_ENV} 一致（默认读取同名环境变量）")
+    parser.add_argument("--check", action='store_true', help="只做就绪检查：已就绪时返回 0，否则返回 1（用于容器健康检查）")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if is_ready(args.port, args.host, args.ready_file) else 1)
+    clear_ready(args.ready_file)
+    if not args.token:
+        parser.error(f"预热需要服务器进程的令牌：--token 或环境变量 {WARMUP_TOKEN_ENV}")
+    warm_start(args.port, args.host, args.ready_file, args.prime_seconds, token=args.token)
+
+if __name__ == "__main__":
+    main()
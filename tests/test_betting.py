@@ -0,0 +1,45 @@
+import warnings
+
+import numpy as np
+import pytest
+
+import blackjack_betting
+import blackjack_odds
+
+@pytest.mark.parametrize('initial_capital', [0, 5, 20])
+def test_max_drawdown_is_a_finite_fraction(initial_capital):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        result = blackjack_betting.simulate_capital_paths(blackjack_betting.FlatBet(1), num_paths=500, num_games=100,
+                                                          initial_capital=initial_capital, min_bet=0, seed=1)
+    drawdown = result['max_drawdown']
+    assert np.all((drawdown >= 0) & (drawdown <= 1))
+    # 破产的路径回撤到 0
+    ruined = (result['ruin_time'] >= 0) & (initial_capital > 0)
+    assert np.all(drawdown[ruined] == 1)
+
+def test_all_in_paths_are_ruined_only_at_zero():
+    result = blackjack_betting.simulate_capital_paths(blackjack_betting.FlatBet(2), num_paths=2000, num_games=200,
+                                                      initial_capital=5, min_bet=0, seed=2)
+    alive = result['ruin_time'] < 0
+    assert np.all(result['final_capital'][alive] > 0)
+    assert np.all(result['final_capital'][~alive] == 0)
+
+def test_flat_bet_ruin_matches_exact_markov_chain():
+    num_paths = 4000
+    result = blackjack_betting.simulate_capital_paths(blackjack_betting.FlatBet(1), num_paths=num_paths,
+                                                      num_games=200, initial_capital=20, min_bet=0, seed=3)
+    exact = blackjack_odds.capital_distribution(initial_capital=20, bet_amount=1, num_games=200)
+    p = exact['ruin_probability']
+    assert abs(result['ruin_probability'] - p) < 4 * np.sqrt(p * (1 - p) / num_paths)
+
+def test_martingale_doubles_after_losses():
+    strategy = blackjack_betting.Martingale(base_bet=1)
+    strategy.reset(3, 100)
+    strategy.update(np.array([-1, 1, 0]))
+    strategy.update(np.array([-1, -1, 0]))
+    assert strategy.bets(np.full(3, 100.0)).tolist() == [4, 2, 1]
+
+def test_kelly_fraction_is_zero_for_negative_edge():
+    assert blackjack_betting.KellyBet(win_rate=0.4, loss_rate=0.6).fraction == 0
+    assert blackjack_betting.KellyBet(win_rate=0.6, loss_rate=0.4).fraction == pytest.approx(0.2)
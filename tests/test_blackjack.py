@@ -0,0 +1,68 @@
+import random
+
+import numpy as np
+import pytest
+
+import blackjack
+import blackjack_odds
+from blackjack_engine import Deck, GameEngine, Rules
+
+class StackedDeck:
+    """按给定顺序发牌的牌组"""
+    def __init__(self, cards):
+        self.cards = list(cards)
+
+    def deal(self):
+        return self.cards.pop(0)
+
+    def reset(self):
+        pass
+
+def test_monte_carlo_simulation_keeps_its_three_tuple():
+    random.seed(0)
+    rates = blackjack.monte_carlo_simulation(200, 16)
+    assert len(rates) == 3
+    assert sum(rates) == pytest.approx(1.0)
+    assert len(blackjack.monte_carlo_simulation(200, 16, stratified='proportional')) == 3
+    assert len(blackjack.monte_carlo_simulation(200, 16, with_return=True)) == 4
+
+def test_infinite_deck_never_runs_out():
+    deck = Deck(None)
+    cards = [deck.deal() for _ in range(500)]
+    assert len(deck.cards) == 52
+    assert len(set(cards)) > 40
+
+def test_infinite_deck_games_match_exact_return():
+    random.seed(1)
+    rules = Rules(decks=None)
+    win, loss, draw, expected_return = blackjack.monte_carlo_simulation(20000, 16, rules=rules, with_return=True)
+    payouts, probs = blackjack_odds.threshold_payouts(16, rules=rules)
+    std_error = np.sqrt(np.dot(probs, payouts ** 2) / 20000)
+    assert abs(expected_return - np.dot(payouts, probs)) < 4 * std_error
+
+def test_dealer_natural_is_settled_before_the_player_acts():
+    game = GameEngine(StackedDeck(['10♠', '9♥', 'K♦', 'A♣']), Rules())
+    game.deal()
+    assert game.state == GameEngine.SETTLED
+    assert game.outcome == 'loss'
+
+def test_dealer_distribution_excludes_naturals_by_default():
+    rules = Rules(decks=6)
+    for up in range(10):
+        conditional = blackjack_odds.dealer_final_distribution(up, rules=rules)
+        unconditional = blackjack_odds.dealer_final_distribution(up, rules=rules, no_natural=False)
+        if up in (0, 9):
+            assert conditional[4] < unconditional[4]  # 21 点不再包含天然二十一点
+        else:
+            assert conditional == pytest.approx(unconditional)
+    # 6 副牌 S17，玩家 17 点停牌对庄家明牌 A：庄家不爆牌的 17 点才是平局
+    assert blackjack_odds.win_probability(17, 0, rules=rules) == pytest.approx(0.2611, abs=1e-4)
+
+def test_advisor_policy_follows_dealer_rules():
+    s17 = blackjack_odds.advisor_policy(Rules(decks=6))
+    h17 = blackjack_odds.advisor_policy(Rules(decks=6, dealer_hits_soft_17=True))
+    six_five = blackjack_odds.advisor_policy(Rules(decks=6, blackjack_payout=1.2))
+    assert not np.array_equal(s17, h17)
+    assert np.array_equal(s17, six_five)
+    s17[:] = True  # 返回的是副本，不影响缓存
+    assert not blackjack_odds.advisor_policy(Rules(decks=6)).all()
@@ -0,0 +1,18 @@
+import time
+
+import blackjack_cluster
+
+def test_distributed_capital_shards_match_single_process():
+    check = blackjack_cluster.check_capital_shards(seed=3, num_shards=6, shard_size=300, num_games=100,
+                                                   lease_timeout=1.0)
+    assert check['identical']
+    assert abs(check['ruin_probability'] - check['exact_ruin_probability']) < 4 * check['std_error']
+
+def test_expired_lease_is_reassigned():
+    queue = blackjack_cluster.ShardQueue([{'id': 0}, {'id': 1}], lease_timeout=0.05)
+    assert queue.get('a')['id'] == 0
+    assert queue.get('a')['id'] == 1
+    assert queue.get('b') == blackjack_cluster.ShardQueue.WAIT
+    time.sleep(0.1)
+    assert queue.get('b')['id'] in (0, 1)
+    assert queue.status()['reassigned'] == 2
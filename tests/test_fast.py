@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import blackjack_fast
+import blackjack_odds
+from blackjack_engine import Rules
+
+def test_card_rank_maps_faces_to_ten():
+    assert [blackjack_fast.card_rank(card) for card in ('A♠', '2♥', '10♦', 'J♣', 'Q♠', 'K♥')] == [0, 1, 9, 9, 9, 9]
+
+def test_add_card_demotes_soft_aces():
+    zeros = np.zeros(3, dtype=np.int64)
+    total, soft = blackjack_fast.add_card(zeros, zeros, np.array([0, 0, 9]))
+    total, soft = blackjack_fast.add_card(total, soft, np.array([0, 9, 9]))
+    assert total.tolist() == [12, 21, 20]
+    assert (soft > 0).tolist() == [True, True, False]
+
+@pytest.mark.parametrize('rules', [Rules(decks=1), Rules(decks=None, dealer_hits_soft_17=True)])
+def test_play_policies_matches_exact_per_policy(rules):
+    thresholds = (12, 15, 17)
+    results = blackjack_fast.play_policies(200000, {t: blackjack_fast.threshold_policy(t) for t in thresholds},
+                                           rng=np.random.default_rng(7), rules=rules)
+    for threshold in thresholds:
+        payout = results[threshold]['payout']
+        exact = np.dot(*blackjack_odds.threshold_payouts(threshold, rules=rules))
+        assert abs(payout.mean() - exact) < 4 * payout.std() / np.sqrt(len(payout))
+
+def test_play_policies_shares_the_card_stream():
+    policy = blackjack_fast.threshold_policy(16)
+    results = blackjack_fast.play_policies(5000, {'a': policy, 'b': policy.copy(), 'c': blackjack_fast.threshold_policy(13)},
+                                           rng=np.random.default_rng(8))
+    for field in ('outcome', 'payout', 'player_total', 'dealer_total'):
+        assert np.array_equal(results['a'][field], results['b'][field])
+    # 起手两张牌和庄家明牌相同，只在要牌决定不同处分叉
+    assert np.array_equal(results['a']['up'], results['c']['up'])
+    same = (results['a']['num_hits'] == 0) & (results['c']['num_hits'] == 0)
+    assert np.array_equal(results['a']['outcome'][same], results['c']['outcome'][same])
+
+def test_play_policies_is_reproducible():
+    policies = {16: blackjack_fast.threshold_policy(16)}
+    a = blackjack_fast.play_policies(1000, policies, rng=np.random.default_rng(9))[16]['payout']
+    b = blackjack_fast.play_policies(1000, policies, rng=np.random.default_rng(9))[16]['payout']
+    assert np.array_equal(a, b)
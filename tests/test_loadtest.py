@@ -0,0 +1,38 @@
+import multiprocessing
+import os
+
+import pytest
+
+import blackjack_loadtest
+
+def _post(results):
+    results.put({'hit': [0.1]})
+
+def _crash(results):
+    os._exit(3)
+
+def _start(target, results):
+    process = multiprocessing.Process(target=target, args=(results,), daemon=True)
+    process.start()
+    return process
+
+def test_next_result_returns_posted_latencies():
+    results = multiprocessing.Queue()
+    processes = [_start(_post, results)]
+    assert blackjack_loadtest._next_result(results, processes, poll=0.1) == {'hit': [0.1]}
+    processes[0].join()
+
+def test_next_result_fails_when_a_player_dies():
+    results = multiprocessing.Queue()
+    processes = [_start(_crash, results)]
+    processes[0].join()
+    with pytest.raises(RuntimeError, match="退出码 3"):
+        blackjack_loadtest._next_result(results, processes, poll=0.1)
+
+def _crash_player(seed, deadline, think_time, hit_threshold, results):
+    os._exit(1)
+
+def test_run_load_test_reports_a_dead_player(monkeypatch):
+    monkeypatch.setattr(blackjack_loadtest, 'simulate_player', _crash_player)
+    with pytest.raises(RuntimeError, match="未提交结果"):
+        blackjack_loadtest.run_load_test(players=2, duration=0.1, sample_interval=0.1)
@@ -0,0 +1,41 @@
+import random
+
+import numpy as np
+import pytest
+
+import blackjack
+import blackjack_log
+from blackjack_engine import OUTCOMES
+
+def test_recorded_hands_match_simulation_rates(tmp_path):
+    path = tmp_path / 'hands.bin'
+    random.seed(2)
+    with blackjack_log.HandRecorder(str(path), buffer_size=100) as recorder:
+        rates = blackjack.monte_carlo_simulation(500, 15, recorder=recorder)
+    records = blackjack_log.open_log(str(path))
+    assert len(records) == 500
+    assert (records['threshold'] == 15).all()
+    assert (records['num_player_cards'] >= 2).all()
+    outcomes = np.array(OUTCOMES)[records['outcome']]
+    win_rate, loss_rate, draw_rate = rates
+    assert np.mean(np.isin(outcomes, ('blackjack', 'win'))) == pytest.approx(win_rate)
+    assert np.mean(np.isin(outcomes, ('loss', 'surrender'))) == pytest.approx(loss_rate)
+    assert np.mean(outcomes == 'push') == pytest.approx(draw_rate)
+
+    summary = blackjack_log.summarize(records, by='up', chunk_size=64)
+    assert summary['hands'].sum() == 500
+    assert set(summary.index) <= set(range(10))
+
+def test_appending_keeps_one_header(tmp_path):
+    path = str(tmp_path / 'hands.bin')
+    for seed in (3, 4):
+        random.seed(seed)
+        with blackjack_log.HandRecorder(path) as recorder:
+            blackjack.monte_carlo_simulation(50, 16, recorder=recorder)
+    assert len(blackjack_log.open_log(path)) == 100
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a hand log at all')
+    with pytest.raises(ValueError):
+        blackjack_log.open_log(str(path))
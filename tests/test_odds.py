@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+import blackjack_fast
+import blackjack_odds
+from blackjack_engine import Rules
+
+RULES = [Rules(decks=1), Rules(decks=6, dealer_hits_soft_17=True), Rules(decks=None)]
+
+@pytest.mark.parametrize('rules', RULES)
+def test_dealer_distributions_are_normalized(rules):
+    for up in range(10):
+        dist = blackjack_odds.dealer_final_distribution(up, rules=rules)
+        assert dist.shape == (len(blackjack_odds.DEALER_OUTCOMES),)
+        assert dist.sum() == pytest.approx(1.0)
+        assert np.all(dist >= 0)
+
+def test_weak_upcards_bust_more_often():
+    bust = [blackjack_odds.dealer_final_distribution(up, decks=None)[-1] for up in range(10)]
+    assert max(bust[1:6]) == bust[5]  # 庄家明牌为6时爆牌率最高
+    assert min(bust[1:6]) > max(bust[6:])
+
+def test_win_probability_orders_player_totals():
+    assert blackjack_odds.win_probability(22, 5) == 0.0
+    wins = [blackjack_odds.win_probability(total, 9, decks=6) for total in (16, 17, 18, 19, 20, 21)]
+    assert wins == sorted(wins)
+    # 16 点及以下只有庄家爆牌时才赢
+    assert blackjack_odds.win_probability(12, 9, decks=6) == pytest.approx(
+        blackjack_odds.dealer_final_distribution(9, decks=6)[-1])
+
+@pytest.mark.parametrize('rules', RULES)
+def test_outcome_probabilities_are_normalized(rules):
+    for threshold, probs in blackjack_odds.outcome_probabilities(range(11, 22), rules=rules).items():
+        assert set(probs) == set(blackjack_odds.SETTLE_OUTCOMES)
+        assert sum(probs.values()) == pytest.approx(1.0)
+
+@pytest.mark.parametrize('rules', RULES)
+@pytest.mark.parametrize('threshold', [12, 16])
+def test_exact_threshold_return_matches_simulation(rules, threshold):
+    payouts, probs = blackjack_odds.threshold_payouts(threshold, rules=rules)
+    exact = float(np.dot(payouts, probs))
+    result = blackjack_fast.play_hands(200000, blackjack_fast.threshold_policy(threshold),
+                                       rng=np.random.default_rng(threshold), rules=rules)
+    payout = result['payout']
+    assert abs(payout.mean() - exact) < 4 * payout.std() / np.sqrt(len(payout))
+
+def test_threshold_outcome_counts_naturals_as_wins():
+    probs = blackjack_odds.outcome_probabilities([16], decks=1)[16]
+    win, loss, draw = blackjack_odds.threshold_outcome(16, decks=1)
+    assert win == pytest.approx(probs['blackjack'] + probs['win'])
+    assert win + loss + draw == pytest.approx(1.0)
+
+def _brute_force_capital(initial_capital, bet_amount, num_games, threshold, scale=2):
+    """逐一枚举每局结算结果的资本分布（与 capital_distribution 相同的全押和网格取整规则）"""
+    payouts, probs = blackjack_odds.threshold_payouts(threshold)
+    states = {float(initial_capital): 1.0}
+    ruin = 0.0
+    for _ in range(num_games):
+        new = {}
+        for capital, p in states.items():
+            if capital <= 0:
+                new[capital] = new.get(capital, 0.0) + p
+                continue
+            for payout, q in zip(payouts, probs):
+                if capital >= bet_amount:
+                    after = capital + payout * bet_amount
+                else:
+                    after = np.floor(capital * (1 + payout) * scale) / scale
+                new[after] = new.get(after, 0.0) + p * q
+        states = new
+    final = np.zeros(int(max(states)) + 1)
+    for capital, p in states.items():
+        final[int(np.floor(capital))] += p
+        if capital <= 0:
+            ruin += p
+    return ruin, final
+
+def test_capital_distribution_matches_brute_force():
+    exact = blackjack_odds.capital_distribution(initial_capital=2, bet_amount=1, player_threshold=16, num_games=5)
+    ruin, final = _brute_force_capital(2, 1, 5, 16)
+    assert exact['ruin_probability'] == pytest.approx(ruin)
+    assert exact['final_distribution'][:len(final)] == pytest.approx(final)
+    assert exact['ruin_time'].sum() == pytest.approx(ruin)
+
+def test_capital_distribution_is_consistent():
+    exact = blackjack_odds.capital_distribution(initial_capital=20, bet_amount=2, num_games=300, record_games=50)
+    assert exact['final_distribution'].sum() == pytest.approx(1.0)
+    assert exact['heatmap'][:, 0].sum() == pytest.approx(1.0)
+    assert exact['heatmap'][20, 0] == 1.0
+    assert np.all(exact['heatmap'].sum(axis=0) <= 1 + 1e-9)
+    assert exact['heatmap'][0, -1] == pytest.approx(exact['ruin_time'][:51].sum())
+    shorter = blackjack_odds.capital_distribution(initial_capital=20, bet_amount=2, num_games=100)
+    assert shorter['ruin_probability'] < exact['ruin_probability']
@@ -0,0 +1,36 @@
+import json
+import os
+
+import matplotlib
+import pytest
+
+matplotlib.use('Agg')
+
+import blackjack_report
+
+JOB = {'name': 'card_probabilities', 'plot': 'plot_card_probabilities', 'kwargs': {}}
+BROKEN = {'name': 'broken', 'plot': 'no_such_plot', 'kwargs': {}}
+
+def _cache(output_dir):
+    with open(os.path.join(output_dir, blackjack_report.CACHE_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+def test_cache_tracks_imported_sources(tmp_path):
+    status = blackjack_report.render_figures([JOB], tmp_path, dpi=20, workers=0)
+    assert status == {'card_probabilities': 'rendered'}
+    sources = _cache(tmp_path)['card_probabilities']['sources']
+    assert {'blackjack.py', 'blackjack_strata.py', 'blackjack_profile.py'} <= set(sources)
+    assert blackjack_report.render_figures([JOB], tmp_path, dpi=20, workers=0) == {'card_probabilities': 'cached'}
+
+    # 任一依赖源码的哈希变化都会重新绘制
+    cache = _cache(tmp_path)
+    cache['card_probabilities']['sources']['blackjack_strata.py'] = 'stale'
+    with open(os.path.join(tmp_path, blackjack_report.CACHE_FILE), 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    assert blackjack_report.render_figures([JOB], tmp_path, dpi=20, workers=0) == {'card_probabilities': 'rendered'}
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_failed_figure_keeps_finished_entries(tmp_path, workers):
+    with pytest.raises(AttributeError):
+        blackjack_report.render_figures([JOB, BROKEN], tmp_path, dpi=20, workers=workers)
+    assert set(_cache(tmp_path)) == {'card_probabilities'}
@@ -0,0 +1,24 @@
+import numpy as np
+
+import blackjack_fast
+import blackjack_odds
+import blackjack_search
+from blackjack_engine import Rules
+
+def test_threshold_strategies_match_threshold_policies():
+    for threshold in (12, 16, 20):
+        policy = blackjack_search.strategy_policy(threshold, threshold, threshold)
+        assert np.array_equal(policy, blackjack_fast.threshold_policy(threshold))
+
+def test_winner_is_revalidated_on_fresh_hands():
+    rules = Rules(decks=None)
+    candidates = [{'hard_weak': t, 'hard_strong': t, 'soft': t} for t in range(12, 18)]
+    report = blackjack_search.search_strategies(candidates, initial_hands=2000, max_rounds=4, seed=1,
+                                                rules=rules, validation_hands=200000)
+    assert report['validation_hands'] == 200000
+    assert report['expected_return'] != report['search_return']
+    low, high = report['ci']
+    assert low < report['expected_return'] < high
+    threshold = report['winner']['hard_weak']
+    exact = np.dot(*blackjack_odds.threshold_payouts(threshold, rules=rules))
+    assert low < exact < high
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import blackjack_service
+from blackjack_engine import Rules
+
+@pytest.fixture(scope='module')
+def service():
+    service = blackjack_service.BlackjackService(workers=1, window=0.05)
+    yield service
+    service.pool.shutdown()
+
+def _gather(*coroutines):
+    async def run():
+        return await asyncio.gather(*coroutines)
+    return asyncio.run(run())
+
+def test_unseeded_simulations_are_independent(service):
+    a, b = _gather(service.simulate({'policy': 16, 'num_hands': 5000}),
+                   service.simulate({'policy': 16, 'num_hands': 5000}))
+    assert a['seed'] != b['seed']
+    assert a != b
+
+def test_seeded_simulations_share_a_batch(service):
+    before = service.simulation_queue.batches
+    a, b, c = _gather(service.simulate({'policy': 16, 'num_hands': 5000, 'seed': 7}),
+                      service.simulate({'policy': 16, 'num_hands': 5000, 'seed': 7}),
+                      service.simulate({'policy': 12, 'num_hands': 3000, 'seed': 7}))
+    assert service.simulation_queue.batches == before + 1
+    assert a == b
+    assert c['policy'] == 12 and c['num_hands'] == 3000
+
+@pytest.mark.parametrize('rules', [
+    {'decks': True}, {'decks': 2.5}, {'decks': 0}, {'decks': '6'},
+    {'dealer_hits_soft_17': 1}, {'double_down': 'yes'}, {'surrender': None},
+    {'blackjack_payout': 0}, {'blackjack_payout': -1.5}, {'blackjack_payout': True},
+    {'blackjack_payout': '1.5'}, {'blackjack_payout': float('inf')},
+    {'shoe': 6}, [6],
+])
+def test_parse_rules_rejects_bad_fields(rules):
+    with pytest.raises(ValueError):
+        blackjack_service.parse_rules({'rules': rules})
+
+def test_parse_rules_accepts_valid_fields():
+    rules = blackjack_service.parse_rules({'rules': {'decks': None, 'dealer_hits_soft_17': True,
+                                                     'blackjack_payout': 1.2, 'surrender': True}})
+    assert rules == Rules(decks=None, dealer_hits_soft_17=True, blackjack_payout=1.2, surrender=True)
+    assert blackjack_service.parse_rules({}) == Rules()
+
+@pytest.mark.parametrize('data', [
+    {'player_value': 3, 'dealer_card': 'A'}, {'player_value': 22, 'dealer_card': 'A'},
+    {'player_value': True, 'dealer_card': 'A'}, {'player_value': 16, 'dealer_card': '11'},
+])
+def test_parse_advisor_rejects_bad_positions(data):
+    with pytest.raises(ValueError):
+        blackjack_service.parse_advisor(data)
+
+@pytest.mark.parametrize('data', [
+    {'policy': 3}, {'policy': 'basic'}, {'policy': True}, {'num_hands': 0},
+    {'num_hands': blackjack_service.MAX_SIMULATION_HANDS + 1}, {'num_hands': 1.5}, {'seed': -1}, {'seed': False},
+])
+def test_parse_simulation_rejects_bad_requests(data):
+    with pytest.raises(ValueError):
+        blackjack_service.parse_simulation(data)
+
+def test_advisor_batch_matches_win_probability():
+    from blackjack_odds import win_probability
+    rules = Rules(decks=6, dealer_hits_soft_17=True)
+    requests = [blackjack_service.parse_advisor({'player_value': value, 'dealer_card': card})
+                for value, card in ((16, '10'), (17, 'A'), (12, '6'), (20, 'K'))]
+    for request, result in zip(requests, blackjack_service.advisor_batch(rules, requests)):
+        assert result['win_probability'] == pytest.approx(win_probability(request['player_value'], request['up_rank'],
+                                                                          rules=rules))
+        assert sum(result['dealer_distribution'].values()) == pytest.approx(1.0)
+
+def test_batch_queue_coalesces_and_propagates_errors():
+    calls = []
+
+    async def handler(params):
+        calls.append(list(params))
+        if 'bad' in params:
+            raise ValueError("bad batch")
+        return [p * 2 for p in params]
+
+    async def run():
+        queue = blackjack_service.BatchQueue(handler, window=0.01)
+        results = await asyncio.gather(queue.submit('a', 1), queue.submit('a', 2), queue.submit('b', 3))
+        errors = await asyncio.gather(queue.submit('c', 'bad'), queue.submit('c', 'x'), return_exceptions=True)
+        return queue, results, errors
+
+    queue, results, errors = asyncio.run(run())
+    assert results == [2, 4, 6]
+    assert sorted(map(len, calls)) == [1, 2, 2]
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert queue.stats()['requests'] == 5 and queue.stats()['batches'] == 3
+
+def test_dispatch_status_codes(service):
+    async def run():
+        return [await service.dispatch('POST', '/advisor', b'{"player_value": 16, "dealer_card": "10", '
+                                                          b'"rules": {"decks": true}}'),
+                await service.dispatch('POST', '/advisor', b'not json'),
+                await service.dispatch('GET', '/advisor', b''),
+                await service.dispatch('GET', '/nowhere', b''),
+                await service.dispatch('GET', '/health', b'')]
+    assert [status for status, _ in asyncio.run(run())] == [400, 400, 405, 404, 200]
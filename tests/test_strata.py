@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+import blackjack_odds
+import blackjack_strata
+from blackjack_engine import Rules, hand_total
+from blackjack_fast import RANKS, threshold_policy
+
+@pytest.mark.parametrize('decks', [1, 6, None])
+def test_strata_weights_are_normalized(decks):
+    strata = blackjack_strata._strata(decks)
+    assert strata['weights'].sum() == pytest.approx(1.0)
+    assert np.all(strata['weights'] > 0)
+
+def test_strata_are_labelled_with_engine_totals():
+    strata = blackjack_strata._strata(1)
+    keys = strata['keys'][strata['stratum']]
+    for (first, second, up), (total, soft, key_up) in zip(strata['triples'], keys):
+        expected_total, expected_soft = hand_total([RANKS[first] + '♠', RANKS[second] + '♥'])
+        assert (total, bool(soft), key_up) == (expected_total, bool(expected_soft), up)
+
+def test_soft_hands_have_their_own_strata():
+    index = blackjack_strata.stratified_simulation(2000, rng=np.random.default_rng(0))['strata'].index
+    assert (12, True, 5) in index   # A+A
+    assert (17, True, 5) in index   # A+6
+    assert (17, False, 5) in index  # 10+7
+    assert index.get_level_values('start_total').max() == 21
+
+@pytest.mark.parametrize('allocation', ['proportional', 'neyman'])
+def test_stratified_return_matches_exact(allocation):
+    rules = Rules(decks=6)
+    result = blackjack_strata.stratified_simulation(200000, threshold_policy(15), allocation=allocation,
+                                                    rng=np.random.default_rng(4), rules=rules)
+    exact = np.dot(*blackjack_odds.threshold_payouts(15, rules=rules))
+    assert abs(result['expected_return'] - exact) < 4 * result['std_error']
+    assert result['variance_reduction'] > 1
+    assert result['win_rate'] + result['loss_rate'] + result['draw_rate'] == pytest.approx(1.0)
+
+def test_unknown_allocation_is_rejected():
+    with pytest.raises(ValueError):
+        blackjack_strata.stratified_simulation(100, allocation='random')
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+import blackjack_odds
+import blackjack_table
+from blackjack_engine import OUTCOMES, Rules
+from blackjack_fast import threshold_policy
+
+def test_counts_cover_every_seat_and_round():
+    result = blackjack_table.play_tables(50, 40, [threshold_policy(12), threshold_policy(16), threshold_policy(17)],
+                                         rng=np.random.default_rng(1))
+    assert result['hands'].tolist() == [2000] * 3
+    assert result['outcome_counts'].shape == (3, len(OUTCOMES))
+    assert result['outcome_counts'].sum(axis=1).tolist() == [2000] * 3
+    assert result['shuffles'] > 50
+    summary = blackjack_table.summarize_seats(result, ['a', 'b', 'c'])
+    assert summary.filter(like='_rate').sum(axis=1).to_numpy() == pytest.approx(1.0)
+
+def test_single_seat_matches_heads_up_exact():
+    rules = Rules(decks=6)
+    result = blackjack_table.play_tables(20000, 10, [threshold_policy(16)], rng=np.random.default_rng(2), rules=rules)
+    summary = blackjack_table.summarize_seats(result)
+    exact = np.dot(*blackjack_odds.threshold_payouts(16, rules=rules))
+    assert abs(summary['mean_payout'].iloc[0] - exact) < 4 * summary['std_error'].iloc[0]
+
+def test_run_tables_uses_only_busy_workers():
+    result, seconds = blackjack_table.run_tables(3, 5, [threshold_policy(16)], workers=5, seed=3)
+    assert len(seconds) == 3
+    assert result['hands'].tolist() == [15]
+    again, _ = blackjack_table.run_tables(3, 5, [threshold_policy(16)], workers=5, seed=3)
+    assert np.array_equal(result['outcome_counts'], again['outcome_counts'])
+
+def test_infinite_shoe_is_rejected():
+    with pytest.raises(ValueError):
+        blackjack_table.play_tables(1, 1, [threshold_policy(16)], rules=Rules(decks=None))
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import blackjack_odds
+import blackjack_tail
+
+def _exact_loss_probability(loss_line, num_games, threshold=16):
+    """按累计输赢（以半注为网格）逐局传播的精确首达概率"""
+    payouts, probs = blackjack_odds.threshold_payouts(threshold)
+    steps = np.rint(payouts * 2).astype(int)
+    barrier = int(np.ceil(loss_line * 2))
+    offset = barrier + 1
+    dist = np.zeros(offset + num_games * steps.max() + 1)
+    dist[offset] = 1.0
+    hit = 0.0
+    for _ in range(num_games):
+        new = np.zeros_like(dist)
+        for step, p in zip(steps, probs):
+            shifted = np.roll(dist, step)
+            if step < 0:
+                shifted[step:] = 0
+            new += p * shifted
+        hit += new[:offset - barrier + 1].sum()
+        new[:offset - barrier + 1] = 0
+        dist = new
+    return hit
+
+def test_solve_tilt_reaches_the_target_mean():
+    payouts, probs = blackjack_odds.threshold_payouts(16)
+    assert blackjack_tail.tilted_distribution(payouts, probs, 0.0) == pytest.approx(probs)
+    theta = blackjack_tail.solve_tilt(payouts, probs, -0.2)
+    assert theta < 0
+    assert np.dot(blackjack_tail.tilted_distribution(payouts, probs, theta), payouts) == pytest.approx(-0.2)
+
+def test_importance_sampling_matches_exact_first_passage():
+    exact = _exact_loss_probability(30, 200)
+    result = blackjack_tail.loss_probability(loss_fraction=0.3, num_games=200, initial_capital=100,
+                                             num_paths=20000, seed=5)
+    assert result['tilt'] < 0
+    assert abs(result['probability'] - exact) < 4 * result['std_error']
+    assert result['variance_reduction'] > 5
+
+def test_plain_monte_carlo_when_the_loss_line_is_easy():
+    result = blackjack_tail.loss_probability(loss_fraction=0.05, num_games=2000, initial_capital=100,
+                                             num_paths=2000, seed=6)
+    assert result['tilt'] == 0.0
+    assert result['probability'] == pytest.approx(result['hit_fraction'])
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import blackjack_warmup
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'blackjack_interactive.py')
+
+@pytest.mark.parametrize('value, expected', [
+    ('5', 5.0), ('0', 0.0), ('-3', 0.0), ('1e9', blackjack_warmup.MAX_PRIME_SECONDS),
+    ('abc', None), ('nan', None), ('inf', None), (None, None),
+])
+def test_parse_prime_seconds(value, expected):
+    assert blackjack_warmup.parse_prime_seconds(value) == expected
+
+def test_warmup_budget_requires_the_launcher_token():
+    environ = {blackjack_warmup.WARMUP_TOKEN_ENV: 'secret'}
+    assert blackjack_warmup.warmup_budget({'warmup': '5'}, environ) is None
+    assert blackjack_warmup.warmup_budget({'warmup': '5', 'token': 'guess'}, environ) is None
+    assert blackjack_warmup.warmup_budget({'warmup': '5', 'token': 'secret'}, {}) is None
+    assert blackjack_warmup.warmup_budget({'warmup': '5', 'token': ''}, {blackjack_warmup.WARMUP_TOKEN_ENV: ''}) is None
+    assert blackjack_warmup.warmup_budget({'warmup': '5', 'token': 'secret'}, environ) == 5.0
+
+def test_common_positions_skip_naturals():
+    positions = blackjack_warmup.common_positions()
+    assert len(positions) == len(set(positions))
+    assert all(4 <= total <= 20 for total, _ in positions)
+
+def _run_app(monkeypatch, server_token, params):
+    monkeypatch.setenv(blackjack_warmup.WARMUP_TOKEN_ENV, server_token)
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    for name, value in params.items():
+        at.query_params[name] = value
+    return at.run()
+
+@pytest.mark.parametrize('params', [{'warmup': 'abc'}, {'warmup': '60'}, {'warmup': '60', 'token': 'guess'}])
+def test_visitor_warmup_renders_the_normal_page(monkeypatch, params):
+    at = _run_app(monkeypatch, 'secret', params)
+    assert not at.exception
+    assert at.button(key='start_game')
+
+def test_launcher_warmup_session_only_primes(monkeypatch):
+    at = _run_app(monkeypatch, 'secret', {'warmup': '0', 'token': 'secret'})
+    assert not at.exception
+    assert len(at.button) == 0